@@ -0,0 +1,300 @@
+"""Adaptive concurrency, retries and deadlines for model calls in eval runs.
+
+``AdaptiveConcurrency`` is an AIMD controller: while calls succeed quickly it
+adds roughly one slot per window of successful calls, and when a call is
+throttled (429, 5xx, timeout) it halves the limit, at most once per cooldown.
+``RetryPolicy`` retries transient failures with full-jitter exponential
+backoff, honouring ``Retry-After``, bounded by a per-attempt timeout and an
+overall deadline. ``ResilientCaller`` combines the two:
+
+    caller = ResilientCaller(AdaptiveConcurrency(max_limit=32), RetryPolicy())
+    answer = await caller.call(lambda: assistant.ainvoke(inputs))
+
+When all attempts fail, ``call`` raises ``CallFailed`` carrying the attempt
+count, so the eval loop can record the row as failed and keep going. Errors
+that point at a bug (``PROGRAMMING_ERRORS``) are raised as they are.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import functools
+import logging
+import random
+import time
+
+# HTTP statuses worth retrying: timeouts, conflicts, throttling and server errors
+RETRYABLE_STATUSES = frozenset({408, 409, 429})
+THROTTLE_STATUSES = frozenset({429, 503})
+# openai client errors raised without a status code (not imported to keep startup cheap)
+RETRYABLE_ERROR_NAMES = frozenset({"APITimeoutError", "APIConnectionError"})
+# Bugs in the eval code rather than failed calls; these are raised, never
+# recorded as a failed row
+PROGRAMMING_ERRORS = (AttributeError, TypeError, NameError, LookupError)
+
+
+def status_of(error):
+    return getattr(error, "status_code", None) or getattr(
+        getattr(error, "response", None), "status_code", None
+    )
+
+
+def is_retryable(error):
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    if type(error).__name__ in RETRYABLE_ERROR_NAMES:
+        return True
+    status = status_of(error)
+    return status is not None and (status in RETRYABLE_STATUSES or status >= 500)
+
+
+def is_throttle(error):
+    """Errors that mean "slow down" rather than "this request is bad"."""
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    if type(error).__name__ in RETRYABLE_ERROR_NAMES:
+        return True
+    status = status_of(error)
+    return status is not None and (status in THROTTLE_STATUSES or status >= 500)
+
+
+def retry_after_seconds(error):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(header)
+        if value:
+            try:
+                return float(value) * scale
+            except ValueError:
+                return None
+    return None
+
+
+# The slot held by the ResilientCaller attempt running in this context, so the
+# call it makes can hand the slot back early; see release_slot
+_held_slot = contextvars.ContextVar("adaptive_held_slot", default=None)
+
+
+async def release_slot():
+    """Give back the concurrency slot held by the current caller attempt, if any.
+
+    For calls that mostly wait on other calls, such as a packed grader item
+    waiting for its pack to fill: the wait no longer counts against the limit,
+    and the request made for the whole pack takes a slot of its own.
+    """
+    slot = _held_slot.get()
+    if slot is not None and not slot["released"]:
+        slot["released"] = True
+        await slot["concurrency"].release()
+
+
+def detach_slot():
+    """Take the current attempt's slot for work that may outlive the attempt.
+
+    The attempt will no longer release it; pass the result to ``holding_slot``
+    in the task doing the work. Returns None when no slot is held.
+    """
+    slot = _held_slot.get()
+    if slot is None or slot["released"]:
+        return None
+    slot["released"] = True
+    return {"concurrency": slot["concurrency"], "released": False}
+
+
+@contextlib.asynccontextmanager
+async def holding_slot(slot):
+    """Hold a slot from ``detach_slot`` until the block exits."""
+    token = _held_slot.set(slot)
+    try:
+        yield
+    finally:
+        _held_slot.reset(token)
+        if slot is not None and not slot["released"]:
+            slot["released"] = True
+            await slot["concurrency"].release()
+
+
+class CallFailed(Exception):
+    def __init__(self, error, attempts):
+        super().__init__(f"{type(error).__name__}: {error} (after {attempts} attempts)")
+        self.error = error
+        self.attempts = attempts
+
+
+class AdaptiveConcurrency:
+    def __init__(
+        self,
+        initial_limit=4,
+        min_limit=1,
+        max_limit=64,
+        target_latency_s=None,
+        backoff_factor=0.5,
+        cooldown_s=1.0,
+    ):
+        self.limit = float(max(min_limit, min(initial_limit, max_limit)))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency_s = target_latency_s
+        self.backoff_factor = backoff_factor
+        self.cooldown_s = cooldown_s
+        self.in_flight = 0
+        self.peak_limit = self.limit
+        self.increases = 0
+        self.decreases = 0
+        self._last_decrease = float("-inf")
+        self._condition = None
+
+    def _cond(self):
+        # Created lazily so the controller can be built outside the event loop
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def acquire(self):
+        condition = self._cond()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self):
+        condition = self._cond()
+        async with condition:
+            self.in_flight -= 1
+            condition.notify_all()
+
+    def on_success(self, latency_s):
+        if self.target_latency_s and latency_s > self.target_latency_s:
+            return
+        # Additive increase: about +1 slot per `limit` successful calls
+        if self.limit < self.max_limit:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self.peak_limit = max(self.peak_limit, self.limit)
+            self.increases += 1
+
+    def on_throttle(self):
+        now = time.monotonic()
+        # Calls already in flight fail together; count them as one signal
+        if now - self._last_decrease < self.cooldown_s:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.backoff_factor)
+        self.decreases += 1
+        logging.getLogger().info(f"Throttled; concurrency limit now {int(self.limit)}")
+
+    def stats(self):
+        return {
+            "limit": int(self.limit),
+            "peak_limit": int(self.peak_limit),
+            "increases": self.increases,
+            "decreases": self.decreases,
+        }
+
+
+class RetryPolicy:
+    def __init__(
+        self,
+        max_attempts=4,
+        base_delay_s=0.5,
+        max_delay_s=20.0,
+        attempt_timeout_s=60.0,
+        deadline_s=300.0,
+        seed=None,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay_s = base_delay_s
+        self.max_delay_s = max_delay_s
+        self.attempt_timeout_s = attempt_timeout_s
+        self.deadline_s = deadline_s
+        self._random = random.Random(seed)
+
+    def backoff(self, attempt, error=None):
+        """Full-jitter exponential backoff, at least the server's Retry-After."""
+        ceiling = min(self.max_delay_s, self.base_delay_s * 2 ** (attempt - 1))
+        delay = self._random.uniform(0, ceiling)
+        retry_after = retry_after_seconds(error) if error is not None else None
+        return max(delay, retry_after or 0.0)
+
+
+class ResilientCaller:
+    """Runs model calls inside the concurrency limit with retries and deadlines."""
+
+    def __init__(self, concurrency=None, retry=None):
+        self.concurrency = concurrency
+        self.retry = retry or RetryPolicy()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+
+    async def _attempt(self, make_call, timeout):
+        slot = None
+        if self.concurrency is not None:
+            await self.concurrency.acquire()
+            slot = {"concurrency": self.concurrency, "released": False}
+        token = _held_slot.set(slot)
+        start = time.monotonic()
+        try:
+            result = await asyncio.wait_for(make_call(), timeout=timeout)
+        except Exception as error:
+            if self.concurrency is not None and is_throttle(error):
+                self.concurrency.on_throttle()
+            raise
+        finally:
+            _held_slot.reset(token)
+            if slot is not None and not slot["released"]:
+                slot["released"] = True
+                await self.concurrency.release()
+        if self.concurrency is not None:
+            self.concurrency.on_success(time.monotonic() - start)
+        return result
+
+    async def call(self, make_call, config=None):
+        """Await make_call() with retries; returns (result, attempts) or raises CallFailed.
+
+        With a run ``config``, make_call is called with a copy of it whose
+        metadata carries the attempt number, so callbacks such as
+        ``metrics.MetricsCallbackHandler`` can tell retried calls apart.
+        """
+        self.calls += 1
+        policy = self.retry
+        deadline = time.monotonic() + policy.deadline_s
+        attempt = 0
+        while True:
+            attempt += 1
+            remaining = deadline - time.monotonic()
+            try:
+                timeout = min(policy.attempt_timeout_s, max(remaining, 0.001))
+                attempt_call = make_call
+                if config is not None:
+                    metadata = {**(config.get("metadata") or {}), "attempt": attempt}
+                    attempt_call = functools.partial(
+                        make_call, {**config, "metadata": metadata}
+                    )
+                return await self._attempt(attempt_call, timeout), attempt
+            except PROGRAMMING_ERRORS:
+                raise
+            except Exception as error:
+                delay = policy.backoff(attempt, error)
+                out_of_time = time.monotonic() + delay >= deadline
+                if (
+                    not is_retryable(error)
+                    or attempt >= policy.max_attempts
+                    or out_of_time
+                ):
+                    self.failures += 1
+                    raise CallFailed(error, attempt) from error
+                self.retries += 1
+                logging.getLogger().info(
+                    f"Retrying after {type(error).__name__} in {delay:.2f}s "
+                    f"(attempt {attempt}/{policy.max_attempts})"
+                )
+                await asyncio.sleep(delay)
+
+    def stats(self):
+        stats = {
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+        }
+        if self.concurrency is not None:
+            stats.update(self.concurrency.stats())
+        return stats
@@ -1,14 +1,20 @@
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnablePassthrough
 import os
-from dotenv import load_dotenv, find_dotenv
+from functools import lru_cache
+from llm_cache import get_llm_cache
+from cassette import get_cassette
+from rate_limit import get_rate_limiter
+from quiz_bank_store import get_quiz_bank_store
 
-# Load environment variables
-_ = load_dotenv(find_dotenv())
+# Importing this module stays cheap: the environment, the quiz bank, the system
+# message and the OpenAI client (langchain_openai) are all loaded on first use.
 
 delimiter = "####"
 
+QUIZ_BANK_PATH = "quiz_bank.txt"
+
 
 def read_file_into_string(file_path):
     try:
@@ -21,9 +27,21 @@ def read_file_into_string(file_path):
         print(f"An error occurred: {e}")
 
 
-quiz_bank = read_file_into_string("quiz_bank.txt")
+def get_quiz_bank():
+    """Current quiz bank text; the file is re-read only after it changes."""
+    if "quiz_bank" in globals():
+        # Set on the module, e.g. patched by a test
+        return globals()["quiz_bank"]
+    try:
+        return get_quiz_bank_store(QUIZ_BANK_PATH).text()
+    except FileNotFoundError:
+        print(f"The file at '{QUIZ_BANK_PATH}' was not found.")
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
 
-system_message = f"""
+def build_system_message(quiz_bank):
+    return f"""
 Follow these steps to generate a customized quiz for the user.
 The question will be delimited with four hashtags i.e {delimiter}
 
@@ -57,22 +75,118 @@ Additional rules:
 - If the user asks about a subject not in the quiz bank, answer "I'm sorry I do not have information about that".
 """
 
+
+@lru_cache(maxsize=4)
+def _system_message_for(quiz_bank):
+    return build_system_message(quiz_bank)
+
+
+def get_system_message():
+    """System message for the current quiz bank, rebuilt when the bank changes."""
+    return _system_message_for(get_quiz_bank())
+
+
+def __getattr__(name):
+    # Module-level names that are expensive to build are created on first access
+    if name == "quiz_bank":
+        return get_quiz_bank()
+    if name == "system_message":
+        return get_system_message()
+    if name == "ChatOpenAI":
+        from langchain_openai import ChatOpenAI
+
+        globals()["ChatOpenAI"] = ChatOpenAI
+        return ChatOpenAI
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 """
   Helper functions for writing the test cases
 """
 
 
+@lru_cache(maxsize=None)
+def load_environment():
+    from dotenv import load_dotenv, find_dotenv
+
+    return load_dotenv(find_dotenv())
+
+
+def create_llm(model="gpt-3.5-turbo", temperature=0, cache=None, **kwargs):
+    """Build the chat model shared by the assistant and the graders.
+
+    Responses are recorded to / replayed from the cassette set in EVAL_CASSETTE, or
+    served from the on-disk LLM cache when it is enabled. Set OPENAI_BASE_URL to
+    point the client at a local stand-in such as fake_openai_server.py. API calls
+    share the machine-wide budget from EVAL_RATE_LIMIT_RPM / EVAL_RATE_LIMIT_TPM.
+    """
+    load_environment()
+    if cache is None:
+        cache = get_cassette() or get_llm_cache()
+    kwargs.setdefault("openai_api_key", os.environ.get("OPENAI_API_KEY"))
+    if "rate_limiter" not in kwargs:
+        limiter = get_rate_limiter()
+        if limiter is not None:
+            kwargs["rate_limiter"] = limiter
+            kwargs["callbacks"] = [
+                *(kwargs.get("callbacks") or []),
+                limiter.usage_callback,
+            ]
+    chat_model = globals().get("ChatOpenAI") or __getattr__("ChatOpenAI")
+    return chat_model(model=model, temperature=temperature, cache=cache, **kwargs)
+
+
+@lru_cache(maxsize=None)
+def get_default_llm():
+    """Shared default chat model, so its HTTP client is built once per process."""
+    return create_llm()
+
+
+def get_assistant_chain():
+    """Cached default assistant chain for entry points that invoke it repeatedly.
+
+    The chain is rebuilt when quiz_bank.txt changes, so edits to the bank apply
+    without restarting the process.
+    """
+    return _assistant_chain_for(get_system_message())
+
+
+@lru_cache(maxsize=1)
+def _assistant_chain_for(system_message):
+    return assistant_chain(system_message=system_message, llm=get_default_llm())
+
+
 def assistant_chain(
-    system_message=system_message,
+    system_message=None,
     human_template="{question}",
-    llm=ChatOpenAI(
-        model="gpt-3.5-turbo",
-        temperature=0,
-        openai_api_key=os.environ.get("OPENAI_API_KEY"),
-    ),
-    output_parser=StrOutputParser(),
+    llm=None,
+    output_parser=None,
+    quiz_bank_index=None,
 ):
-
+    if llm is None:
+        llm = create_llm()
+    if output_parser is None:
+        output_parser = StrOutputParser()
+    # Lets callbacks such as metrics.MetricsCallbackHandler tell assistant calls apart
+    llm = llm.with_config(tags=["assistant"])
+
+    if quiz_bank_index is not None:
+        # Build the system message per request with only the subjects it needs
+        chat_prompt = ChatPromptTemplate.from_messages(
+            [
+                ("system", "{system_message}"),
+                ("human", human_template),
+            ]
+        )
+        add_system_message = RunnablePassthrough.assign(
+            system_message=lambda inputs: build_system_message(
+                quiz_bank_index.render_for_request(inputs["question"])
+            )
+        )
+        return add_system_message | chat_prompt | llm | output_parser
+
+    if system_message is None:
+        system_message = get_system_message()
     chat_prompt = ChatPromptTemplate.from_messages(
         [
             ("system", system_message),
@@ -0,0 +1,423 @@
+"""Performance benchmarks for the eval pipeline, with JSON baselines.
+
+Every benchmark runs locally; model calls go to fake_openai_server with a
+configurable per-request latency, so no API key or network is needed:
+
+    import      time to ``import app`` in a fresh interpreter
+    chain       cost of building an ``assistant_chain()``
+    prompt      rendering the assistant prompt as the quiz bank grows, for the
+                full bank and for a pruned (--prune-quiz-bank) bank
+    evaluate    ``aevaluate_dataset`` rows per second at several concurrency levels
+    report      report generation time and peak Python memory at 1k/10k/100k rows
+
+Results are written as JSON with one value per metric, its unit and whether
+lower or higher is better. Any results file can serve as a baseline:
+
+    python benchmarks.py --output baselines/benchmarks.json    # record a baseline
+    python benchmarks.py --baseline baselines/benchmarks.json  # run and compare
+    python benchmarks.py --compare old.json new.json           # compare two runs
+
+A metric regresses when it is worse than its baseline by more than the
+threshold, a fraction of the baseline value (``--threshold``, default 0.25, or
+``--metric-threshold pattern=fraction`` for the metrics whose names match the
+glob pattern). Comparing exits with status 1 when any metric regressed. Metrics
+present on only one side are listed but never fail the comparison. Timings are
+the best of ``--repeat`` runs.
+"""
+
+import argparse
+import asyncio
+import datetime
+import fnmatch
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+from collections import namedtuple
+
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_LATENCY = 0.02
+DEFAULT_CONCURRENCY = [1, 4, 16]
+DEFAULT_EVAL_ROWS = 32
+DEFAULT_BANK_SIZES = [5, 50, 500]
+DEFAULT_REPORT_ROWS = [1_000, 10_000, 100_000]
+DEFAULT_REPEAT = 5
+DEFAULT_BASELINE_PATH = os.path.join("baselines", "benchmarks.json")
+
+LOWER = "lower"
+HIGHER = "higher"
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+IMPORT_PROBE = (
+    "import time; start = time.perf_counter(); import app; "
+    "print(time.perf_counter() - start)"
+)
+
+Metric = namedtuple("Metric", ["value", "unit", "better"])
+Comparison = namedtuple(
+    "Comparison", ["name", "baseline", "current", "change", "status", "regressed"]
+)
+
+
+def best_time(func, repeat=DEFAULT_REPEAT, number=1):
+    """Fastest of ``repeat`` timings, in seconds per call."""
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number
+
+
+def synthetic_bank(subjects):
+    """Quiz bank text in quiz_bank.txt's layout with the given number of subjects."""
+    categories = ["Art", "Science", "Geography"]
+    blocks = []
+    for number in range(1, subjects + 1):
+        facts = "".join(
+            f"    - Fact {fact} about topic {number}\n" for fact in range(1, 4)
+        )
+        blocks.append(
+            f"{number}. Subject: Topic {number}\n"
+            f"   Category: {categories[number % len(categories)]}\n"
+            f"   Facts:\n{facts}"
+        )
+    return "\n".join(blocks)
+
+
+def synthetic_results(rows):
+    """Graded result rows like an eval run's, one in ten failing."""
+    from fake_openai_server import DEFAULT_QUIZ
+
+    for idx in range(rows):
+        passed = idx % 10 != 0
+        yield {
+            "index": idx,
+            "input": f"Quiz me about topic {idx}",
+            "output": DEFAULT_QUIZ,
+            "grader_response": "Y" if passed else "N",
+            "decision": "Y" if passed else "N",
+            "status": "ok",
+            "assistant_latency_s": 0.5 + (idx % 97) / 100,
+            "grader_latency_s": 0.2 + (idx % 89) / 100,
+        }
+
+
+def bench_import(repeat=DEFAULT_REPEAT, **kwargs):
+    def probe():
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=HERE,
+        ).stdout
+        return float(output.strip().splitlines()[-1])
+
+    return {"import_app_s": Metric(min(probe() for _ in range(repeat)), "s", LOWER)}
+
+
+def bench_chain(repeat=DEFAULT_REPEAT, **kwargs):
+    from app import assistant_chain, build_system_message, create_llm, get_quiz_bank
+
+    llm = create_llm(cache=False, base_url="http://127.0.0.1:1/v1", api_key="fake")
+    system_message = build_system_message(get_quiz_bank())
+    seconds = best_time(
+        lambda: assistant_chain(system_message=system_message, llm=llm),
+        repeat=repeat,
+        number=100,
+    )
+    return {"assistant_chain_build_ms": Metric(seconds * 1000, "ms", LOWER)}
+
+
+def bench_prompt(repeat=DEFAULT_REPEAT, bank_sizes=DEFAULT_BANK_SIZES, **kwargs):
+    from langchain_core.prompts import ChatPromptTemplate
+
+    from app import build_system_message
+    from quiz_index import QuizBankIndex
+
+    question = "Generate a quiz about science."
+    pruned_prompt = ChatPromptTemplate.from_messages(
+        [("system", "{system_message}"), ("human", "{question}")]
+    )
+    metrics = {}
+    for size in bank_sizes:
+        bank = synthetic_bank(size)
+        prompt = ChatPromptTemplate.from_messages(
+            [("system", build_system_message(bank)), ("human", "{question}")]
+        )
+        index = QuizBankIndex.from_text(bank)
+
+        def render_pruned():
+            system_message = build_system_message(index.render_for_request(question))
+            return pruned_prompt.invoke(
+                {"system_message": system_message, "question": question}
+            )
+
+        full = best_time(lambda: prompt.invoke({"question": question}), repeat, 20)
+        pruned = best_time(render_pruned, repeat, 20)
+        metrics[f"prompt_render_ms[bank={size}]"] = Metric(full * 1000, "ms", LOWER)
+        metrics[f"pruned_prompt_render_ms[bank={size}]"] = Metric(
+            pruned * 1000, "ms", LOWER
+        )
+    return metrics
+
+
+def bench_evaluate(
+    latency=DEFAULT_LATENCY,
+    concurrency=DEFAULT_CONCURRENCY,
+    eval_rows=DEFAULT_EVAL_ROWS,
+    repeat=DEFAULT_REPEAT,
+    **kwargs,
+):
+    from app import assistant_chain, create_llm, get_quiz_bank
+    from fake_openai_server import FakeOpenAIServer
+    from save_eval_artifacts import aevaluate_dataset, create_eval_chain
+
+    quiz_bank = get_quiz_bank()
+    dataset = [{"input": f"Quiz me about topic {idx}"} for idx in range(eval_rows)]
+    metrics = {}
+    with FakeOpenAIServer(latency=latency) as server:
+        llm = create_llm(cache=False, base_url=server.base_url, api_key="fake")
+        assistant = assistant_chain(llm=llm)
+        evaluator = create_eval_chain(llm=llm)
+
+        def run(rows, max_concurrency):
+            return asyncio.run(
+                aevaluate_dataset(
+                    rows,
+                    quiz_bank,
+                    assistant,
+                    evaluator,
+                    max_concurrency=max_concurrency,
+                )
+            )
+
+        # Opens the client's connections before anything is timed
+        run(dataset[: max(concurrency)], max(concurrency))
+        for level in concurrency:
+            seconds = best_time(lambda: run(dataset, level), repeat)
+            metrics[f"eval_rows_per_s[concurrency={level}]"] = Metric(
+                eval_rows / seconds, "rows/s", HIGHER
+            )
+    return metrics
+
+
+def bench_report(report_rows=DEFAULT_REPORT_ROWS, repeat=DEFAULT_REPEAT, **kwargs):
+    from report_writer import write_report
+
+    def timed(rows):
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            write_report(synthetic_results(rows), directory)
+            return time.perf_counter() - start
+
+    metrics = {}
+    for rows in report_rows:
+        seconds = min(timed(rows) for _ in range(repeat))
+        # Measured in a second pass, since tracing allocations slows the first
+        with tempfile.TemporaryDirectory() as directory:
+            tracemalloc.start()
+            try:
+                write_report(synthetic_results(rows), directory)
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        metrics[f"report_s[rows={rows}]"] = Metric(seconds, "s", LOWER)
+        metrics[f"report_peak_mb[rows={rows}]"] = Metric(peak / 2**20, "MB", LOWER)
+    return metrics
+
+
+BENCHMARKS = {
+    "import": bench_import,
+    "chain": bench_chain,
+    "prompt": bench_prompt,
+    "evaluate": bench_evaluate,
+    "report": bench_report,
+}
+
+
+def run_benchmarks(only=None, **config):
+    """Run the selected benchmarks and return their results, ready to save."""
+    metrics = {}
+    for name in only or BENCHMARKS:
+        metrics.update(BENCHMARKS[name](**config))
+    return {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        "metrics": {name: metric._asdict() for name, metric in metrics.items()},
+    }
+
+
+def save_results(results, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as file:
+        json.dump(results, file, indent=2)
+
+
+def load_results(path):
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+def threshold_for(name, threshold, thresholds):
+    """A metric's threshold: its own, else the first matching pattern's, else the default."""
+    if name in thresholds:
+        return thresholds[name]
+    for pattern, fraction in thresholds.items():
+        if fnmatch.fnmatchcase(name, pattern):
+            return fraction
+    return threshold
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD, thresholds=None):
+    """Compare two results files' metrics; see the module docstring for the rules."""
+    thresholds = thresholds or {}
+    old, new = baseline["metrics"], current["metrics"]
+    comparisons = []
+    for name in sorted(set(old) | set(new)):
+        if name not in new:
+            comparisons.append(
+                Comparison(name, old[name]["value"], None, None, "missing", False)
+            )
+            continue
+        if name not in old:
+            comparisons.append(
+                Comparison(name, None, new[name]["value"], None, "new", False)
+            )
+            continue
+        before, after = old[name]["value"], new[name]["value"]
+        change = (after - before) / before if before else 0.0
+        worse = change if new[name]["better"] == LOWER else -change
+        regressed = worse > threshold_for(name, threshold, thresholds)
+        status = "REGRESSED" if regressed else "ok"
+        comparisons.append(Comparison(name, before, after, change, status, regressed))
+    return comparisons
+
+
+def format_comparison(comparisons):
+    """Render comparisons as an aligned plain-text table."""
+    header = ["metric", "baseline", "current", "change", "status"]
+    lines = [
+        [
+            item.name,
+            "-" if item.baseline is None else f"{item.baseline:.4g}",
+            "-" if item.current is None else f"{item.current:.4g}",
+            "-" if item.change is None else f"{item.change:+.1%}",
+            item.status,
+        ]
+        for item in comparisons
+    ]
+    widths = [max(len(cell) for cell in column) for column in zip(header, *lines)]
+    return "\n".join(
+        "  ".join(cell.ljust(width) for cell, width in zip(line, widths)).rstrip()
+        for line in [header, *lines]
+    )
+
+
+def parse_metric_threshold(value):
+    name, _, fraction = value.rpartition("=")
+    if not name:
+        raise argparse.ArgumentTypeError(f"expected name=fraction, got {value!r}")
+    return name, float(fraction)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the eval pipeline and compare against a baseline"
+    )
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=list(BENCHMARKS),
+        help="Benchmarks to run (default: all)",
+    )
+    parser.add_argument(
+        "--output",
+        help="Write results to this JSON file (default: reports/benchmarks_<ts>.json)",
+    )
+    parser.add_argument(
+        "--baseline",
+        help="Compare the results against this results file",
+    )
+    parser.add_argument(
+        "--compare",
+        nargs=2,
+        metavar=("BASELINE", "CURRENT"),
+        help="Compare two saved results files without running anything",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Fraction of the baseline a metric may worsen by before it fails",
+    )
+    parser.add_argument(
+        "--metric-threshold",
+        type=parse_metric_threshold,
+        action="append",
+        default=[],
+        help="Threshold for the metrics matching a glob pattern, e.g. "
+        "'report_s*=1.0' (repeatable)",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=DEFAULT_LATENCY,
+        help="Seconds the fake LLM server waits before each response",
+    )
+    parser.add_argument(
+        "--concurrency", nargs="+", type=int, default=DEFAULT_CONCURRENCY
+    )
+    parser.add_argument("--eval-rows", type=int, default=DEFAULT_EVAL_ROWS)
+    parser.add_argument("--bank-sizes", nargs="+", type=int, default=DEFAULT_BANK_SIZES)
+    parser.add_argument(
+        "--report-rows", nargs="+", type=int, default=DEFAULT_REPORT_ROWS
+    )
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Returns the exit status: 1 when a compared metric regressed."""
+    args = parse_args(argv)
+    if args.compare:
+        baseline, current = (load_results(path) for path in args.compare)
+    else:
+        current = run_benchmarks(
+            only=args.only,
+            latency=args.latency,
+            concurrency=args.concurrency,
+            eval_rows=args.eval_rows,
+            bank_sizes=args.bank_sizes,
+            report_rows=args.report_rows,
+            repeat=args.repeat,
+        )
+        timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = args.output or f"reports/benchmarks_{timestamp}.json"
+        save_results(current, path)
+        print(f"Benchmark results saved to {path}")
+        if not args.baseline:
+            for name, metric in current["metrics"].items():
+                print(f"{name}: {metric['value']:.4g} {metric['unit']}")
+            return 0
+        baseline = load_results(args.baseline)
+
+    comparisons = compare(
+        baseline, current, args.threshold, dict(args.metric_threshold)
+    )
+    print(format_comparison(comparisons))
+    regressed = [item.name for item in comparisons if item.regressed]
+    if regressed:
+        print(f"Regressed past the threshold: {', '.join(regressed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""Record/replay ("cassette") backend for offline eval runs.
+
+In ``record`` mode every completion that reaches the API is written to a JSON
+cassette; requests already on the cassette are answered from it. In ``replay`` mode
+the cassette is the only source of completions and an unknown request raises
+``CassetteMissError`` instead of calling the API, so runs are deterministic and
+work without network access.
+
+    EVAL_CASSETTE=cassettes/release.json EVAL_CASSETTE_MODE=record pytest test_release_evals.py
+    EVAL_CASSETTE=cassettes/release.json pytest test_release_evals.py
+"""
+
+import json
+import os
+import threading
+
+from langchain_core.caches import BaseCache
+
+from llm_cache import cache_key, deserialize_generations, serialize_generations
+
+RECORD = "record"
+REPLAY = "replay"
+
+
+class CassetteMissError(LookupError):
+    """Raised in replay mode when a request was never recorded."""
+
+
+class CassetteCache(BaseCache):
+    """LangChain cache that records completions to, or replays them from, a JSON file."""
+
+    def __init__(self, path, mode=REPLAY):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode '{mode}'")
+        self.path = path
+        self.mode = mode
+        self.hits = 0
+        self.recorded = 0
+        self._lock = threading.Lock()
+        self._entries = {}
+
+        if os.path.exists(path):
+            with open(path, "r") as file:
+                self._entries = json.load(file)
+        elif mode == REPLAY:
+            raise FileNotFoundError(f"The cassette at '{path}' was not found.")
+
+    def lookup(self, prompt, llm_string):
+        key = cache_key(prompt, llm_string)
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self.hits += 1
+                return deserialize_generations(payload)
+        if self.mode == REPLAY:
+            raise CassetteMissError(
+                f"No recorded completion for request {key[:12]} in '{self.path}'. "
+                f"Re-record it with EVAL_CASSETTE_MODE={RECORD}."
+            )
+        return None
+
+    def update(self, prompt, llm_string, return_val):
+        if self.mode != RECORD:
+            return
+        key = cache_key(prompt, llm_string)
+        with self._lock:
+            self._entries[key] = serialize_generations(return_val)
+            self.recorded += 1
+            self._save()
+
+    def clear(self, **kwargs):
+        with self._lock:
+            self._entries = {}
+            self._save()
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self._entries, file, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def count(self):
+        return len(self._entries)
+
+
+_cassettes = {}
+
+
+def get_cassette():
+    """Return the cassette configured by EVAL_CASSETTE, or None when it is unset."""
+    path = os.environ.get("EVAL_CASSETTE")
+    if not path:
+        return None
+    mode = os.environ.get("EVAL_CASSETTE_MODE", REPLAY).lower()
+    if (path, mode) not in _cassettes:
+        _cassettes[(path, mode)] = CassetteCache(path, mode=mode)
+    return _cassettes[(path, mode)]
@@ -0,0 +1,164 @@
+"""Local pre-router that answers clear-cut refusals without an LLM call.
+
+The system prompt tells the model to reply "I'm sorry I do not have information
+about that" for topics that are not in the quiz bank. When every word of a
+request's topic ("a quiz about books", "a history quiz") is a known out-of-bank
+topic (``OUT_OF_BANK_TOPICS``) and none comes near anything in the bank's
+categories, subjects or facts, the router returns that refusal itself. Everything
+else, including vague topics ("something fun") and words the router does not know
+("chemistry", "Europe"), goes to the model.
+
+A false refusal costs more than an extra model call, so matching against the bank
+is loose: words are compared by stem ("paintings" matches "Painted"), by prefix,
+and with the spaces between adjacent words removed ("Da Vinci" matches "DaVinci").
+"""
+
+import bisect
+import re
+import threading
+import time
+from collections import namedtuple
+
+from langchain_core.runnables import RunnableLambda
+
+from quiz_index import load_quiz_bank_index, tokenize
+
+REFUSAL = "I'm sorry I do not have information about that"
+
+REFUSE = "refuse"
+FORWARD = "forward"
+
+TOPIC_PATTERNS = [
+    re.compile(r"\b(?:about|on|regarding|covering|of)\s+([a-z' -]+)"),
+    re.compile(r"\b([a-z-]+)\s+(?:quiz|quizzes|test|questions|trivia)\b"),
+]
+
+# Words that describe the request itself rather than its topic
+FILLER = frozenset(
+    """quiz quizze test question trivia knowledge please generate give write make
+    create something stuff thing topic subject some general random any few more
+    me it my your them that""".split()
+)
+
+# Topics the bank is known not to cover: other quiz categories, and places that
+# are not among its subjects. Anything near a bank term is dropped at startup,
+# so adding a subject to the bank never leaves its topic refused here.
+OUT_OF_BANK_TOPICS = frozenset(
+    """history historical war book literature novel poetry poem author music song
+    band singer sport football soccer basketball baseball cricket tennis olympic
+    movie film cinema television celebrity video game math mathematic algebra
+    politic election economic business finance religion mythology cooking food
+    recipe fashion car rome london tokyo berlin madrid moscow beijing sydney""".split()
+)
+
+# Stems and prefixes shorter than this are too common to say two words are related
+MIN_STEM = 4
+SUFFIXES = ("ings", "ing", "ed", "es", "er", "s")
+WORD = re.compile(r"[a-z0-9]+")
+
+Route = namedtuple("Route", ["decision", "topic", "reason"])
+
+
+def stem(word):
+    """Crude suffix strip ("paintings", "painted" -> "paint") for near matches."""
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            return word[: -len(suffix)]
+    return word
+
+
+class CategoryRouter:
+    def __init__(self, index=None, out_of_bank_topics=OUT_OF_BANK_TOPICS):
+        self.index = index or load_quiz_bank_index()
+        terms = set(self.index.vocabulary)
+        for subject in self.index.subjects:
+            # Names with the spaces removed, e.g. "leonardodavinci"
+            terms.add("".join(WORD.findall(subject.name.lower())))
+        self.stems = sorted({stem(term) for term in terms})
+        self._stem_set = set(self.stems)
+        self.out_of_bank = {
+            stem(token)
+            for token in tokenize(" ".join(out_of_bank_topics))
+            if not self.is_near(token)
+        }
+        self.total = 0
+        self.refused = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def topic_tokens(self, question):
+        tokens = set()
+        for pattern in TOPIC_PATTERNS:
+            for match in pattern.findall(question.lower()):
+                tokens.update(tokenize(match))
+        return tokens - FILLER
+
+    def topic_phrases(self, question):
+        """Adjacent topic words written as one, so "da vinci" can match "davinci"."""
+        phrases = set()
+        for pattern in TOPIC_PATTERNS:
+            for match in pattern.findall(question.lower()):
+                words = [word for word in WORD.findall(match) if word not in FILLER]
+                phrases.update(a + b for a, b in zip(words, words[1:]))
+        return phrases
+
+    def is_near(self, word):
+        """True when word shares a stem or a MIN_STEM-long prefix with a bank term."""
+        word = stem(word)
+        if word in self._stem_set:
+            return True
+        if len(word) >= MIN_STEM:
+            # A bank term that starts with the word ("vinc" -> "vinci")
+            position = bisect.bisect_left(self.stems, word)
+            if position < len(self.stems) and self.stems[position].startswith(word):
+                return True
+            # The word starts with a bank term ("paintwork" -> "paint")
+            return any(
+                word[:length] in self._stem_set for length in range(MIN_STEM, len(word))
+            )
+        return False
+
+    def is_out_of_bank(self, word):
+        return stem(word) in self.out_of_bank
+
+    def classify(self, question):
+        start = time.perf_counter()
+        topic = self.topic_tokens(question)
+        if not topic:
+            route = Route(FORWARD, topic, "no topic found")
+        elif any(map(self.is_near, topic | self.topic_phrases(question))):
+            route = Route(FORWARD, topic, "topic found in quiz bank")
+        elif all(map(self.is_out_of_bank, topic)):
+            route = Route(REFUSE, topic, "topic not in quiz bank")
+        else:
+            route = Route(FORWARD, topic, "topic not recognised")
+
+        with self._lock:
+            self.total += 1
+            self.refused += route.decision == REFUSE
+            self.seconds += time.perf_counter() - start
+        return route
+
+    def stats(self):
+        return {
+            "requests": self.total,
+            "refused_locally": self.refused,
+            "forwarded": self.total - self.refused,
+            "refusal_rate": self.refused / self.total if self.total else 0.0,
+            "mean_route_us": 1e6 * self.seconds / self.total if self.total else 0.0,
+        }
+
+
+def routed_assistant_chain(assistant, router=None):
+    """Put the router in front of an assistant chain built by app.assistant_chain."""
+    router = router or CategoryRouter()
+
+    def route(inputs):
+        if router.classify(inputs["question"]).decision == REFUSE:
+            return REFUSAL
+        return assistant
+
+    async def aroute(inputs):
+        return route(inputs)
+
+    return RunnableLambda(route, afunc=aroute, name="CategoryRouter")
@@ -1,6 +1,47 @@
 import pytest
 import logging
-from langchain.callbacks.tracers.stdout import ConsoleCallbackHandler
+from metrics import MetricsCallbackHandler, format_summary
+from sequential import (
+    DEFAULT_CONFIDENCE,
+    DEFAULT_PASS_THRESHOLD,
+    SequentialTest,
+    assert_pass_rate,
+    format_result,
+)
+
+# One handler for the whole session so the summary covers every test
+session_metrics = MetricsCallbackHandler()
+# (test id, SequentialResult) for every check sampled through pass_rate_gate
+session_gates = []
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--metrics-json", help="Write per-call LLM metrics to this JSON file"
+    )
+    parser.addoption(
+        "--metrics-prom",
+        help="Write per-call LLM metrics to this file in the Prometheus text format",
+    )
+    parser.addoption(
+        "--samples",
+        type=int,
+        default=1,
+        help="Sample model-graded checks up to this many times, stopping once the "
+        "pass rate is decided (run with the LLM cache off)",
+    )
+    parser.addoption(
+        "--pass-threshold",
+        type=float,
+        default=DEFAULT_PASS_THRESHOLD,
+        help="Pass rate a sampled model-graded check must reach",
+    )
+    parser.addoption(
+        "--confidence",
+        type=float,
+        default=DEFAULT_CONFIDENCE,
+        help="Confidence of the sequential pass/fail decision",
+    )
 
 
 @pytest.fixture(scope="session", autouse=True)
@@ -16,5 +57,55 @@ def setup_logging():
 
 @pytest.fixture(scope="function")
 def langchain_tracer():
-    """Return a ConsoleCallbackHandler for LangChain tracing"""
-    return ConsoleCallbackHandler()
+    """Return the session's MetricsCallbackHandler for LangChain calls"""
+    return session_metrics
+
+
+@pytest.fixture
+def fake_llm():
+    """Return a factory for models that talk to a FakeOpenAIServer"""
+    from app import create_llm
+
+    def build(server, **kwargs):
+        return create_llm(base_url=server.base_url, openai_api_key="fake", **kwargs)
+
+    return build
+
+
+@pytest.fixture
+def pass_rate_gate(request):
+    """Assert a check's pass rate, sampling it up to --samples times.
+
+    With the default of one sample the check simply has to pass once.
+    """
+    config = request.config
+
+    def gate(check, message=None):
+        test = SequentialTest(
+            config.getoption("--pass-threshold"),
+            config.getoption("--confidence"),
+            max_samples=config.getoption("--samples"),
+        )
+        try:
+            result = assert_pass_rate(check, test, message)
+        finally:
+            session_gates.append((request.node.nodeid, test.result()))
+        return result
+
+    return gate
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    if config.getoption("--samples") > 1 and session_gates:
+        terminalreporter.section("Sequential pass rates")
+        for nodeid, result in session_gates:
+            terminalreporter.write_line(f"{nodeid}: {format_result(result)}")
+
+    if session_metrics.records:
+        terminalreporter.section("LLM call metrics")
+        terminalreporter.write_line(format_summary(session_metrics.summary()))
+
+    if config.getoption("--metrics-json"):
+        session_metrics.write_json(config.getoption("--metrics-json"))
+    if config.getoption("--metrics-prom"):
+        session_metrics.write_prometheus(config.getoption("--metrics-prom"))
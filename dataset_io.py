@@ -0,0 +1,117 @@
+"""Lazy dataset readers and an append-only results log for resumable eval runs.
+
+Datasets are JSONL (one example per line) or CSV files with ``input``,
+``response`` and ``subjects`` columns, where ``subjects`` is ``;``-separated.
+Rows are read one at a time, so memory does not grow with the dataset.
+
+The results log is a JSONL file with one graded row per line, written as soon as
+the row is graded. Rerunning against the same log skips the rows already in it.
+"""
+
+import csv
+import json
+import os
+
+DATASET_PATH = os.path.join("datasets", "quiz_requests.jsonl")
+
+
+def read_jsonl(path):
+    with open(path, "r") as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_csv(path):
+    with open(path, "r", newline="") as file:
+        for row in csv.DictReader(file):
+            subjects = row.get("subjects")
+            row["subjects"] = (
+                [subject.strip() for subject in subjects.split(";") if subject.strip()]
+                if subjects
+                else None
+            )
+            yield row
+
+
+def read_dataset(path=DATASET_PATH):
+    """Yield dataset rows lazily from a .jsonl or .csv file."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".jsonl", ".ndjson"):
+        return read_jsonl(path)
+    if extension == ".csv":
+        return read_csv(path)
+    raise ValueError(f"Unsupported dataset format '{extension}' for '{path}'")
+
+
+class ResultsLog:
+    """Append-only JSONL checkpoint of graded rows, keyed by dataset position."""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._repair()
+
+    def _repair(self):
+        # A crash mid-write leaves a torn last line; start the next record on a new one
+        if os.path.exists(self.path) and os.path.getsize(self.path):
+            with open(self.path, "rb+") as file:
+                file.seek(-1, os.SEEK_END)
+                if file.read(1) != b"\n":
+                    file.write(b"\n")
+
+    def completed(self):
+        """Map each logged row index to its input, skipping a torn final line.
+
+        Rows logged as failed are left out so a rerun evaluates them again.
+        """
+        done = {}
+        if not os.path.exists(self.path):
+            return done
+        with open(self.path, "r") as file:
+            for line in file:
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if result.get("status") == "failed":
+                    done.pop(result["index"], None)
+                else:
+                    done[result["index"]] = result["input"]
+        return done
+
+    def is_done(self, completed, index, row):
+        # A changed input at the same position means the dataset moved on
+        return completed.get(index) == row["input"]
+
+    def append(self, result):
+        with open(self.path, "a") as file:
+            file.write(json.dumps(result) + "\n")
+            file.flush()
+
+    def iter_results(self):
+        """Yield the logged results in dataset order, keeping the latest per row.
+
+        Only each row's offset in the log is held in memory; rows are read back
+        one at a time in index order.
+        """
+        offsets = {}
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as file:
+            offset = 0
+            for line in file:
+                try:
+                    offsets[json.loads(line)["index"]] = offset
+                except json.JSONDecodeError:
+                    pass
+                offset += len(line)
+            for index in sorted(offsets):
+                file.seek(offsets[index])
+                yield json.loads(file.readline())
+
+    def read(self):
+        """Return the logged results in dataset order, keeping the latest per row."""
+        return list(self.iter_results())
@@ -0,0 +1,436 @@
+"""Evaluate a dataset across a grid of models, temperatures, prompts and quiz banks.
+
+Every combination of ``--models``, ``--temperatures``, ``--prompts`` and
+``--quiz-banks`` is a cell. All cells run in one event loop through one
+scheduler (a shared row limit and a shared ``adaptive.ResilientCaller``), and
+one grader and one response cache serve the whole grid. Cells that resolve to
+the same model, temperature, system message and quiz bank are evaluated once.
+Each cell is recorded as a run in the results store, and the job ends with one
+comparison table:
+
+    python eval_matrix.py --models gpt-3.5-turbo gpt-4o-mini --temperatures 0 0.7 \\
+        --prompts default prompts/concise.txt --quiz-banks quiz_bank.txt
+
+A prompt variant is a text file with a ``{quiz_bank}`` placeholder; ``default``
+is ``app.build_system_message``. ``default`` as a quiz bank is ``quiz_bank.txt``.
+"""
+
+import argparse
+import asyncio
+import datetime
+import functools
+import itertools
+import json
+import logging
+import os
+from collections import namedtuple
+
+from adaptive import AdaptiveConcurrency, ResilientCaller, RetryPolicy
+from app import (
+    QUIZ_BANK_PATH,
+    assistant_chain,
+    build_system_message,
+    create_llm,
+)
+from dataset_io import DATASET_PATH, read_dataset
+from graders import quiz_bank_system_prompt, quiz_bank_user_message
+from metrics import ASSISTANT, GRADER, MetricsCallbackHandler, percentile
+from results_store import DEFAULT_STORE_PATH, ResultsStore, fingerprint, parse_decision
+from single_flight import SingleFlight
+from save_eval_artifacts import (
+    DEFAULT_MAX_CONCURRENCY,
+    aevaluate_row,
+    create_eval_chain,
+    setup_logging,
+)
+import llm_cache
+
+DEFAULT = "default"
+DEFAULT_GRADER_MODEL = "gpt-3.5-turbo"
+
+# USD per million (prompt, completion) tokens; override with --prices
+PRICES_PER_MILLION = {
+    "gpt-3.5-turbo": (0.5, 1.5),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4-turbo": (10.0, 30.0),
+}
+
+Cell = namedtuple("Cell", ["model", "temperature", "prompt", "quiz_bank"])
+
+TABLE_COLUMNS = [
+    ("model", "{}"),
+    ("temperature", "{}"),
+    ("prompt", "{}"),
+    ("quiz_bank", "{}"),
+    ("pass_rate", "{:.1%}"),
+    ("failed", "{}"),
+    ("latency_p50_s", "{:.2f}"),
+    ("latency_p95_s", "{:.2f}"),
+    ("tokens", "{}"),
+    ("cost_usd", "{:.4f}"),
+]
+
+
+def expand_grid(models, temperatures, prompts=(DEFAULT,), quiz_banks=(DEFAULT,)):
+    return [
+        Cell(*values)
+        for values in itertools.product(models, temperatures, prompts, quiz_banks)
+    ]
+
+
+def variant_name(path):
+    return path if path == DEFAULT else os.path.splitext(os.path.basename(path))[0]
+
+
+def read_text(path):
+    # Unlike app.read_file_into_string, a missing variant file stops the job
+    with open(path, "r") as file:
+        return file.read()
+
+
+def resolve_cell(cell):
+    """Return (system_message, quiz_bank) for a cell."""
+    quiz_bank = read_text(
+        QUIZ_BANK_PATH if cell.quiz_bank == DEFAULT else cell.quiz_bank
+    )
+    if cell.prompt == DEFAULT:
+        return build_system_message(quiz_bank), quiz_bank
+    return read_text(cell.prompt).replace("{quiz_bank}", quiz_bank), quiz_bank
+
+
+def cell_key(cell, system_message, quiz_bank):
+    return fingerprint(
+        f"{cell.model}\x00{float(cell.temperature)}\x00{system_message}\x00{quiz_bank}"
+    )
+
+
+def cost_usd(model, prompt_tokens, completion_tokens, prices=PRICES_PER_MILLION):
+    if model not in prices:
+        return None
+    prompt_price, completion_price = prices[model]
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1e6
+
+
+def split_grader_usage(cells):
+    """Grader (prompt, completion) tokens per cell, with shared grades split evenly.
+
+    ``cells`` holds (quiz_bank, results, metrics) per cell. A grade coalesced by
+    ``SingleFlight`` is recorded in the metrics of the cell whose row made the
+    call; here each row that received the grade pays an equal share of it.
+    """
+    spent = {}
+    receivers = {}
+    cell_keys = []
+    for quiz_bank, results, metrics in cells:
+        # The grader is deterministic: one grade per answer and quiz bank
+        keys = {
+            result["index"]: fingerprint(f"{quiz_bank}\x00{result['output']}")
+            for result in results
+            if result.get("output") is not None
+        }
+        for record in metrics.row_records():
+            if record["chain"] == GRADER and record["row_index"] in keys:
+                tokens = spent.setdefault(keys[record["row_index"]], [0, 0])
+                tokens[0] += record["prompt_tokens"]
+                tokens[1] += record["completion_tokens"]
+        for key in keys.values():
+            receivers[key] = receivers.get(key, 0) + 1
+        cell_keys.append(keys.values())
+
+    usage = []
+    for keys in cell_keys:
+        prompt_tokens = completion_tokens = 0.0
+        for key in keys:
+            prompt, completion = spent.get(key, (0, 0))
+            prompt_tokens += prompt / receivers[key]
+            completion_tokens += completion / receivers[key]
+        usage.append((prompt_tokens, completion_tokens))
+    return usage
+
+
+def summarize_cell(
+    cell, results, metrics, grader_model, prices=PRICES_PER_MILLION, grader_usage=None
+):
+    decisions = [parse_decision(result["grader_response"]) for result in results]
+    graded = [decision for decision in decisions if decision is not None]
+    latencies = [
+        result["assistant_latency_s"]
+        for result in results
+        if result.get("assistant_latency_s") is not None
+    ]
+    usage = metrics.summary()
+    assistant = usage.get(ASSISTANT, {})
+    prompt_tokens = assistant.get("prompt_tokens", 0)
+    completion_tokens = assistant.get("completion_tokens", 0)
+    if grader_usage is None:
+        grader = usage.get(GRADER, {})
+        grader_usage = (
+            grader.get("prompt_tokens", 0),
+            grader.get("completion_tokens", 0),
+        )
+    costs = [
+        cost_usd(cell.model, prompt_tokens, completion_tokens, prices),
+        cost_usd(grader_model, *grader_usage, prices),
+    ]
+    return {
+        "model": cell.model,
+        "temperature": cell.temperature,
+        "prompt": variant_name(cell.prompt),
+        "quiz_bank": variant_name(cell.quiz_bank),
+        "rows": len(results),
+        "graded": len(graded),
+        "pass_rate": graded.count("Y") / len(graded) if graded else None,
+        "failed": sum(result.get("status") == "failed" for result in results),
+        "latency_p50_s": percentile(latencies, 0.5),
+        "latency_p95_s": percentile(latencies, 0.95),
+        "tokens": prompt_tokens + completion_tokens,
+        "grader_tokens": round(sum(grader_usage)),
+        "cost_usd": None if None in costs else sum(costs),
+    }
+
+
+async def arun_matrix(
+    cells,
+    dataset,
+    max_concurrency=DEFAULT_MAX_CONCURRENCY,
+    caller=None,
+    llm_factory=create_llm,
+    grader_model=DEFAULT_GRADER_MODEL,
+    prices=PRICES_PER_MILLION,
+    store=None,
+    dataset_path=None,
+    flight=None,
+):
+    """Evaluate every distinct cell on the dataset and return one summary per cell.
+
+    Rows from all cells share one ``max_concurrency`` limit and ``caller``, so
+    the grid is scheduled as a single job rather than one run per cell. With a
+    ``SingleFlight`` the shared grader grades each distinct answer once, even
+    when several cells produce it, and the cells split its cost. Assistant
+    calls are only shared in temperature 0 cells; at a higher temperature a
+    repeated input is another sample, not the same request.
+    """
+    logger = logging.getLogger()
+    unique = {}
+    for cell in cells:
+        system_message, quiz_bank = resolve_cell(cell)
+        key = cell_key(cell, system_message, quiz_bank)
+        if key in unique:
+            logger.info(f"Skipping {cell}: same as {unique[key][0]}")
+            continue
+        unique[key] = (cell, system_message, quiz_bank)
+    logger.info(
+        f"Evaluating {len(unique)} cells ({len(cells) - len(unique)} duplicates) "
+        f"on {len(dataset)} rows"
+    )
+
+    if caller is not None:
+        # The caller owns retries, so throttling reaches its concurrency limit
+        llm_factory = functools.partial(llm_factory, max_retries=0)
+    grader = create_eval_chain(llm=llm_factory(model=grader_model, temperature=0))
+    if flight is not None:
+        grader = flight.wrap(grader, "grader")
+    llms = {}
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def evaluate_row(idx, row, quiz_bank, assistant, metrics):
+        async with semaphore:
+            result = await aevaluate_row(
+                idx, row, quiz_bank, assistant, grader, [metrics], caller
+            )
+            return {"index": idx, **result}
+
+    runs = []
+    for key, (cell, system_message, quiz_bank) in unique.items():
+        llm_key = (cell.model, float(cell.temperature))
+        if llm_key not in llms:
+            llms[llm_key] = llm_factory(
+                model=cell.model, temperature=float(cell.temperature)
+            )
+        assistant = assistant_chain(system_message=system_message, llm=llms[llm_key])
+        if flight is not None and float(cell.temperature) == 0:
+            assistant = flight.wrap(assistant, key)
+        runs.append(
+            (cell, system_message, quiz_bank, assistant, MetricsCallbackHandler())
+        )
+
+    # Row-major order, so every cell sees the same load while the grid runs
+    tasks = {}
+    for idx, row in enumerate(dataset):
+        for run, (cell, _, quiz_bank, assistant, metrics) in enumerate(runs):
+            tasks[run, idx] = asyncio.ensure_future(
+                evaluate_row(idx, row, quiz_bank, assistant, metrics)
+            )
+    await asyncio.gather(*tasks.values())
+
+    results_by_run = [
+        [tasks[run, idx].result() for idx in range(len(dataset))]
+        for run in range(len(runs))
+    ]
+    grader_usage = [None] * len(runs)
+    if flight is not None:
+        grader_usage = split_grader_usage(
+            [
+                (quiz_bank, results, metrics)
+                for (_, _, quiz_bank, _, metrics), results in zip(runs, results_by_run)
+            ]
+        )
+
+    matrix_id = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    table = []
+    for run, (cell, system_message, quiz_bank, _, metrics) in enumerate(runs):
+        results = results_by_run[run]
+        summary = summarize_cell(
+            cell, results, metrics, grader_model, prices, grader_usage[run]
+        )
+        if store is not None:
+            run_id = store.start_run(
+                model=cell.model,
+                temperature=float(cell.temperature),
+                prompt_hash=fingerprint(system_message),
+                grader_prompt_hash=fingerprint(
+                    quiz_bank_system_prompt + quiz_bank_user_message
+                ),
+                quiz_bank_hash=fingerprint(quiz_bank),
+                dataset=dataset_path,
+                matrix=matrix_id,
+                prompt_variant=cell.prompt,
+                quiz_bank_path=cell.quiz_bank,
+                grader_model=grader_model,
+            )
+            store.append_results(run_id, results)
+            summary["run_id"] = run_id
+        table.append(summary)
+
+    table.sort(
+        key=lambda row: (
+            -(row["pass_rate"] or 0),
+            row["cost_usd"] if row["cost_usd"] is not None else float("inf"),
+        )
+    )
+    return table
+
+
+def format_table(table):
+    """Render cell summaries as an aligned plain-text table."""
+    header = [name for name, _ in TABLE_COLUMNS]
+    lines = [
+        [
+            "-" if row[name] is None else template.format(row[name])
+            for name, template in TABLE_COLUMNS
+        ]
+        for row in table
+    ]
+    widths = [max(len(cell) for cell in column) for column in zip(header, *lines)]
+    return "\n".join(
+        "  ".join(cell.ljust(width) for cell, width in zip(line, widths)).rstrip()
+        for line in [header, *lines]
+    )
+
+
+def load_prices(path):
+    prices = dict(PRICES_PER_MILLION)
+    if path:
+        with open(path, "r") as file:
+            prices.update(
+                {model: tuple(price) for model, price in json.load(file).items()}
+            )
+    return prices
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Evaluate a dataset across models, temperatures, prompts and quiz banks"
+    )
+    parser.add_argument("--models", nargs="+", default=["gpt-3.5-turbo"])
+    parser.add_argument("--temperatures", nargs="+", type=float, default=[0.0])
+    parser.add_argument(
+        "--prompts",
+        nargs="+",
+        default=[DEFAULT],
+        help="System prompt templates with a {quiz_bank} placeholder, or 'default'",
+    )
+    parser.add_argument(
+        "--quiz-banks",
+        nargs="+",
+        default=[DEFAULT],
+        help="Quiz bank files, or 'default' for quiz_bank.txt",
+    )
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument(
+        "--grader-model",
+        default=DEFAULT_GRADER_MODEL,
+        help="Model grading every cell, so pass rates stay comparable",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=DEFAULT_MAX_CONCURRENCY,
+        help="Maximum number of rows in flight across the whole grid",
+    )
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--results-store", default=DEFAULT_STORE_PATH)
+    parser.add_argument(
+        "--prices",
+        help="JSON file mapping model names to [prompt, completion] USD per million tokens",
+    )
+    parser.add_argument(
+        "--cache",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Serve repeated prompts from the on-disk LLM cache (default: EVAL_LLM_CACHE)",
+    )
+    parser.add_argument(
+        "--dedupe",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Share one call between identical requests across the grid (default: on)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    llm_cache.configure_llm_cache(enabled=args.cache)
+    logger = setup_logging()
+
+    cells = expand_grid(args.models, args.temperatures, args.prompts, args.quiz_banks)
+    caller = ResilientCaller(
+        AdaptiveConcurrency(
+            initial_limit=min(4, args.max_concurrency),
+            max_limit=args.max_concurrency,
+        ),
+        RetryPolicy(max_attempts=args.max_retries + 1),
+    )
+    flight = SingleFlight() if args.dedupe else None
+    store = ResultsStore(args.results_store)
+    table = asyncio.run(
+        arun_matrix(
+            cells,
+            list(read_dataset(args.dataset)),
+            max_concurrency=args.max_concurrency,
+            caller=caller,
+            grader_model=args.grader_model,
+            prices=load_prices(args.prices),
+            store=store,
+            dataset_path=args.dataset,
+            flight=flight,
+        )
+    )
+    store.close()
+
+    os.makedirs("reports", exist_ok=True)
+    timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = f"reports/eval_matrix_{timestamp}.json"
+    with open(path, "w") as file:
+        json.dump(table, file, indent=2)
+    logger.info(f"Call retry stats: {caller.stats()}")
+    if flight is not None:
+        logger.info(f"Request dedupe stats: {flight.stats()}")
+    logger.info(f"Comparison table saved to {path}")
+    print(format_table(table))
+
+
+if __name__ == "__main__":
+    main()
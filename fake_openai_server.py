@@ -0,0 +1,293 @@
+"""Local OpenAI-compatible stand-in for offline and load-testing runs.
+
+Serves ``POST /v1/chat/completions`` (plain and streaming) with configurable
+latency and error injection, so the assistant and grader chains can be exercised
+without network access by pointing ``ChatOpenAI`` at it:
+
+    python fake_openai_server.py --port 8765 --latency 0.2 --error-rate 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake python save_eval_artifacts.py
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+delimiter = "####"
+
+DEFAULT_QUIZ = (
+    f"Question 1:{delimiter} What is the capital of France?\n\n"
+    f"Question 2:{delimiter} Which museum in Paris displays the Mona Lisa?\n\n"
+    f"Question 3:{delimiter} What is the most populous city in France?"
+)
+
+PACKED_QUIZ_PATTERN = re.compile(r"\[Quiz \d+\]:")
+
+
+def default_responder(messages):
+    """Answer graders with "Y" and everything else with a quiz about Paris."""
+    system = next((m["content"] for m in messages if m["role"] == "system"), "")
+    if "evaluates" in system:
+        user = next((m["content"] for m in messages if m["role"] == "user"), "")
+        quizzes = len(PACKED_QUIZ_PATTERN.findall(user))
+        if quizzes:
+            # Packed grading: one verdict line per quiz
+            return "\n".join(
+                f"Quiz {number}: Decision: Y | Explanation: Uses quiz bank facts"
+                for number in range(1, quizzes + 1)
+            )
+        return "Y"
+    return DEFAULT_QUIZ
+
+
+def count_tokens(text):
+    # Whitespace tokens are close enough for throughput and cost estimates
+    return len(text.split())
+
+
+class FakeOpenAIServer:
+    """Threaded HTTP server speaking the chat completions API.
+
+    ``responder`` maps the request messages to the completion text. Each request
+    sleeps ``latency`` seconds (plus up to ``jitter``) and fails with
+    ``error_status`` with probability ``error_rate``; streamed responses also wait
+    ``token_latency`` seconds before every token.
+    """
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        latency=0.0,
+        jitter=0.0,
+        token_latency=0.0,
+        error_rate=0.0,
+        error_status=429,
+        retry_after=0.05,
+        responder=default_responder,
+        seed=0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.token_latency = token_latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.responder = responder
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.cancelled = 0
+        self._random = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "peak_in_flight": self.peak_in_flight,
+            "cancelled": self.cancelled,
+        }
+
+    def _begin(self):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            fail = self._random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+            return delay, fail, next(self._ids)
+
+    def _end(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                logging.getLogger(__name__).debug(format % args)
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "Not found"}})
+                    return
+
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                delay, fail, request_id = server._begin()
+                try:
+                    time.sleep(delay)
+                    if fail:
+                        self._send_error()
+                        return
+                    content = server.responder(body.get("messages", []))
+                    if body.get("stream"):
+                        self._stream(body, content, request_id)
+                    else:
+                        self._send_json(
+                            200, self._completion(body, content, request_id)
+                        )
+                finally:
+                    server._end()
+
+            def _usage(self, body, content):
+                prompt = " ".join(str(m.get("content", "")) for m in body["messages"])
+                prompt_tokens = count_tokens(prompt)
+                completion_tokens = count_tokens(content)
+                return {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                }
+
+            def _completion(self, body, content, request_id):
+                return {
+                    "id": f"chatcmpl-fake-{request_id}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "fake"),
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": content},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": self._usage(body, content),
+                }
+
+            def _stream(self, body, content, request_id):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+
+                def chunk(delta, finish_reason=None, usage=None):
+                    payload = {
+                        "id": f"chatcmpl-fake-{request_id}",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": body.get("model", "fake"),
+                        "choices": (
+                            [
+                                {
+                                    "index": 0,
+                                    "delta": delta,
+                                    "finish_reason": finish_reason,
+                                }
+                            ]
+                            if usage is None
+                            else []
+                        ),
+                    }
+                    if usage is not None:
+                        payload["usage"] = usage
+                    self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode())
+                    self.wfile.flush()
+
+                try:
+                    chunk({"role": "assistant", "content": ""})
+                    for token in re.findall(r"\s*\S+\s*", content):
+                        time.sleep(server.token_latency)
+                        chunk({"content": token})
+                    chunk({}, finish_reason="stop")
+                    if body.get("stream_options", {}).get("include_usage"):
+                        chunk(None, usage=self._usage(body, content))
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client stopped reading, e.g. after an early exit
+                    with server._lock:
+                        server.cancelled += 1
+
+            def _send_error(self):
+                message = (
+                    "Rate limit reached" if server.error_status == 429 else "Error"
+                )
+                self._send_json(
+                    server.error_status,
+                    {"error": {"message": message, "type": "injected_error"}},
+                    headers={"retry-after-ms": str(int(server.retry_after * 1000))},
+                )
+
+            def _send_json(self, status, payload, headers=None):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a local OpenAI stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--token-latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=429)
+    args = parser.parse_args(argv)
+
+    server = FakeOpenAIServer(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        token_latency=args.token_latency,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+    )
+    logging.getLogger().info(f"Serving fake OpenAI API at {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logging.getLogger().info(f"Server stats: {server.stats()}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
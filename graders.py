@@ -0,0 +1,424 @@
+"""Build-once, templated grader chains shared by the evals and the tests.
+
+Each grader is a ``ChatPromptTemplate | llm | parser`` chain whose quiz and
+context are supplied at invoke time, so one chain grades any number of responses
+and can be cached, batched or reused:
+
+    grader = get_format_grader()
+    grader.invoke({"agent_response": quiz})
+    grade_batch(grader, [{"agent_response": quiz} for quiz in quizzes])
+"""
+
+import asyncio
+import os
+import re
+import threading
+from collections import namedtuple
+from functools import lru_cache
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+
+from adaptive import release_slot
+from app import delimiter, get_default_llm
+
+DEFAULT_MAX_CONCURRENCY = int(os.environ.get("EVAL_MAX_CONCURRENCY", "8"))
+
+# Format grader: does the response look like a quiz? Inputs: agent_response
+format_system_prompt = f"""You are an assistant that evaluates whether or not an assistant is producing valid quizzes.
+  The assistant should be producing output in the format of Question N:{delimiter} <question N>?"""
+
+format_user_message = """You are evaluating a generated quiz based on the context that the assistant uses to create the quiz.
+  Here is the data:
+    [BEGIN DATA]
+    ************
+    [Response]: {agent_response}
+    ************
+    [END DATA]
+
+Read the response carefully and determine if it looks like a quiz or test. Do not evaluate if the information is correct
+only evaluate if the data is in the expected format.
+
+Output Y if the response is a quiz, output N if the response does not look like a quiz.
+"""
+
+# Hallucination grader: Y/N on whether the quiz only uses quiz bank facts.
+# Inputs: context, agent_response
+hallucination_system_prompt = """You are an assistant that evaluates how well the quiz assistant
+    creates quizzes for a user by looking at the set of facts available to the assistant.
+    Your primary concern is making sure that ONLY facts available are used. Helpful quizzes only contain facts in the
+    test set"""
+
+hallucination_user_message = """You are evaluating a generated quiz based on the context that the assistant uses to create the quiz.
+  Here is the data:
+    [BEGIN DATA]
+    ************
+    [Question Bank]: {context}
+    ************
+    [Quiz]: {agent_response}
+    ************
+    [END DATA]
+
+Compare the content of the submission with the question bank using the following steps
+
+1. Review the question bank carefully. These are the only facts the quiz can reference
+2. Compare the quiz to the question bank.
+3. Ignore differences in grammar or punctuation
+4. If a fact is in the quiz, but not in the question bank the quiz if bad.
+
+Remember, the quizzes need to only include facts the assistant is aware of. It is dangerous to allow made up facts.
+
+Output Y if the quiz only contains facts from the question bank, output N if it contains facts that are not in the question bank.
+"""
+
+# Quiz bank grader: decision plus explanation. Inputs: context, agent_response
+quiz_bank_system_prompt = """You are an assistant that evaluates how well the quiz assistant
+    creates quizzes for a user by looking at the set of facts available to the assistant.
+    Your primary concern is making sure that ONLY facts available are used. Helpful quizzes only contain facts in the
+    test set"""
+
+quiz_bank_user_message = """You are evaluating a generated quiz based on the question bank that the assistant uses to create the quiz.
+  Here is the data:
+    [BEGIN DATA]
+    ************
+    [Question Bank]: {context}
+    ************
+    [Quiz]: {agent_response}
+    ************
+    [END DATA]
+
+## Examples of quiz questions
+Subject: <subject>
+   Categories: <category1>, <category2>
+   Facts:
+    - <fact 1>
+    - <fact 2>
+
+## Steps to make a decision
+Compare the content of the submission with the question bank using the following steps
+
+1. Review the question bank carefully. These are the only facts the quiz can reference
+2. Compare the information in the quiz to the question bank.
+3. Ignore differences in grammar or punctuation
+
+Remember, the quizzes should only include information from the question bank.
+
+
+## Additional rules
+- Output an explanation of whether the quiz only references information in the context.
+- Make the explanation brief only include a summary of your reasoning for the decsion.
+- Include a clear "Yes" or "No" as the first paragraph.
+- Reference facts from the quiz bank if the answer is yes
+
+Separate the decision and the explanation. For example:
+
+************
+Decision: <Y>
+************
+Explanation: <Explanation>
+************
+"""
+
+# Packed quiz bank grader: many quizzes against one copy of the bank.
+# Inputs: count, context, quizzes
+packed_user_message = """You are evaluating {count} generated quizzes based on the question bank that the assistant uses to create them.
+  Here is the data:
+    [BEGIN DATA]
+    ************
+    [Question Bank]: {context}
+    ************
+{quizzes}
+    [END DATA]
+
+## Steps to make a decision
+Grade every quiz on its own. Compare the content of each quiz with the question bank using the following steps
+
+1. Review the question bank carefully. These are the only facts the quizzes can reference
+2. Compare the information in the quiz to the question bank.
+3. Ignore differences in grammar or punctuation
+
+Remember, the quizzes should only include information from the question bank.
+
+## Output format
+Output exactly one line per quiz, in quiz order, and nothing else:
+
+Quiz <number>: Decision: <Y or N> | Explanation: <brief summary of your reasoning>
+"""
+
+PACKED_LINE_PATTERN = re.compile(
+    r"^\W*Quiz\s*(\d+)\s*:?\W*Decision:\s*<?\s*(Y|N)\b>?\s*\|?\s*"
+    r"(?:Explanation:\s*)?(.*)$",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+PackedVerdict = namedtuple("PackedVerdict", ["decision", "explanation"])
+
+
+def _build_grader(system_prompt, user_message, llm=None, output_parser=None):
+    eval_prompt = ChatPromptTemplate.from_messages(
+        [
+            ("system", system_prompt),
+            ("human", user_message),
+        ]
+    )
+    llm = (llm or get_default_llm()).with_config(tags=["grader"])
+    return eval_prompt | llm | (output_parser or StrOutputParser())
+
+
+def create_format_grader(llm=None, output_parser=None):
+    return _build_grader(format_system_prompt, format_user_message, llm, output_parser)
+
+
+def create_hallucination_grader(llm=None, output_parser=None):
+    return _build_grader(
+        hallucination_system_prompt, hallucination_user_message, llm, output_parser
+    )
+
+
+def prune_context(grader, quiz_bank_index=None):
+    """Grade against only the quiz bank subjects the quiz references."""
+    if quiz_bank_index is None:
+        return grader
+    return (
+        RunnablePassthrough.assign(
+            context=lambda inputs: quiz_bank_index.render_for_quiz(
+                inputs["agent_response"]
+            )
+        )
+        | grader
+    )
+
+
+def create_quiz_bank_grader(llm=None, output_parser=None, quiz_bank_index=None):
+    grader = _build_grader(
+        quiz_bank_system_prompt, quiz_bank_user_message, llm, output_parser
+    )
+    return prune_context(grader, quiz_bank_index)
+
+
+def render_quizzes(responses):
+    return "".join(
+        f"    [Quiz {number}]: {response}\n    ************\n"
+        for number, response in enumerate(responses, start=1)
+    )
+
+
+def parse_packed_verdicts(text, count):
+    """Map quiz number (1..count) to its verdict; unparseable quizzes are left out."""
+    verdicts = {}
+    for match in PACKED_LINE_PATTERN.finditer(text):
+        number = int(match.group(1))
+        if 1 <= number <= count and number not in verdicts:
+            verdicts[number] = PackedVerdict(
+                match.group(2).upper(), match.group(3).strip()
+            )
+    return verdicts
+
+
+def render_packed_verdict(verdict):
+    """Format a packed verdict like the per-item quiz bank grader."""
+    return f"Decision: {verdict.decision}\nExplanation: {verdict.explanation}"
+
+
+class PackedGrader:
+    """Grades up to pack_size quizzes per request against a single copy of the quiz bank.
+
+    Quizzes whose verdict cannot be parsed from the packed answer are regraded one
+    at a time with the per-item quiz bank grader. As a runnable, concurrent
+    ``ainvoke`` calls with the same context are collected into packs, flushed when
+    full or after max_wait seconds.
+
+    Under an ``adaptive.ResilientCaller``, items give back their caller slot while
+    they wait for a pack, and each pack takes one slot of ``concurrency`` for its
+    requests, so the limit counts HTTP requests rather than waiting items.
+
+    A packed request runs with the first item's callbacks and tags, and its
+    metadata lists every item's ``row_index`` under ``packed_rows``, so
+    ``metrics.MetricsCallbackHandler`` records it once with the rows it graded.
+    """
+
+    def __init__(
+        self, llm=None, item_grader=None, pack_size=8, max_wait=0.05, concurrency=None
+    ):
+        self.packed_grader = _build_grader(
+            quiz_bank_system_prompt, packed_user_message, llm
+        )
+        self.item_grader = item_grader or create_quiz_bank_grader(llm=llm)
+        self.pack_size = pack_size
+        self.max_wait = max_wait
+        self.concurrency = concurrency
+        self.requests = 0
+        self.items = 0
+        self.fallbacks = 0
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._tasks = set()
+
+    def _packed_inputs(self, context, responses):
+        return {
+            "count": len(responses),
+            "context": context,
+            "quizzes": render_quizzes(responses),
+        }
+
+    def _packs(self, responses):
+        for start in range(0, len(responses), self.pack_size):
+            yield responses[start : start + self.pack_size]
+
+    def _parse(self, context, pack, text):
+        verdicts = parse_packed_verdicts(text, len(pack))
+        missing = [n for n in range(1, len(pack) + 1) if n not in verdicts]
+        with self._lock:
+            self.requests += 1
+            self.items += len(pack)
+            self.fallbacks += len(missing)
+        fallback_inputs = [
+            {"context": context, "agent_response": pack[n - 1]} for n in missing
+        ]
+        return verdicts, missing, fallback_inputs
+
+    def _render(self, verdicts, count):
+        return [
+            (
+                render_packed_verdict(verdicts[n])
+                if isinstance(verdicts[n], PackedVerdict)
+                else verdicts[n]
+            )
+            for n in range(1, count + 1)
+        ]
+
+    def grade(self, context, responses):
+        """Grade responses against context, returning one grader response per item."""
+        results = []
+        for pack in self._packs(list(responses)):
+            text = self.packed_grader.invoke(self._packed_inputs(context, pack))
+            verdicts, missing, fallback_inputs = self._parse(context, pack, text)
+            verdicts.update(zip(missing, self.item_grader.batch(fallback_inputs)))
+            results.extend(self._render(verdicts, len(pack)))
+        return results
+
+    async def agrade(self, context, responses, configs=None):
+        """Grade responses concurrently; ``configs`` holds each item's run config."""
+        responses = list(responses)
+        configs = list(configs or [None] * len(responses))
+        graded = await asyncio.gather(
+            *(
+                self._agrade_pack(context, pack, pack_configs)
+                for pack, pack_configs in zip(
+                    self._packs(responses), self._packs(configs)
+                )
+            )
+        )
+        return [result for results in graded for result in results]
+
+    def _pack_config(self, configs):
+        configs = [config for config in configs if config]
+        if not configs:
+            return None
+        first = configs[0]
+        rows = [(config.get("metadata") or {}).get("row_index") for config in configs]
+        return {
+            "callbacks": first.get("callbacks"),
+            "tags": first.get("tags", []),
+            "metadata": {**(first.get("metadata") or {}), "packed_rows": rows},
+        }
+
+    async def _agrade_pack(self, context, pack, configs):
+        if self.concurrency is not None:
+            await self.concurrency.acquire()
+        try:
+            text = await self.packed_grader.ainvoke(
+                self._packed_inputs(context, pack), config=self._pack_config(configs)
+            )
+            verdicts, missing, fallback_inputs = self._parse(context, pack, text)
+            regraded = await self.item_grader.abatch(
+                fallback_inputs, config=[configs[n - 1] or {} for n in missing]
+            )
+        finally:
+            if self.concurrency is not None:
+                await self.concurrency.release()
+        verdicts.update(zip(missing, regraded))
+        return self._render(verdicts, len(pack))
+
+    def invoke_one(self, inputs, config=None):
+        # Synchronous callers get no packing partners; grade the item on its own
+        return self.item_grader.invoke(inputs, config=config)
+
+    async def ainvoke_one(self, inputs, config=None):
+        await release_slot()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        context = inputs["context"]
+        group = self._pending.setdefault(context, [])
+        group.append((inputs["agent_response"], future, config))
+        if len(group) >= self.pack_size:
+            self._flush(context, group)
+        elif len(group) == 1:
+            loop.call_later(self.max_wait, self._flush, context, group)
+        return await future
+
+    def _flush(self, context, group):
+        if self._pending.get(context) is not group:
+            return
+        del self._pending[context]
+        task = asyncio.ensure_future(self._grade_group(context, group))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _grade_group(self, context, group):
+        try:
+            results = await self.agrade(
+                context,
+                [response for response, _, _ in group],
+                [config for _, _, config in group],
+            )
+        except Exception as error:
+            for _, future, _ in group:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for (_, future, _), result in zip(group, results):
+            if not future.done():
+                future.set_result(result)
+
+    def as_runnable(self):
+        return RunnableLambda(
+            self.invoke_one, afunc=self.ainvoke_one, name="PackedGrader"
+        )
+
+    def stats(self):
+        return {
+            "packed_requests": self.requests,
+            "items": self.items,
+            "fallback_items": self.fallbacks,
+            "items_per_request": self.items / self.requests if self.requests else 0.0,
+        }
+
+
+@lru_cache(maxsize=None)
+def get_format_grader():
+    return create_format_grader()
+
+
+@lru_cache(maxsize=None)
+def get_hallucination_grader():
+    return create_hallucination_grader()
+
+
+@lru_cache(maxsize=None)
+def get_quiz_bank_grader():
+    return create_quiz_bank_grader()
+
+
+def grade_batch(grader, inputs, max_concurrency=DEFAULT_MAX_CONCURRENCY, config=None):
+    """Grade many responses in one pass with at most max_concurrency calls in flight."""
+    config = {**(config or {}), "max_concurrency": max_concurrency}
+    return grader.batch(list(inputs), config=config)
+
+
+async def agrade_batch(
+    grader, inputs, max_concurrency=DEFAULT_MAX_CONCURRENCY, config=None
+):
+    config = {**(config or {}), "max_concurrency": max_concurrency}
+    return await grader.abatch(list(inputs), config=config)
@@ -0,0 +1,133 @@
+"""Local grounding check in front of the LLM hallucination grader.
+
+Each generated question is matched against the quiz bank facts by token overlap,
+with fuzzy matching for misspellings. A quiz passes locally only when every content
+word of every question is found in a single subject. Quizzes with a question
+that shares almost nothing with the bank fail locally, and everything in between,
+such as a quiz with one made-up detail, escalates to the LLM grader.
+"""
+
+import difflib
+import threading
+from collections import namedtuple
+from functools import lru_cache
+
+from langchain_core.runnables import RunnableLambda
+
+from quiz_index import QuizBankIndex, tokenize
+from quiz_parser import split_quiz
+
+PASS = "Y"
+FAIL = "N"
+ESCALATE = "escalate"
+
+# Words every quiz question uses that carry no facts
+QUESTION_WORDS = frozenset(
+    """name named call called known famous located many much first largest
+    did does which whom whose""".split()
+)
+
+GroundingResult = namedtuple(
+    "GroundingResult", ["decision", "confidence", "question_scores"]
+)
+
+
+@lru_cache(maxsize=16)
+def index_for_context(context):
+    return QuizBankIndex.from_text(context)
+
+
+class GroundingScorer:
+    def __init__(self, pass_threshold=1.0, fail_threshold=0.25, fuzzy_cutoff=0.75):
+        self.pass_threshold = pass_threshold
+        self.fail_threshold = fail_threshold
+        self.fuzzy_cutoff = fuzzy_cutoff
+
+    def _matched(self, token, known, vocabulary):
+        if token in known:
+            return True
+        # Only spend a fuzzy lookup on tokens the bank does not contain at all
+        return token not in vocabulary and bool(
+            difflib.get_close_matches(token, known, n=1, cutoff=self.fuzzy_cutoff)
+        )
+
+    def score_question(self, question, index):
+        """Fraction of the question's content words found in its best matching subject."""
+        tokens = tokenize(question) - QUESTION_WORDS
+        if not tokens:
+            return None
+        best = 0.0
+        for subject in index.referenced_subjects(question) or index.subjects:
+            known = subject.tokens | tokenize(" ".join(subject.categories))
+            matched = sum(self._matched(t, known, index.vocabulary) for t in tokens)
+            best = max(best, matched / len(tokens))
+        return best
+
+    def score(self, quiz, index):
+        questions = [question.text for question in split_quiz(quiz)]
+        scores = [self.score_question(question, index) for question in questions]
+        scores = [score for score in scores if score is not None]
+        if not scores:
+            # Refusals and free text are for the LLM grader to judge
+            return GroundingResult(ESCALATE, 0.0, scores)
+
+        weakest = min(scores)
+        if weakest >= self.pass_threshold:
+            return GroundingResult(PASS, weakest, scores)
+        if weakest <= self.fail_threshold:
+            return GroundingResult(FAIL, 1.0 - weakest, scores)
+        return GroundingResult(ESCALATE, 0.0, scores)
+
+
+def render_decision(result):
+    """Format a local verdict like the quiz bank grader in save_eval_artifacts.py."""
+    return (
+        f"Decision: {result.decision}\n"
+        f"Explanation: Resolved by the local grounding check with confidence "
+        f"{result.confidence:.2f} (question coverage: "
+        f"{', '.join(f'{score:.2f}' for score in result.question_scores)})"
+    )
+
+
+class CascadingGrader:
+    """Runs the grounding check first and escalates uncertain quizzes to the LLM grader."""
+
+    def __init__(self, llm_grader, scorer=None, render=render_decision):
+        self.llm_grader = llm_grader
+        self.scorer = scorer or GroundingScorer()
+        self.render = render
+        self.total = 0
+        self.local_pass = 0
+        self.local_fail = 0
+        self._lock = threading.Lock()
+
+    def grade_locally(self, inputs):
+        index = index_for_context(inputs["context"])
+        result = self.scorer.score(inputs["agent_response"], index)
+        with self._lock:
+            self.total += 1
+            self.local_pass += result.decision == PASS
+            self.local_fail += result.decision == FAIL
+        return result
+
+    def route(self, inputs):
+        result = self.grade_locally(inputs)
+        if result.decision == ESCALATE:
+            return self.llm_grader
+        return self.render(result)
+
+    async def aroute(self, inputs):
+        return self.route(inputs)
+
+    def as_runnable(self):
+        return RunnableLambda(self.route, afunc=self.aroute, name="CascadingGrader")
+
+    def stats(self):
+        escalated = self.total - self.local_pass - self.local_fail
+        return {
+            "graded": self.total,
+            "local_pass": self.local_pass,
+            "local_fail": self.local_fail,
+            "escalated": escalated,
+            "escalation_rate": escalated / self.total if self.total else 0.0,
+        }
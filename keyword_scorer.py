@@ -0,0 +1,107 @@
+"""Deterministic keyword scoring of answers against a dataset's expectations.
+
+Every dataset row names an expected category (``response``) and optionally a
+list of ``subjects``. ``KeywordScorer`` compiles all of them, for the whole
+dataset, into one Aho-Corasick automaton, so each answer is scanned once no
+matter how many rows or keywords there are, instead of lowercasing the answer
+and searching it once per keyword:
+
+    scorer = KeywordScorer(read_dataset(DATASET_PATH))
+    for score in scorer.score_all(rows, answers):
+        print(score.hits, score.passed)
+
+Matching is case-insensitive substring matching, the same as
+``keyword.lower() in answer.lower()``. A row passes when its category is found
+and, if it lists subjects, at least one of them is.
+"""
+
+from collections import deque, namedtuple
+
+KeywordScore = namedtuple(
+    "KeywordScore",
+    ["category", "category_found", "subjects_found", "hits", "passed"],
+)
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton finding which of many keywords occur in a text."""
+
+    def __init__(self, keywords):
+        self.keywords = sorted({keyword.lower() for keyword in keywords if keyword})
+        # Trie of the keywords; state 0 is the root and outputs[state] holds
+        # the keywords ending in that state
+        children = [{}]
+        self._outputs = [set()]
+        for keyword in self.keywords:
+            state = 0
+            for char in keyword:
+                if char not in children[state]:
+                    children.append({})
+                    self._outputs.append(set())
+                    children[state][char] = len(children) - 1
+                state = children[state][char]
+            self._outputs[state].add(keyword)
+
+        # Failure links: the state for the longest proper suffix of a state's
+        # text that is also a trie path, found breadth first
+        self._goto = children
+        self._fail = [0] * len(children)
+        queue = deque(children[0].values())
+        while queue:
+            state = queue.popleft()
+            self._outputs[state] |= self._outputs[self._fail[state]]
+            for char, child in children[state].items():
+                fallback = self._fail[state]
+                while fallback and char not in children[fallback]:
+                    fallback = self._fail[fallback]
+                if state:
+                    self._fail[child] = children[fallback].get(char, 0)
+                queue.append(child)
+
+    def find(self, text):
+        """Return the set of keywords occurring in text, scanning it once."""
+        found = set()
+        state = 0
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        for char in text.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if outputs[state]:
+                found |= outputs[state]
+        return found
+
+
+def expected_keywords(row):
+    """The category and subjects a dataset row expects in its answer."""
+    return row.get("response"), row.get("subjects") or []
+
+
+class KeywordScorer:
+    def __init__(self, rows):
+        keywords = set()
+        for row in rows:
+            category, subjects = expected_keywords(row)
+            keywords.update([category, *subjects] if category else subjects)
+        self.matcher = KeywordMatcher(keywords)
+
+    def score(self, row, answer):
+        return self.score_found(row, self.matcher.find(answer or ""))
+
+    def score_found(self, row, found):
+        """Score a row against the keywords already found in its answer."""
+        category, subjects = expected_keywords(row)
+        category_found = category.lower() in found if category else None
+        subjects_found = [subject for subject in subjects if subject.lower() in found]
+        hits = ([category] if category_found else []) + subjects_found
+        if not category and not subjects:
+            passed = None
+        else:
+            passed = category_found is not False and (
+                not subjects or bool(subjects_found)
+            )
+        return KeywordScore(category, category_found, subjects_found, hits, passed)
+
+    def score_all(self, rows, answers):
+        """Score a whole results table in one pass, scanning each answer once."""
+        return [self.score(row, answer) for row, answer in zip(rows, answers)]
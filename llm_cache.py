@@ -0,0 +1,243 @@
+"""Opt-in persistent cache for LLM responses.
+
+Identical prompts sent to the same model configuration (model name, temperature, ...)
+are answered from a local SQLite database instead of the API. The cache plugs into
+LangChain through the ``cache`` argument of the chat model, so every chain built with
+``app.create_llm`` uses it.
+
+Enable it with ``EVAL_LLM_CACHE=1`` and manage it from the command line:
+
+    python llm_cache.py stats
+    python llm_cache.py clear
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from langchain_core.caches import BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "llm_cache.sqlite")
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_MAX_AGE_SECONDS = 7 * 24 * 60 * 60
+
+_TRUTHY = ("1", "true", "yes", "on")
+
+# Client settings that cannot change a completion. They are left out of cache
+# keys, so entries recorded with the SDK's own retries still serve an LLM whose
+# retries are handled by adaptive.ResilientCaller (max_retries=0).
+TRANSPORT_SETTINGS = ("max_retries", "request_timeout")
+
+
+def serialize_generations(generations):
+    items = []
+    for generation in generations:
+        if isinstance(generation, ChatGeneration):
+            items.append({"message": message_to_dict(generation.message)})
+        else:
+            items.append({"text": generation.text})
+    return json.dumps(items)
+
+
+def deserialize_generations(payload):
+    generations = []
+    for item in json.loads(payload):
+        if "message" in item:
+            message = messages_from_dict([item["message"]])[0]
+            generations.append(ChatGeneration(message=message))
+        else:
+            generations.append(Generation(text=item["text"]))
+    return generations
+
+
+def without_transport_settings(llm_string):
+    """The LLM string minus TRANSPORT_SETTINGS; other strings are returned as is."""
+    serialized, separator, params = llm_string.partition("---")
+    try:
+        llm = json.loads(serialized)
+    except ValueError:
+        return llm_string
+    kwargs = llm.get("kwargs") if isinstance(llm, dict) else None
+    if not isinstance(kwargs, dict) or not any(
+        name in kwargs for name in TRANSPORT_SETTINGS
+    ):
+        return llm_string
+    for name in TRANSPORT_SETTINGS:
+        kwargs.pop(name, None)
+    return json.dumps(llm, sort_keys=True) + separator + params
+
+
+def cache_key(prompt, llm_string):
+    """Key a request on the LLM configuration and the rendered messages."""
+    llm_string = without_transport_settings(llm_string)
+    return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+
+class SQLiteLLMCache(BaseCache):
+    """LangChain cache backed by a single SQLite file with size/age eviction."""
+
+    def __init__(
+        self,
+        path=DEFAULT_CACHE_PATH,
+        max_entries=DEFAULT_MAX_ENTRIES,
+        max_age_seconds=DEFAULT_MAX_AGE_SECONDS,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                generations TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )""")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)"
+        )
+        self._conn.commit()
+
+    def lookup(self, prompt, llm_string):
+        key = cache_key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT generations, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or self._expired(row[1], now):
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+        return deserialize_generations(row[0])
+
+    def update(self, prompt, llm_string, return_val):
+        key = cache_key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?)",
+                (key, serialize_generations(return_val), now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def clear(self, **kwargs):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def _expired(self, created_at, now):
+        return (
+            self.max_age_seconds is not None and now - created_at > self.max_age_seconds
+        )
+
+    def _evict(self, now):
+        if self.max_age_seconds is not None:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE created_at < ?",
+                (now - self.max_age_seconds,),
+            )
+        if self.max_entries is not None:
+            # Drop the least recently used entries beyond the size limit
+            self._conn.execute(
+                """DELETE FROM llm_cache WHERE key IN (
+                    SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )""",
+                (self.max_entries,),
+            )
+
+    def count(self):
+        # Not __len__: LangChain treats an empty (falsy) cache as "caching disabled"
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "entries": self.count(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+_cache = None
+_enabled = None
+
+
+def cache_enabled():
+    if _enabled is not None:
+        return _enabled
+    return os.environ.get("EVAL_LLM_CACHE", "").lower() in _TRUTHY
+
+
+def configure_llm_cache(enabled=None, path=None, clear=False):
+    """Override the environment settings, e.g. from command line flags."""
+    global _cache, _enabled
+    _enabled = enabled
+    if path is not None:
+        os.environ["EVAL_LLM_CACHE_PATH"] = path
+        _cache = None
+    if clear:
+        open_llm_cache().clear()
+
+
+def open_llm_cache():
+    """Return the process-wide cache, creating it from the environment on first use."""
+    global _cache
+    if _cache is None:
+        _cache = SQLiteLLMCache(
+            path=os.environ.get("EVAL_LLM_CACHE_PATH", DEFAULT_CACHE_PATH),
+            max_entries=int(
+                os.environ.get("EVAL_LLM_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)
+            ),
+            max_age_seconds=float(
+                os.environ.get("EVAL_LLM_CACHE_MAX_AGE", DEFAULT_MAX_AGE_SECONDS)
+            ),
+        )
+    return _cache
+
+
+def get_llm_cache():
+    """Return the cache to hand to chat models, or None when caching is off."""
+    if not cache_enabled():
+        return None
+    return open_llm_cache()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the on-disk LLM cache")
+    parser.add_argument("command", choices=["stats", "clear"])
+    args = parser.parse_args(argv)
+
+    cache = open_llm_cache()
+    if args.command == "clear":
+        cache.clear()
+        logging.getLogger().info(f"Cleared LLM cache at {cache.path}")
+    print(json.dumps(cache.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
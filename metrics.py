@@ -0,0 +1,327 @@
+"""Per-call latency and token metrics for the assistant and grader chains.
+
+``MetricsCallbackHandler`` is a LangChain callback that records one entry per
+model call: wall time, time to first token (streaming calls only), prompt and
+completion tokens, retries, errors and early cancellations. Calls are tagged with
+the chain that made them (the ``assistant`` / ``grader`` tags set by
+``app.assistant_chain`` and ``graders``) and the dataset row from the
+``row_index`` run metadata. A call grading several rows at once (``packed_rows``
+metadata, see ``graders.PackedGrader``) is recorded once, with ``rows`` set to
+the number of rows it graded; ``row_records`` splits it into one record per row
+for per-row token attribution:
+
+    metrics = MetricsCallbackHandler()
+    chain.invoke(inputs, config={"callbacks": [metrics], "metadata": {"row_index": 3}})
+    print(format_summary(metrics.summary()))
+    metrics.write_prometheus("metrics.prom")
+"""
+
+import asyncio
+import json
+import math
+import os
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+ASSISTANT = "assistant"
+GRADER = "grader"
+CHAIN_TAGS = (ASSISTANT, GRADER)
+OTHER = "other"
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def percentile(values, quantile):
+    """Linearly interpolated percentile of values; None when there are none."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * quantile
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def chain_for(tags, metadata):
+    for tag in tags or ():
+        if tag in CHAIN_TAGS:
+            return tag
+    return (metadata or {}).get("chain", OTHER)
+
+
+def attempt_for(tags, metadata=None):
+    # ResilientCaller puts the attempt in the run metadata, while RunnableRetry
+    # tags each attempt after the first with "retry:attempt:<n>"
+    attempt = (metadata or {}).get("attempt")
+    if attempt is not None:
+        return attempt
+    for tag in tags or ():
+        if tag.startswith("retry:attempt:"):
+            return int(tag.rsplit(":", 1)[1])
+    return 1
+
+
+def token_share(total, parts, position):
+    """The position-th of parts near-equal integer shares of total."""
+    return total // parts + (position < total % parts)
+
+
+def token_usage(response):
+    """Prompt and completion tokens from an LLM result, whichever way they were reported."""
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(
+                getattr(generation, "message", None), "usage_metadata", None
+            )
+            if usage:
+                return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    # Record timestamps on the calling thread rather than in an executor
+    run_inline = True
+
+    def __init__(self):
+        self.records = []
+        self._calls = {}
+        self._attempts = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, parent_run_id, tags, metadata):
+        with self._lock:
+            self._calls[run_id] = {
+                "chain": chain_for(tags, metadata),
+                "row_index": (metadata or {}).get("row_index"),
+                "packed_rows": (metadata or {}).get("packed_rows"),
+                "attempt": max(
+                    attempt_for(tags, metadata), self._attempts.get(parent_run_id, 1)
+                ),
+                "start": time.perf_counter(),
+                "first_token": None,
+            }
+
+    def on_chat_model_start(
+        self,
+        serialized,
+        messages,
+        *,
+        run_id,
+        parent_run_id=None,
+        tags=None,
+        metadata=None,
+        **kwargs,
+    ):
+        self._start(run_id, parent_run_id, tags, metadata)
+
+    def on_llm_start(
+        self,
+        serialized,
+        prompts,
+        *,
+        run_id,
+        parent_run_id=None,
+        tags=None,
+        metadata=None,
+        **kwargs,
+    ):
+        self._start(run_id, parent_run_id, tags, metadata)
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        call = self._calls.get(run_id)
+        if call is not None and call["first_token"] is None:
+            call["first_token"] = time.perf_counter()
+
+    def _finish(self, run_id, error=None, usage=(0, 0)):
+        end = time.perf_counter()
+        # A stream closed on purpose, e.g. by streaming.stream_until, is not an error
+        cancelled = isinstance(error, (GeneratorExit, asyncio.CancelledError))
+        with self._lock:
+            call = self._calls.pop(run_id, None)
+            if call is None:
+                return
+            self.records.append(
+                {
+                    "chain": call["chain"],
+                    "row_index": call["row_index"],
+                    "packed_rows": call["packed_rows"],
+                    "rows": len(call["packed_rows"] or [call["row_index"]]),
+                    "attempt": call["attempt"],
+                    "latency_s": end - call["start"],
+                    "ttft_s": (
+                        call["first_token"] - call["start"]
+                        if call["first_token"] is not None
+                        else None
+                    ),
+                    "prompt_tokens": usage[0],
+                    "completion_tokens": usage[1],
+                    "error": (
+                        type(error).__name__
+                        if error is not None and not cancelled
+                        else None
+                    ),
+                    "cancelled": cancelled,
+                }
+            )
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._finish(run_id, usage=token_usage(response))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, error=error)
+
+    # The retry tag is only set on the retried runnable, so pass it down to the
+    # model calls it makes
+    def on_chain_start(
+        self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, **kwargs
+    ):
+        attempt = attempt_for(tags)
+        if attempt == 1:
+            attempt = self._attempts.get(parent_run_id, 1)
+        if attempt > 1:
+            with self._lock:
+                self._attempts[run_id] = attempt
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        if self._attempts:
+            with self._lock:
+                self._attempts.pop(run_id, None)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self.on_chain_end(None, run_id=run_id)
+
+    def row_records(self):
+        """Records per dataset row; a packed call is split between the rows it graded."""
+        for record in self.records:
+            rows = record.get("packed_rows") or [record["row_index"]]
+            for position, row_index in enumerate(rows):
+                yield {
+                    **record,
+                    "row_index": row_index,
+                    "prompt_tokens": token_share(
+                        record["prompt_tokens"], len(rows), position
+                    ),
+                    "completion_tokens": token_share(
+                        record["completion_tokens"], len(rows), position
+                    ),
+                }
+
+    def summary(self):
+        """Per-chain call counts, token totals and latency/TTFT percentiles."""
+        chains = {}
+        for record in self.records:
+            chains.setdefault(record["chain"], []).append(record)
+
+        summary = {}
+        for chain, calls in sorted(chains.items()):
+            latencies = [record["latency_s"] for record in calls]
+            ttfts = [
+                record["ttft_s"] for record in calls if record["ttft_s"] is not None
+            ]
+            summary[chain] = {
+                "calls": len(calls),
+                "rows": sum(record.get("rows", 1) for record in calls),
+                "errors": sum(record["error"] is not None for record in calls),
+                "cancelled": sum(record["cancelled"] for record in calls),
+                "retries": sum(record["attempt"] > 1 for record in calls),
+                "prompt_tokens": sum(record["prompt_tokens"] for record in calls),
+                "completion_tokens": sum(
+                    record["completion_tokens"] for record in calls
+                ),
+                "latency_s": {
+                    f"p{round(q * 100)}": percentile(latencies, q) for q in QUANTILES
+                },
+                "ttft_s": {
+                    f"p{round(q * 100)}": percentile(ttfts, q) for q in QUANTILES
+                },
+                "latency_sum_s": sum(latencies),
+            }
+        return summary
+
+    def to_json(self):
+        return json.dumps(
+            {"summary": self.summary(), "records": self.records}, indent=2
+        )
+
+    def to_prometheus(self, prefix="eval_llm"):
+        """Render the summary in the Prometheus text exposition format."""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for suffix, labels, value in samples:
+                label_text = ",".join(f'{key}="{val}"' for key, val in labels.items())
+                lines.append(f"{prefix}_{name}{suffix}{{{label_text}}} {value}")
+
+        summary = self.summary()
+        for name, key, help_text in (
+            ("call_seconds", "latency_s", "Wall time per model call"),
+            ("ttft_seconds", "ttft_s", "Time to first streamed token"),
+        ):
+            samples = []
+            for chain, stats in summary.items():
+                for quantile in QUANTILES:
+                    value = stats[key][f"p{round(quantile * 100)}"]
+                    if value is not None:
+                        labels = {"chain": chain, "quantile": quantile}
+                        samples.append(("", labels, value))
+                if key == "latency_s":
+                    samples.append(("_sum", {"chain": chain}, stats["latency_sum_s"]))
+                    samples.append(("_count", {"chain": chain}, stats["calls"]))
+            metric(name, "summary", help_text, samples)
+
+        for name, key, help_text in (
+            ("calls_total", "calls", "Model calls"),
+            ("errors_total", "errors", "Model calls that raised"),
+            ("cancelled_total", "cancelled", "Streamed calls stopped early"),
+            ("retries_total", "retries", "Model calls made by a retry attempt"),
+            ("prompt_tokens_total", "prompt_tokens", "Prompt tokens sent"),
+            (
+                "completion_tokens_total",
+                "completion_tokens",
+                "Completion tokens received",
+            ),
+        ):
+            samples = [
+                ("", {"chain": chain}, stats[key]) for chain, stats in summary.items()
+            ]
+            metric(name, "counter", help_text, samples)
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path):
+        _write(path, self.to_json())
+
+    def write_prometheus(self, path):
+        _write(path, self.to_prometheus())
+
+
+def _write(path, text):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as file:
+        file.write(text)
+
+
+def _seconds(value):
+    return "-" if value is None else f"{value:.3f}"
+
+
+def format_summary(summary):
+    """One line per chain: calls, errors, tokens and p50/p95/p99 latency and TTFT."""
+    lines = []
+    for chain, stats in summary.items():
+        latency = "/".join(_seconds(value) for value in stats["latency_s"].values())
+        ttft = "/".join(_seconds(value) for value in stats["ttft_s"].values())
+        lines.append(
+            f"{chain}: {stats['calls']} calls, {stats['errors']} errors, "
+            f"{stats['cancelled']} cancelled, "
+            f"{stats['retries']} retries, latency p50/p95/p99 {latency}s, "
+            f"ttft p50/p95/p99 {ttft}s, tokens {stats['prompt_tokens']} prompt / "
+            f"{stats['completion_tokens']} completion"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,295 @@
+"""Memory-mapped quiz bank with a persisted subject index and hot reload.
+
+``QuizBankStore`` maps quiz_bank.txt instead of reading it into one string at
+import, and keeps an index of where each subject block starts and ends, its
+categories, its content tokens and a digest of its bytes. The index is written
+next to the bank (quiz_bank.txt -> quiz_bank.index.json), so a new process
+reuses it while the file's size and mtime are unchanged. ``index()`` builds the
+``QuizBankIndex`` from these entries, and a subject's facts and text are parsed
+only when a prompt renders it, so a pruned prompt parses just its own subjects.
+
+Every accessor first checks the file: an unchanged stat costs one ``os.stat``,
+a changed stat with the same content hash only updates the stat, and changed
+content is rescanned for subject offsets while the categories and parsed
+subjects of blocks whose digest is unchanged are kept. ``version`` goes up on
+each content change, so callers such as ``app.get_system_message`` rebuild the
+assistant prompt without a process restart:
+
+    index = get_quiz_bank_store("quiz_bank.txt").index()
+    index.render_for_request("An art quiz")  # parses only the Art subjects
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import threading
+from collections import namedtuple
+from functools import lru_cache
+
+from quiz_index import QuizBankIndex, parse_quiz_bank, tokenize
+
+# Bump when the persisted index layout changes
+INDEX_FORMAT = 2
+
+SUBJECT_HEADER = re.compile(
+    rb"^[ \t]*(\d+)\.[ \t]*Subject:[ \t]*(.+?)[ \t]*\r?$", re.MULTILINE
+)
+
+Entry = namedtuple(
+    "Entry", ["number", "name", "categories", "tokens", "start", "end", "digest"]
+)
+
+
+def default_index_path(path):
+    return os.path.splitext(path)[0] + ".index.json"
+
+
+class IndexedSubject:
+    """A subject known from its index entry; facts and text are parsed on first use.
+
+    Quacks like ``quiz_index.Subject``, so ``QuizBankIndex`` matches requests and
+    quizzes against the persisted names, categories and tokens alone.
+    """
+
+    def __init__(self, store, entry):
+        self.store = store
+        self.entry = entry
+        self.number = entry.number
+        self.name = entry.name
+        self.categories = entry.categories
+
+    @property
+    def name_tokens(self):
+        return tokenize(self.name)
+
+    @property
+    def tokens(self):
+        return set(self.entry.tokens)
+
+    @property
+    def facts(self):
+        return self.store.materialize(self.entry).facts
+
+    @property
+    def text(self):
+        return self.store.materialize(self.entry).text
+
+
+class QuizBankStore:
+    def __init__(self, path, index_path=None):
+        self.path = path
+        self.index_path = index_path or default_index_path(path)
+        self.version = 0
+        self.entries = []
+        self._by_digest = {}
+        # Blocks (re)scanned for their categories and subjects parsed, for stats()
+        self.indexed = 0
+        self.parsed = 0
+        self._lock = threading.RLock()
+        self._file = None
+        self._mmap = None
+        self._signature = None
+        self._digest = None
+        self._subjects = {}  # entry digest -> Subject
+        self._text = None
+        self._index = None
+
+    def refresh(self):
+        """Pick up changes to the file; returns True when its content changed."""
+        with self._lock:
+            stat = os.stat(self.path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if signature == self._signature:
+                return False
+            self._remap()
+            if self._signature is None and self._load_index(signature):
+                self._signature = signature
+                self.version += 1
+                return True
+            digest = hashlib.sha256(self._buffer()).hexdigest()
+            self._signature = signature
+            if digest == self._digest:
+                return False
+            self._digest = digest
+            self._reindex()
+            self._save_index()
+            self.version += 1
+            return True
+
+    def text(self):
+        """The whole bank as text, decoded once per version."""
+        with self._lock:
+            self.refresh()
+            if self._text is None:
+                text = self._buffer()[:].decode("utf-8")
+                self._text = text.replace("\r\n", "\n")
+            return self._text
+
+    def fingerprint(self):
+        """Short digest of the file; for LF files, results_store.fingerprint of its text."""
+        with self._lock:
+            self.refresh()
+            return self._digest[:16]
+
+    def subjects(self):
+        with self._lock:
+            self.refresh()
+            return [self._materialize(entry) for entry in self.entries]
+
+    def materialize(self, entry):
+        """The parsed Subject for an index entry, kept while its block is unchanged."""
+        with self._lock:
+            self.refresh()
+            subject = self._subjects.get(entry.digest)
+            if subject is not None:
+                return subject
+            current = self._by_digest.get(entry.digest)
+            if current is None:
+                raise LookupError(
+                    f"Subject '{entry.name}' changed in {self.path}; "
+                    "reload the index with index()"
+                )
+            return self._materialize(current)
+
+    def index(self):
+        """QuizBankIndex over the current bank, rebuilt only when it changes.
+
+        Built from the index entries, so no subject is parsed until rendered.
+        """
+        with self._lock:
+            self.refresh()
+            if self._index is None:
+                self._index = QuizBankIndex(
+                    IndexedSubject(self, entry) for entry in self.entries
+                )
+            return self._index
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "subjects": len(self.entries),
+            "materialized": len(self._subjects),
+            "indexed": self.indexed,
+            "parsed": self.parsed,
+        }
+
+    def close(self):
+        with self._lock:
+            self._unmap()
+            self._signature = None
+
+    def _buffer(self):
+        return self._mmap if self._mmap is not None else b""
+
+    def _unmap(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+        self._mmap = None
+        self._file = None
+
+    def _remap(self):
+        self._unmap()
+        self._text = None
+        self._index = None
+        file = open(self.path, "rb")
+        if os.fstat(file.fileno()).st_size == 0:
+            # An empty file cannot be mapped
+            file.close()
+            return
+        self._file = file
+        self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _reindex(self):
+        buffer = self._buffer()
+        known = {entry.digest: entry for entry in self.entries}
+        headers = list(SUBJECT_HEADER.finditer(buffer))
+        entries = []
+        for i, header in enumerate(headers):
+            start = header.start()
+            end = headers[i + 1].start() if i + 1 < len(headers) else len(buffer)
+            # Blank lines between subjects are not part of either subject
+            digest = hashlib.sha256(buffer[start:end].rstrip()).hexdigest()
+            if digest in known:
+                entries.append(known[digest]._replace(start=start, end=end))
+                continue
+            # Parsed once to index its tokens; the Subject itself is not kept
+            subject = parse_quiz_bank(buffer[start:end].decode("utf-8"))[0]
+            entries.append(
+                Entry(
+                    subject.number,
+                    subject.name,
+                    subject.categories,
+                    sorted(subject.tokens),
+                    start,
+                    end,
+                    digest,
+                )
+            )
+            self.indexed += 1
+        self._set_entries(entries)
+        digests = {entry.digest for entry in entries}
+        self._subjects = {
+            digest: subject
+            for digest, subject in self._subjects.items()
+            if digest in digests
+        }
+
+    def _materialize(self, entry):
+        subject = self._subjects.get(entry.digest)
+        if subject is None:
+            block = self._buffer()[entry.start : entry.end].decode("utf-8")
+            subject = parse_quiz_bank(block)[0]
+            self._subjects[entry.digest] = subject
+            self.parsed += 1
+        return subject
+
+    def _load_index(self, signature):
+        """Adopt the persisted index when it was written for this exact file."""
+        try:
+            with open(self.index_path, "r") as file:
+                saved = json.load(file)
+        except (OSError, ValueError):
+            return False
+        if saved.get("format") != INDEX_FORMAT:
+            return False
+        if (saved.get("mtime_ns"), saved.get("size")) != signature:
+            return False
+        self._digest = saved["digest"]
+        self._set_entries([Entry(*entry) for entry in saved["entries"]])
+        return True
+
+    def _set_entries(self, entries):
+        self.entries = entries
+        self._by_digest = {entry.digest: entry for entry in entries}
+
+    def _save_index(self):
+        mtime_ns, size = self._signature
+        saved = {
+            "format": INDEX_FORMAT,
+            "mtime_ns": mtime_ns,
+            "size": size,
+            "digest": self._digest,
+            "entries": [list(entry) for entry in self.entries],
+        }
+        # Per-process temporary name: sharded workers may save the index together
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as file:
+                json.dump(saved, file)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            logging.getLogger().warning(f"Could not save quiz bank index: {e}")
+
+
+@lru_cache(maxsize=None)
+def _store_for(path):
+    return QuizBankStore(path)
+
+
+def get_quiz_bank_store(path="quiz_bank.txt"):
+    """The process-wide store for a quiz bank file."""
+    return _store_for(os.path.abspath(path))
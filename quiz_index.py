@@ -0,0 +1,182 @@
+"""Structured index over quiz_bank.txt (subject -> categories -> facts).
+
+The assistant and grader prompts normally inline the whole bank. The index lets
+them inject only the subjects a request or a quiz actually needs, so prompt size
+stays flat as the bank grows. Lookups go through category and token inverted
+indexes, so they cost the same for five subjects or five thousand.
+"""
+
+import re
+from dataclasses import dataclass, field
+
+SUBJECT_PATTERN = re.compile(r"^\s*(\d+)\.\s*Subject:\s*(.+?)\s*$")
+CATEGORY_PATTERN = re.compile(r"^\s*Categor(?:y|ies):\s*(.+?)\s*$")
+FACT_PATTERN = re.compile(r"^\s*-\s*(.+?)\s*$")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset(
+    """a about an and are as at be by can did do does for from has have how in
+    is it its of on or quiz question questions the their there these this to was
+    what when where which who why with""".split()
+)
+
+
+def tokenize(text):
+    """Lowercase content tokens with a naive plural strip ("telescopes" -> "telescope")."""
+    tokens = set()
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if len(token) < 3 or token in STOPWORDS:
+            continue
+        if len(token) > 4 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.add(token)
+    return tokens
+
+
+@dataclass
+class Subject:
+    number: int
+    name: str
+    categories: list = field(default_factory=list)
+    facts: list = field(default_factory=list)
+    text: str = ""
+
+    @property
+    def name_tokens(self):
+        return tokenize(self.name)
+
+    @property
+    def tokens(self):
+        return tokenize(" ".join([self.name, *self.facts]))
+
+
+def parse_quiz_bank(text):
+    """Parse the quiz bank text into a list of Subjects, keeping each raw block."""
+    subjects = []
+    lines = []
+
+    def close_block():
+        if subjects:
+            subjects[-1].text = "\n".join(lines).rstrip()
+
+    for line in text.splitlines():
+        match = SUBJECT_PATTERN.match(line)
+        if match:
+            close_block()
+            subjects.append(Subject(number=int(match.group(1)), name=match.group(2)))
+            lines = [line]
+            continue
+        if not subjects:
+            continue
+        lines.append(line)
+        category = CATEGORY_PATTERN.match(line)
+        if category:
+            subjects[-1].categories.extend(
+                name.strip() for name in category.group(1).split(",") if name.strip()
+            )
+            continue
+        fact = FACT_PATTERN.match(line)
+        if fact:
+            subjects[-1].facts.append(fact.group(1))
+    close_block()
+    return subjects
+
+
+class QuizBankIndex:
+    def __init__(self, subjects):
+        self.subjects = list(subjects)
+        self.by_category = {}
+        self.by_name_token = {}
+        self.by_token = {}
+        self.vocabulary = set()
+        for position, subject in enumerate(self.subjects):
+            for category in subject.categories:
+                self.by_category.setdefault(category.lower(), []).append(position)
+            for token in subject.name_tokens:
+                self.by_name_token.setdefault(token, []).append(position)
+            for token in subject.tokens:
+                self.by_token.setdefault(token, []).append(position)
+            self.vocabulary.update(subject.tokens)
+            self.vocabulary.update(tokenize(" ".join(subject.categories)))
+
+        # Tokens shared by many subjects say nothing about which one a quiz uses
+        limit = max(2, len(self.subjects) // 4)
+        self.by_token = {
+            token: positions
+            for token, positions in self.by_token.items()
+            if len(positions) <= limit
+        }
+        self.categories = sorted(
+            {category for subject in self.subjects for category in subject.categories}
+        )
+        self._category_tokens = [
+            (category, tokenize(category)) for category in self.categories
+        ]
+
+    @classmethod
+    def from_text(cls, text):
+        return cls(parse_quiz_bank(text))
+
+    def subjects_for_categories(self, categories):
+        positions = set()
+        for category in categories:
+            positions.update(self.by_category.get(category.lower(), []))
+        return [self.subjects[position] for position in sorted(positions)]
+
+    def match_categories(self, text):
+        """Return the bank categories named in a request, e.g. "a science quiz"."""
+        tokens = tokenize(text)
+        return [
+            category
+            for category, category_tokens in self._category_tokens
+            if category_tokens <= tokens
+        ]
+
+    def match_subjects(self, text):
+        """Return the subjects whose name appears in the text."""
+        positions = set()
+        for token in tokenize(text):
+            positions.update(self.by_name_token.get(token, []))
+        return [self.subjects[position] for position in sorted(positions)]
+
+    def referenced_subjects(self, text):
+        """Return the subjects a quiz draws on, by name or by distinctive fact terms."""
+        positions = set()
+        for token in tokenize(text):
+            positions.update(self.by_name_token.get(token, []))
+            positions.update(self.by_token.get(token, []))
+        return [self.subjects[position] for position in sorted(positions)]
+
+    def render(self, subjects=None):
+        subjects = self.subjects if subjects is None else subjects
+        return "\n\n".join(subject.text for subject in subjects)
+
+    def render_for_request(self, question):
+        """Bank text for an assistant request: the subjects of the requested categories.
+
+        Requests naming no known category or subject are ambiguous and get the full
+        bank, so the model can still decide how to answer them.
+        """
+        categories = self.match_categories(question)
+        if categories:
+            return self.render(self.subjects_for_categories(categories))
+        subjects = self.match_subjects(question)
+        if subjects:
+            return self.render(subjects)
+        return self.render()
+
+    def render_for_quiz(self, quiz):
+        """Bank text for grading a quiz: only the subjects it references.
+
+        Falls back to the full bank when nothing matches, so the grader never judges
+        a quiz against a context that is missing the facts it used.
+        """
+        subjects = self.referenced_subjects(quiz)
+        return self.render(subjects) if subjects else self.render()
+
+
+def load_quiz_bank_index(file_path="quiz_bank.txt"):
+    """Index of the bank's current content; rebuilt only after the file changes."""
+    from quiz_bank_store import get_quiz_bank_store
+
+    return get_quiz_bank_store(file_path).index()
@@ -0,0 +1,118 @@
+"""Local structural parser for the assistant's quiz format.
+
+The system prompt in app.py asks for exactly this layout, or the canned refusal
+"I'm sorry I do not have information about that":
+
+    Question 1:#### <question 1>
+
+    Question 2:#### <question 2>
+
+    Question 3:#### <question 3>
+
+``parse_quiz`` turns a response into numbered questions and lists every way it
+departs from that layout: the wrong number of questions, gaps or repeats in the
+numbering, a missing delimiter or an empty question. Checking the format this
+way takes microseconds and no tokens, where the LLM format grader costs a call:
+
+    parsed = parse_quiz(answer)
+    parsed.kind      # "quiz", "refusal" or "other"
+    parsed.valid     # a well-formed quiz
+    parsed.problems  # ["expected 3 questions, found 2", ...]
+
+``create_local_format_grader`` wraps it as a runnable that answers "Y" or "N"
+for ``{"agent_response": ...}``, like the LLM format grader.
+"""
+
+import re
+from collections import namedtuple
+
+from langchain_core.runnables import RunnableLambda
+
+from app import delimiter
+from category_router import REFUSAL
+
+QUIZ = "quiz"
+REFUSAL_KIND = "refusal"
+OTHER = "other"
+
+# The system prompt asks for three questions
+EXPECTED_QUESTIONS = 3
+
+QUESTION_LINE = re.compile(
+    r"^[\s*_#>-]*Question\s*(\d+)\s*[*_]*\s*:\s*[*_]*\s*(#*)\s*(.*?)\s*$",
+    re.IGNORECASE,
+)
+
+Question = namedtuple("Question", ["number", "text", "delimited"])
+ParsedQuiz = namedtuple("ParsedQuiz", ["kind", "valid", "questions", "problems"])
+
+
+def _normalize(text):
+    text = text.replace("’", "'").casefold()
+    return re.sub(r"[^a-z' ]+", " ", text).split()
+
+
+_REFUSAL_WORDS = _normalize(REFUSAL)
+
+
+def is_refusal(text):
+    """True when text is the system prompt's canned refusal, give or take punctuation."""
+    words = _normalize(text)
+    return words[: len(_REFUSAL_WORDS)] == _REFUSAL_WORDS
+
+
+def split_quiz(text):
+    """Return the questions in text, each with the first line of its question text."""
+    questions = []
+    waiting = None  # a question whose text did not start on its header line
+    for line in (text or "").splitlines():
+        match = QUESTION_LINE.match(line)
+        if match:
+            number, marks, rest = match.groups()
+            question = Question(int(number), rest, marks == delimiter)
+            questions.append(question)
+            waiting = None if rest else len(questions) - 1
+        elif waiting is not None and line.strip():
+            questions[waiting] = questions[waiting]._replace(text=line.strip())
+            waiting = None
+    return questions
+
+
+def parse_quiz(text, expected_count=EXPECTED_QUESTIONS):
+    """Parse a response into questions and format problems; see the module docstring."""
+    questions = split_quiz(text)
+    if not questions:
+        if is_refusal(text or ""):
+            return ParsedQuiz(REFUSAL_KIND, False, [], [])
+        return ParsedQuiz(OTHER, False, [], ["no questions found"])
+
+    problems = []
+    if expected_count is not None and len(questions) != expected_count:
+        problems.append(f"expected {expected_count} questions, found {len(questions)}")
+    numbers = [question.number for question in questions]
+    if numbers != list(range(1, len(questions) + 1)):
+        problems.append(
+            f"questions numbered {', '.join(map(str, numbers))} "
+            f"instead of 1-{len(questions)}"
+        )
+    for question in questions:
+        if not question.delimited:
+            problems.append(
+                f"question {question.number} is missing the {delimiter} delimiter"
+            )
+        if not question.text:
+            problems.append(f"question {question.number} has no text")
+    return ParsedQuiz(QUIZ, not problems, questions, problems)
+
+
+def format_decision(text, expected_count=EXPECTED_QUESTIONS):
+    """Return "Y" for a well-formed quiz and "N" for anything else, refusals included."""
+    return "Y" if parse_quiz(text, expected_count).valid else "N"
+
+
+def create_local_format_grader(expected_count=EXPECTED_QUESTIONS):
+    """Drop-in for the LLM format grader that never calls a model."""
+    return RunnableLambda(
+        lambda inputs: format_decision(inputs["agent_response"], expected_count),
+        name="LocalFormatGrader",
+    )
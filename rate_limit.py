@@ -0,0 +1,200 @@
+"""Request and token rate limits shared by every process on the machine.
+
+``FileRateLimiter`` keeps two token buckets, requests per minute and tokens per
+minute, in a small JSON state file guarded by an exclusive ``flock``. Every
+``ChatOpenAI`` built by ``app.create_llm`` takes a request from it before each
+API call, so parallel pytest workers and eval runs share one budget instead of
+each running into 429s. Token usage is only known once a call returns, so it is
+debited afterwards by a callback, and new requests wait while the token bucket
+is in debt.
+
+Configure with environment variables, e.g. for parallel test workers:
+
+    EVAL_RATE_LIMIT_RPM=3000 EVAL_RATE_LIMIT_TPM=250000 pytest -n 8 ...
+
+``EVAL_RATE_LIMIT_PATH`` sets the state file (default ``.cache/rate_limit.json``).
+"""
+
+import asyncio
+import contextvars
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.rate_limiters import BaseRateLimiter
+
+from metrics import token_usage
+
+DEFAULT_RATE_LIMIT_PATH = os.path.join(".cache", "rate_limit.json")
+
+# The model run being started in the current context, so acquire() can tell
+# which runs reached the API (cache hits never call it)
+_current_run = contextvars.ContextVar("rate_limited_run", default=None)
+
+
+class TokenUsageCallback(BaseCallbackHandler):
+    """Debits the tokens a rate-limited call used from its limiter."""
+
+    run_inline = True
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        _current_run.set(run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        _current_run.set(run_id)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        if self.limiter.release(run_id):
+            self.limiter.debit(sum(token_usage(response)))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self.limiter.release(run_id)
+
+
+class FileRateLimiter(BaseRateLimiter):
+    def __init__(
+        self,
+        requests_per_minute=None,
+        tokens_per_minute=None,
+        path=DEFAULT_RATE_LIMIT_PATH,
+        burst_seconds=1.0,
+        check_every_n_seconds=0.05,
+    ):
+        self.request_rate = requests_per_minute / 60.0 if requests_per_minute else None
+        self.token_rate = tokens_per_minute / 60.0 if tokens_per_minute else None
+        self.path = path
+        # Allow at most burst_seconds worth of calls at once, and at least one
+        self.request_capacity = max(1.0, (self.request_rate or 0) * burst_seconds)
+        self.token_capacity = (self.token_rate or 0) * burst_seconds
+        self.check_every_n_seconds = check_every_n_seconds
+        self.usage_callback = TokenUsageCallback(self)
+        self.waits = 0
+        self.waited_s = 0.0
+        self._acquired = set()
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def _state(self):
+        """Yield the refilled bucket state under a cross-process lock and save it."""
+        with self._lock, open(self.path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.path, "r") as file:
+                        state = json.load(file)
+                except (FileNotFoundError, json.JSONDecodeError):
+                    state = {
+                        "requests": self.request_capacity,
+                        "tokens": self.token_capacity,
+                        "updated": time.time(),
+                    }
+                now = time.time()
+                elapsed = max(0.0, now - state["updated"])
+                if self.request_rate:
+                    state["requests"] = min(
+                        self.request_capacity,
+                        state["requests"] + elapsed * self.request_rate,
+                    )
+                if self.token_rate:
+                    state["tokens"] = min(
+                        self.token_capacity, state["tokens"] + elapsed * self.token_rate
+                    )
+                state["updated"] = now
+                yield state
+                with open(self.path + ".tmp", "w") as file:
+                    json.dump(state, file)
+                os.replace(self.path + ".tmp", self.path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _try_acquire(self):
+        """Take a request if the budget allows; otherwise return seconds to wait."""
+        with self._state() as state:
+            waits = []
+            if self.request_rate and state["requests"] < 1:
+                waits.append((1 - state["requests"]) / self.request_rate)
+            if self.token_rate and state["tokens"] < 0:
+                waits.append(-state["tokens"] / self.token_rate)
+            if waits:
+                return max(waits)
+            if self.request_rate:
+                state["requests"] -= 1
+        run_id = _current_run.get()
+        if run_id is not None:
+            with self._lock:
+                self._acquired.add(run_id)
+        return 0.0
+
+    def _record_wait(self, seconds):
+        with self._lock:
+            self.waits += 1
+            self.waited_s += seconds
+
+    def acquire(self, *, blocking=True):
+        start = time.monotonic()
+        waited = False
+        while True:
+            wait = self._try_acquire()
+            if not wait:
+                if waited:
+                    self._record_wait(time.monotonic() - start)
+                return True
+            if not blocking:
+                return False
+            waited = True
+            time.sleep(min(wait, self.check_every_n_seconds))
+
+    async def aacquire(self, *, blocking=True):
+        start = time.monotonic()
+        waited = False
+        while True:
+            wait = self._try_acquire()
+            if not wait:
+                if waited:
+                    self._record_wait(time.monotonic() - start)
+                return True
+            if not blocking:
+                return False
+            waited = True
+            await asyncio.sleep(min(wait, self.check_every_n_seconds))
+
+    def release(self, run_id):
+        """Forget a finished run; True when it went through acquire()."""
+        with self._lock:
+            if run_id in self._acquired:
+                self._acquired.discard(run_id)
+                return True
+        return False
+
+    def debit(self, tokens):
+        if self.token_rate and tokens:
+            with self._state() as state:
+                state["tokens"] -= tokens
+
+    def stats(self):
+        return {"waits": self.waits, "waited_s": self.waited_s}
+
+
+@lru_cache(maxsize=None)
+def get_rate_limiter():
+    """The limiter configured by EVAL_RATE_LIMIT_RPM / _TPM, or None when unset."""
+    requests_per_minute = os.environ.get("EVAL_RATE_LIMIT_RPM")
+    tokens_per_minute = os.environ.get("EVAL_RATE_LIMIT_TPM")
+    if not requests_per_minute and not tokens_per_minute:
+        return None
+    return FileRateLimiter(
+        requests_per_minute=float(requests_per_minute or 0) or None,
+        tokens_per_minute=float(tokens_per_minute or 0) or None,
+        path=os.environ.get("EVAL_RATE_LIMIT_PATH", DEFAULT_RATE_LIMIT_PATH),
+    )
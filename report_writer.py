@@ -0,0 +1,287 @@
+"""Streaming, paginated HTML report for eval runs of any size.
+
+``ReportWriter`` renders result rows one at a time into numbered pages of
+``page_size`` rows and finishes with an ``index.html`` summary: row counts, the
+pass rate, assistant and grader latency percentiles, links to every page and to
+the rows that did not pass. Only the current row and the running aggregates
+are held in memory, so rows can come straight from a database cursor:
+
+    index = write_report(store.run_results(run_id), "reports/eval_results_<ts>")
+
+With ``include="failures"`` the pages only hold rows that did not pass, while the
+summary still counts every row; this keeps CI artifacts small for big runs.
+"""
+
+import html
+import os
+import random
+
+from metrics import QUANTILES, percentile
+
+DEFAULT_PAGE_SIZE = 500
+# Latency percentiles are exact up to this many rows and estimated from a
+# uniform sample of this size beyond it
+RESERVOIR_SIZE = 10_000
+MAX_FAILURE_LINKS = 1_000
+LATENCY_COLUMNS = ("assistant_latency_s", "grader_latency_s")
+
+STYLE = """
+body { font-family: sans-serif; margin: 1em 2em; }
+table { border-collapse: collapse; }
+th, td { border: 1px solid #ccc; padding: 4px 8px; text-align: left; vertical-align: top; }
+tr:target { background: #ffe9a8; }
+.fail { background: #fbe3e3; }
+"""
+
+
+class Reservoir:
+    """Fixed-size uniform sample of a stream of numbers."""
+
+    def __init__(self, size=RESERVOIR_SIZE, seed=0):
+        self.size = size
+        self.seen = 0
+        self.values = []
+        self._random = random.Random(seed)
+
+    def add(self, value):
+        self.seen += 1
+        if len(self.values) < self.size:
+            self.values.append(value)
+            return
+        slot = self._random.randrange(self.seen)
+        if slot < self.size:
+            self.values[slot] = value
+
+    def percentiles(self):
+        return {f"p{round(q * 100)}": percentile(self.values, q) for q in QUANTILES}
+
+
+def is_failure(row):
+    return row.get("status") == "failed" or row.get("decision") != "Y"
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return html.escape(str(value)).replace("\n", "<br>")
+
+
+def _page_name(number):
+    return f"page-{number:04d}.html"
+
+
+def _document_start(title):
+    return (
+        "<!DOCTYPE html>\n<html><head><meta charset='utf-8'>"
+        f"<title>{html.escape(title)}</title><style>{STYLE}</style></head><body>\n"
+        f"<h1>{html.escape(title)}</h1>\n"
+    )
+
+
+class ReportWriter:
+    def __init__(
+        self,
+        directory,
+        columns=None,
+        page_size=DEFAULT_PAGE_SIZE,
+        include="all",
+        title="Eval results",
+    ):
+        if include not in ("all", "failures"):
+            raise ValueError(f"include must be 'all' or 'failures', not {include!r}")
+        self.directory = directory
+        self.columns = columns
+        self.page_size = page_size
+        self.include = include
+        self.title = title
+        self.total = 0
+        self.passed = 0
+        self.graded = 0
+        self.errors = 0
+        self.fresh = 0
+        self.keyword_checked = 0
+        self.keyword_passed = 0
+        self.response_kinds = {}
+        self.well_formed = 0
+        self.failures = 0
+        self.failure_links = []
+        self.pages = []  # (file name, first row index, last row index)
+        self.latencies = {column: Reservoir() for column in LATENCY_COLUMNS}
+        self._page = None
+        self._page_rows = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, row):
+        if self.columns is None:
+            self.columns = list(row)
+        index = row.get("row_index", self.total)
+        self.total += 1
+        failure = is_failure(row)
+        if row.get("decision") is not None:
+            self.graded += 1
+            self.passed += row["decision"] == "Y"
+        self.errors += row.get("status") == "failed"
+        self.fresh += row.get("carried_from") is None
+        if row.get("keyword_passed") is not None:
+            self.keyword_checked += 1
+            self.keyword_passed += bool(row["keyword_passed"])
+        kind = row.get("response_kind")
+        if kind is not None:
+            self.response_kinds[kind] = self.response_kinds.get(kind, 0) + 1
+            self.well_formed += kind == "quiz" and not row.get("format_problems")
+        for column, reservoir in self.latencies.items():
+            if row.get(column) is not None:
+                reservoir.add(row[column])
+
+        if failure:
+            self.failures += 1
+        if self.include == "failures" and not failure:
+            return
+        page = self._page_for_row(index)
+        if failure and len(self.failure_links) < MAX_FAILURE_LINKS:
+            self.failure_links.append((index, page, row))
+        css = " class='fail'" if failure else ""
+        cells = "".join(f"<td>{_cell(row.get(column))}</td>" for column in self.columns)
+        self._page.write(f"<tr id='row-{index}'{css}>{cells}</tr>\n")
+        self._page_rows += 1
+        name, first, _ = self.pages[-1]
+        self.pages[-1] = (name, first, index)
+
+    def _page_for_row(self, index):
+        if self._page is not None and self._page_rows >= self.page_size:
+            self._close_page(has_next=True)
+        if self._page is None:
+            name = _page_name(len(self.pages) + 1)
+            self.pages.append((name, index, index))
+            self._page = open(os.path.join(self.directory, name), "w")
+            self._page_rows = 0
+            self._page.write(_document_start(f"{self.title}: page {len(self.pages)}"))
+            self._page.write(self._navigation(has_next=False, top=True))
+            header = "".join(
+                f"<th>{html.escape(column)}</th>" for column in self.columns
+            )
+            self._page.write(f"<table>\n<tr>{header}</tr>\n")
+        return self.pages[-1][0]
+
+    def _navigation(self, has_next, top=False):
+        number = len(self.pages)
+        links = ["<a href='index.html'>Summary</a>"]
+        if number > 1:
+            links.append(f"<a href='{_page_name(number - 1)}'>Previous</a>")
+        # The next page is only known to exist once its first row arrives
+        if has_next and not top:
+            links.append(f"<a href='{_page_name(number + 1)}'>Next</a>")
+        return f"<p>{' | '.join(links)}</p>\n"
+
+    def _close_page(self, has_next):
+        self._page.write("</table>\n")
+        self._page.write(self._navigation(has_next))
+        self._page.write("</body></html>\n")
+        self._page.close()
+        self._page = None
+
+    def summary(self):
+        return {
+            "rows": self.total,
+            "graded": self.graded,
+            "passed": self.passed,
+            "pass_rate": self.passed / self.graded if self.graded else None,
+            "not_passed": self.failures,
+            "errors": self.errors,
+            "fresh": self.fresh,
+            "keyword_checked": self.keyword_checked,
+            "keyword_passed": self.keyword_passed,
+            "response_kinds": dict(self.response_kinds),
+            "well_formed": self.well_formed,
+            "pages": len(self.pages),
+            "latency_s": {
+                column: reservoir.percentiles()
+                for column, reservoir in self.latencies.items()
+            },
+        }
+
+    def close(self):
+        """Finish the last page and write index.html; returns its path."""
+        if self._page is not None:
+            self._close_page(has_next=False)
+        path = os.path.join(self.directory, "index.html")
+        with open(path, "w") as index:
+            index.write(_document_start(self.title))
+            index.write(self._summary_html())
+        return path
+
+    def _summary_html(self):
+        summary = self.summary()
+        rate = summary["pass_rate"]
+        counts = [
+            ("Rows", summary["rows"]),
+            ("Graded", summary["graded"]),
+            ("Pass rate", "-" if rate is None else f"{rate:.1%}"),
+            ("Not passed", summary["not_passed"]),
+            ("Errors", summary["errors"]),
+            ("Evaluated by this run", summary["fresh"]),
+        ]
+        if summary["keyword_checked"]:
+            counts.append(
+                (
+                    "Keyword checks passed",
+                    f"{summary['keyword_passed']}/{summary['keyword_checked']}",
+                )
+            )
+        if summary["response_kinds"]:
+            counts.append(("Well-formed quizzes", summary["well_formed"]))
+            kinds = ", ".join(
+                f"{kind} {count}"
+                for kind, count in sorted(summary["response_kinds"].items())
+            )
+            counts.append(("Answers by kind", kinds))
+        parts = ["<h2>Summary</h2>\n<table>\n"]
+        parts += [
+            f"<tr><th>{label}</th><td>{value}</td></tr>\n" for label, value in counts
+        ]
+        parts.append("</table>\n<h2>Latency (s)</h2>\n<table>\n<tr><th></th>")
+        parts += [f"<th>p{round(q * 100)}</th>" for q in QUANTILES]
+        parts.append("</tr>\n")
+        for column, values in summary["latency_s"].items():
+            cells = "".join(f"<td>{_cell(value)}</td>" for value in values.values())
+            parts.append(f"<tr><th>{column}</th>{cells}</tr>\n")
+        parts.append("</table>\n")
+
+        shown = "not passed only" if self.include == "failures" else "all rows"
+        parts.append(f"<h2>Pages ({shown})</h2>\n<ul>\n")
+        parts += [
+            f"<li><a href='{name}'>{name}</a>: rows {first}-{last}</li>\n"
+            for name, first, last in self.pages
+        ]
+        parts.append("</ul>\n")
+
+        parts.append(f"<h2>Not passed ({self.failures})</h2>\n<ul>\n")
+        for index, page, row in self.failure_links:
+            reason = row.get("error") or f"decision {row.get('decision') or '-'}"
+            text = (row.get("input") or "")[:80]
+            parts.append(
+                f"<li><a href='{page}#row-{index}'>row {index}</a>: "
+                f"{html.escape(text)} ({html.escape(reason)})</li>\n"
+            )
+        if self.failures > len(self.failure_links):
+            parts.append(
+                f"<li>... and {self.failures - len(self.failure_links)} more</li>\n"
+            )
+        parts.append("</ul>\n</body></html>\n")
+        return "".join(parts)
+
+
+def write_report(rows, directory, **kwargs):
+    """Render an iterable of result rows into directory; returns the index path."""
+    with ReportWriter(directory, **kwargs) as writer:
+        for row in rows:
+            writer.add(row)
+    return os.path.join(directory, "index.html")
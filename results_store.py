@@ -0,0 +1,316 @@
+"""Append-only store of eval results across runs.
+
+Every ``report_evals`` run is recorded in a SQLite database: one ``runs`` row
+with the run metadata (model, prompt and quiz bank hashes, ...) and one
+``results`` row per graded example, keyed by run. The HTML report shows rows as
+they are stored, and history questions become a single indexed SQL scan:
+
+    python results_store.py history --input-contains geography --last 50
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import uuid
+
+DEFAULT_STORE_PATH = os.environ.get(
+    "EVAL_RESULTS_STORE", os.path.join("results", "eval_results.sqlite")
+)
+
+DECISION_PATTERN = re.compile(r"Decision:\s*<?\s*(Y|N)", re.IGNORECASE)
+
+RESULT_COLUMNS = [
+    "row_index",
+    "input",
+    "output",
+    "grader_response",
+    "decision",
+    "assistant_latency_s",
+    "grader_latency_s",
+    "status",
+    "attempts",
+    "error",
+    "samples",
+    "pass_rate",
+    "interval_low",
+    "interval_high",
+    "fingerprint",
+    "carried_from",
+    "keyword_hits",
+    "keyword_passed",
+    "response_kind",
+    "format_problems",
+]
+
+# Columns added after the first release, created on open for older stores
+ADDED_RESULT_COLUMNS = {
+    "status": "TEXT",
+    "attempts": "INTEGER",
+    "error": "TEXT",
+    "samples": "INTEGER",
+    "pass_rate": "REAL",
+    "interval_low": "REAL",
+    "interval_high": "REAL",
+    "fingerprint": "TEXT",
+    "carried_from": "TEXT",
+    "keyword_hits": "TEXT",
+    "keyword_passed": "INTEGER",
+    "response_kind": "TEXT",
+    "format_problems": "TEXT",
+}
+
+
+def fingerprint(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def config_fingerprint(**parts):
+    """Fingerprint of everything besides the input that decides a row's result."""
+    return fingerprint(json.dumps(parts, sort_keys=True, default=str))
+
+
+def row_fingerprint(user_input, config):
+    return fingerprint(f"{config}\x00{user_input}")
+
+
+def parse_decision(grader_response):
+    """Extract Y/N from either grader format ("Decision: Y ..." or a bare "Y")."""
+    if grader_response is None:
+        return None
+    match = DECISION_PATTERN.search(grader_response)
+    if match:
+        return match.group(1).upper()
+    first = grader_response.strip().split("\n", 1)[0].strip().strip(".").upper()
+    if first in ("Y", "YES"):
+        return "Y"
+    if first in ("N", "NO"):
+        return "N"
+    return None
+
+
+def stored_result(result, position=0):
+    """A graded row as the store keeps it: RESULT_COLUMNS, in order."""
+    return {
+        "row_index": result.get("index", position),
+        "input": result["input"],
+        "output": result.get("output"),
+        "grader_response": result.get("grader_response"),
+        "decision": result.get("decision")
+        or parse_decision(result.get("grader_response")),
+        "assistant_latency_s": result.get("assistant_latency_s"),
+        "grader_latency_s": result.get("grader_latency_s"),
+        "status": result.get("status", "ok"),
+        "attempts": result.get("attempts"),
+        "error": result.get("error"),
+        "samples": result.get("samples"),
+        "pass_rate": result.get("pass_rate"),
+        "interval_low": result.get("interval_low"),
+        "interval_high": result.get("interval_high"),
+        "fingerprint": result.get("fingerprint"),
+        "carried_from": result.get("carried_from"),
+        "keyword_hits": result.get("keyword_hits"),
+        "keyword_passed": result.get("keyword_passed"),
+        "response_kind": result.get("response_kind"),
+        "format_problems": result.get("format_problems"),
+    }
+
+
+class ResultsStore:
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                started_at TEXT NOT NULL,
+                model TEXT,
+                temperature REAL,
+                prompt_hash TEXT,
+                grader_prompt_hash TEXT,
+                quiz_bank_hash TEXT,
+                dataset TEXT,
+                metadata TEXT
+            );
+            CREATE TABLE IF NOT EXISTS results (
+                run_id TEXT NOT NULL REFERENCES runs (run_id),
+                row_index INTEGER NOT NULL,
+                input TEXT,
+                output TEXT,
+                grader_response TEXT,
+                decision TEXT,
+                assistant_latency_s REAL,
+                grader_latency_s REAL,
+                status TEXT,
+                attempts INTEGER,
+                error TEXT,
+                samples INTEGER,
+                pass_rate REAL,
+                interval_low REAL,
+                interval_high REAL,
+                fingerprint TEXT,
+                carried_from TEXT,
+                keyword_hits TEXT,
+                keyword_passed INTEGER,
+                response_kind TEXT,
+                format_problems TEXT,
+                PRIMARY KEY (run_id, row_index)
+            );
+            CREATE INDEX IF NOT EXISTS results_input ON results (input);
+            """)
+        self._migrate()
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS results_fingerprint ON results (fingerprint)"
+        )
+
+    def _migrate(self):
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(results)")}
+        with self._conn:
+            for column, column_type in ADDED_RESULT_COLUMNS.items():
+                if column not in existing:
+                    self._conn.execute(
+                        f"ALTER TABLE results ADD COLUMN {column} {column_type}"
+                    )
+
+    def close(self):
+        self._conn.close()
+
+    def start_run(
+        self,
+        model=None,
+        temperature=None,
+        prompt_hash=None,
+        grader_prompt_hash=None,
+        quiz_bank_hash=None,
+        dataset=None,
+        **metadata,
+    ):
+        run_id = uuid.uuid4().hex[:12]
+        started_at = datetime.datetime.now().isoformat(timespec="seconds")
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    run_id,
+                    started_at,
+                    model,
+                    temperature,
+                    prompt_hash,
+                    grader_prompt_hash,
+                    quiz_bank_hash,
+                    dataset,
+                    json.dumps(metadata),
+                ),
+            )
+        return run_id
+
+    def append_results(self, run_id, eval_results):
+        """Append graded rows; each needs an input, the other columns are optional.
+
+        Rows that failed after retries are stored with status "failed", their
+        error and no decision. Sampled rows carry their own sequential decision,
+        sample count, pass rate and interval. ``carried_from`` names the run a
+        result was copied from without evaluating the row again.
+        ``keyword_hits`` lists the expected category and subjects found in the
+        answer and ``keyword_passed`` whether they satisfy the dataset row.
+        ``response_kind`` is the parsed shape of the answer (quiz, refusal or
+        other) and ``format_problems`` how a quiz departs from the format.
+        ``eval_results`` may be a generator; rows are inserted as it yields them.
+        """
+        columns = ["run_id", *RESULT_COLUMNS]
+        rows = (
+            (run_id, *stored_result(result, position).values())
+            for position, result in enumerate(eval_results)
+        )
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO results ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' * len(columns))})",
+                rows,
+            )
+
+    def run_results(self, run_id):
+        """Yield one run's results as dicts in dataset order."""
+        cursor = self._conn.execute(
+            f"SELECT {', '.join(RESULT_COLUMNS)} FROM results "
+            "WHERE run_id = ? ORDER BY row_index",
+            (run_id,),
+        )
+        for row in cursor:
+            yield dict(zip(RESULT_COLUMNS, row))
+
+    def prior_result(self, row_fingerprint):
+        """Latest successful result with this fingerprint, with the run it came from."""
+        cursor = self._conn.execute(
+            f"SELECT run_id, {', '.join(RESULT_COLUMNS)} FROM results "
+            "WHERE fingerprint = ? AND (status IS NULL OR status != 'failed') "
+            "ORDER BY rowid DESC LIMIT 1",
+            (row_fingerprint,),
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        result = dict(zip(["run_id", *RESULT_COLUMNS], row))
+        # Point at the run that actually evaluated the row
+        result["carried_from"] = result["carried_from"] or result.pop("run_id")
+        result.pop("run_id", None)
+        return result
+
+    def runs(self, last=None):
+        query = "SELECT * FROM runs ORDER BY rowid DESC"
+        if last:
+            query += f" LIMIT {int(last)}"
+        cursor = self._conn.execute(query)
+        columns = [description[0] for description in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def pass_rate_history(self, input_contains=None, last=50):
+        """Pass rate per run over the last runs, optionally for matching inputs only."""
+        query = """
+            SELECT runs.run_id, runs.started_at, runs.model, runs.prompt_hash,
+                   COUNT(results.decision) AS graded,
+                   AVG(results.decision = 'Y') AS pass_rate,
+                   SUM(results.status = 'failed') AS failed,
+                   AVG(results.keyword_passed) AS keyword_pass_rate,
+                   AVG(results.assistant_latency_s) AS mean_assistant_latency_s
+            FROM (SELECT rowid AS seq, * FROM runs ORDER BY seq DESC LIMIT ?) AS runs
+            JOIN results ON results.run_id = runs.run_id
+        """
+        params = [last]
+        if input_contains:
+            query += " WHERE results.input LIKE ?"
+            params.append(f"%{input_contains}%")
+        query += " GROUP BY runs.run_id ORDER BY runs.seq"
+        cursor = self._conn.execute(query, params)
+        columns = [description[0] for description in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the eval results store")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    history = subparsers.add_parser("history", help="Pass rate per run")
+    history.add_argument("--input-contains")
+    history.add_argument("--last", type=int, default=50)
+    runs = subparsers.add_parser("runs", help="List runs and their metadata")
+    runs.add_argument("--last", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    store = ResultsStore(args.store)
+    if args.command == "history":
+        rows = store.pass_rate_history(args.input_contains, args.last)
+    else:
+        rows = store.runs(args.last)
+    for row in rows:
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
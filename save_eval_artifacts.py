@@ -1,82 +1,78 @@
-import pandas as pd
-from app import assistant_chain, quiz_bank
-from IPython.display import display, HTML
+from app import assistant_chain, build_system_message, create_llm, get_quiz_bank
+import app
 
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
-from langchain_core.output_parsers import StrOutputParser
+from adaptive import AdaptiveConcurrency, CallFailed, ResilientCaller, RetryPolicy
+
+from graders import (
+    PackedGrader,
+    create_quiz_bank_grader,
+    packed_user_message,
+    prune_context,
+    quiz_bank_system_prompt,
+    quiz_bank_user_message,
+)
+from quiz_bank_store import get_quiz_bank_store
+from category_router import CategoryRouter, routed_assistant_chain
+from grounding import CascadingGrader
+from dataset_io import DATASET_PATH, ResultsLog, read_dataset
+from metrics import MetricsCallbackHandler, format_summary
+from results_store import (
+    DEFAULT_STORE_PATH,
+    ResultsStore,
+    config_fingerprint,
+    fingerprint,
+    parse_decision,
+    row_fingerprint,
+    stored_result,
+)
+from sequential import (
+    DEFAULT_CONFIDENCE,
+    DEFAULT_PASS_THRESHOLD,
+    SequentialTest,
+    format_result,
+)
+from single_flight import SingleFlight
+from sharding import (
+    check_shard,
+    default_shard_path,
+    in_shard,
+    merge_metrics,
+    merge_shards,
+    write_shard,
+)
+from keyword_scorer import KeywordScorer
+from quiz_parser import parse_quiz
+from report_writer import DEFAULT_PAGE_SIZE, ReportWriter
+from cassette import CassetteCache
+import llm_cache
 
 import os
+import asyncio
+import multiprocessing
+import tempfile
+import functools
+import heapq
+import itertools
+import argparse
 import datetime
 import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Upper bound on dataset rows being evaluated at the same time
+DEFAULT_MAX_CONCURRENCY = int(os.environ.get("EVAL_MAX_CONCURRENCY", "8"))
+
 
-eval_system_prompt = """You are an assistant that evaluates how well the quiz assistant
-    creates quizzes for a user by looking at the set of facts available to the assistant.
-    Your primary concern is making sure that ONLY facts available are used. Helpful quizzes only contain facts in the
-    test set"""
-
-eval_user_message = """You are evaluating a generated quiz based on the question bank that the assistant uses to create the quiz.
-  Here is the data:
-    [BEGIN DATA]
-    ************
-    [Question Bank]: {context}
-    ************
-    [Quiz]: {agent_response}
-    ************
-    [END DATA]
-
-## Examples of quiz questions
-Subject: <subject>
-   Categories: <category1>, <category2>
-   Facts:
-    - <fact 1>
-    - <fact 2>
-
-## Steps to make a decision
-Compare the content of the submission with the question bank using the following steps
-
-1. Review the question bank carefully. These are the only facts the quiz can reference
-2. Compare the information in the quiz to the question bank.
-3. Ignore differences in grammar or punctuation
-
-Remember, the quizzes should only include information from the question bank.
-
-
-## Additional rules
-- Output an explanation of whether the quiz only references information in the context.
-- Make the explanation brief only include a summary of your reasoning for the decsion.
-- Include a clear "Yes" or "No" as the first paragraph.
-- Reference facts from the quiz bank if the answer is yes
-
-Separate the decision and the explanation. For example:
-
-************
-Decision: <Y>
-************
-Explanation: <Explanation>
-************
-"""
-
-# In a real application you would load your dataset from a file or logging tool.
-# Here we have a mix of examples with slightly different phrasing that our quiz application can support
-# and things we don't support.
-dataset = [
-    {
-        "input": "I'm trying to learn about science, can you give me a quiz to test my knowledge",
-        "response": "science",
-        "subjects": ["davinci", "telescope", "physics", "curie"],
-    },
-    {
-        "input": "I'm an geography expert, give a quiz to prove it?",
-        "response": "geography",
-        "subjects": ["paris", "france", "louvre"],
-    },
-    {
-        "input": "Quiz me about Italy",
-        "response": "geography",
-        "subjects": ["rome", "alps", "sicily"],
-    },
-]
+# The dataset lives in datasets/quiz_requests.jsonl. It has a mix of examples with slightly different phrasing
+# that our quiz application can support and things we don't support.
+def __getattr__(name):
+    # Loaded on first access so importing this module does no file I/O
+    if name == "dataset":
+        globals()["dataset"] = list(read_dataset(DATASET_PATH))
+        return globals()["dataset"]
+    if name == "quiz_bank":
+        return get_quiz_bank()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def setup_logging():
@@ -89,19 +85,23 @@ def setup_logging():
     return logging.getLogger()
 
 
-def create_eval_chain():
-    eval_prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", eval_system_prompt),
-            ("human", eval_user_message),
-        ]
+def create_eval_chain(llm=None, quiz_bank_index=None):
+    return create_quiz_bank_grader(
+        llm=llm or create_llm(), quiz_bank_index=quiz_bank_index
     )
 
-    return (
-        eval_prompt
-        | ChatOpenAI(model="gpt-3.5-turbo", temperature=0)
-        | StrOutputParser()
-    )
+
+def completion_source(llm):
+    """Where an LLM's completions come from: its endpoint and any cassette."""
+    cassette = llm.cache if isinstance(llm.cache, CassetteCache) else None
+    return {
+        "base_url": str(llm.root_client.base_url),
+        "cassette": (
+            None
+            if cassette is None
+            else [os.path.abspath(cassette.path), cassette.mode]
+        ),
+    }
 
 
 def evaluate_dataset(dataset, quiz_bank, assistant, evaluator):
@@ -132,22 +132,234 @@ def evaluate_dataset(dataset, quiz_bank, assistant, evaluator):
     return eval_results
 
 
-def report_evals():
-    logger = setup_logging()
-    logger.info("Starting evaluation report generation")
+async def aevaluate_row(
+    idx, row, quiz_bank, assistant, evaluator, callbacks=None, caller=None
+):
+    """Answer one dataset row and grade the answer as soon as it arrives.
+
+    With a ``ResilientCaller`` both calls are retried on transient errors, and a
+    row whose calls keep failing is returned with status "failed" instead of
+    raising.
+    """
+    logger = logging.getLogger()
+    user_input = row["input"]
+    config = {"callbacks": callbacks, "metadata": {"row_index": idx}}
+    attempts = 0
+
+    async def call(make_call):
+        nonlocal attempts
+        if caller is None:
+            attempts += 1
+            return await make_call(config)
+        result, tries = await caller.call(make_call, config)
+        attempts += tries
+        return result
 
-    assistant = assistant_chain()
-    model_graded_evaluator = create_eval_chain()
+    logger.info(f"Processing example {idx+1}: {user_input}")
+    start = time.perf_counter()
+    answer = eval_response = None
+    try:
+        answer = await call(
+            lambda config: assistant.ainvoke({"question": user_input}, config=config)
+        )
+        answered = time.perf_counter()
+        logger.info(f"Received assistant response for example {idx+1}, evaluating...")
+
+        eval_response = await call(
+            lambda config: evaluator.ainvoke(
+                {"context": quiz_bank, "agent_response": answer}, config=config
+            )
+        )
+    except CallFailed as failure:
+        logger.warning(f"Example {idx+1} failed: {failure}")
+        return {
+            "input": user_input,
+            "output": answer,
+            "grader_response": None,
+            "status": "failed",
+            "attempts": attempts + failure.attempts,
+            "error": str(failure),
+        }
+    graded = time.perf_counter()
+    logger.info(f"Evaluation complete for example {idx+1}")
 
-    logger.info("Evaluating dataset with assistant and evaluator")
-    eval_results = evaluate_dataset(
-        dataset, quiz_bank, assistant, model_graded_evaluator
+    return {
+        "input": user_input,
+        "output": answer,
+        "grader_response": eval_response,
+        "assistant_latency_s": answered - start,
+        "grader_latency_s": graded - answered,
+        "status": "ok",
+        "attempts": attempts,
+    }
+
+
+async def asample_row(
+    idx,
+    row,
+    quiz_bank,
+    assistant,
+    evaluator,
+    callbacks=None,
+    caller=None,
+    sequential=SequentialTest,
+):
+    """Evaluate one row repeatedly until its pass rate is decided.
+
+    ``sequential`` builds a fresh ``SequentialTest`` per row. The last sample's
+    answer and grade are kept; the decision is the sequential verdict.
+    """
+    test = sequential()
+    while not test.done:
+        result = await aevaluate_row(
+            idx, row, quiz_bank, assistant, evaluator, callbacks, caller
+        )
+        if result["status"] == "failed":
+            return result
+        test.update(parse_decision(result["grader_response"]) == "Y")
+    outcome = test.result()
+    logging.getLogger().info(f"Example {idx+1} {format_result(outcome)}")
+    return {
+        **result,
+        "decision": "Y" if outcome.passed else "N",
+        "samples": outcome.samples,
+        "pass_rate": outcome.pass_rate,
+        "interval_low": outcome.interval[0],
+        "interval_high": outcome.interval[1],
+        "decided": outcome.decided,
+    }
+
+
+def _row_evaluator(sequential):
+    if sequential is None:
+        return aevaluate_row
+    return functools.partial(asample_row, sequential=sequential)
+
+
+async def aevaluate_dataset(
+    dataset,
+    quiz_bank,
+    assistant,
+    evaluator,
+    max_concurrency=DEFAULT_MAX_CONCURRENCY,
+    callbacks=None,
+    caller=None,
+    sequential=None,
+    skip=None,
+):
+    """Evaluate the dataset concurrently, returning results in input order.
+
+    Each row is graded as soon as its answer arrives; at most ``max_concurrency``
+    rows are in flight at any time. A ``caller`` with adaptive concurrency may
+    run fewer model calls at once while the API is throttling. With a
+    ``sequential`` test factory each row is sampled until its pass rate is
+    decided. Rows for which ``skip(idx, row)`` is true are left out, and every
+    result carries its dataset ``index``.
+    """
+    logger = logging.getLogger()
+    logger.info(
+        f"Starting async dataset evaluation with max_concurrency={max_concurrency}"
+    )
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    evaluate = _row_evaluator(sequential)
+
+    async def evaluate_row(idx, row):
+        async with semaphore:
+            result = await evaluate(
+                idx, row, quiz_bank, assistant, evaluator, callbacks, caller
+            )
+            return {"index": idx, **result}
+
+    eval_results = await asyncio.gather(
+        *(
+            evaluate_row(idx, row)
+            for idx, row in enumerate(dataset)
+            if skip is None or not skip(idx, row)
+        )
+    )
+
+    logger.info(f"Completed evaluation of {len(eval_results)} examples")
+    return list(eval_results)
+
+
+async def aevaluate_stream(
+    rows,
+    quiz_bank,
+    assistant,
+    evaluator,
+    results_log,
+    max_concurrency=DEFAULT_MAX_CONCURRENCY,
+    callbacks=None,
+    caller=None,
+    sequential=None,
+    skip=None,
+):
+    """Evaluate rows read lazily from an iterable, checkpointing each to results_log.
+
+    Rows already in the log are skipped, so rerunning after a crash resumes where
+    the previous run stopped; rows logged as failed are evaluated again. Rows for
+    which ``skip(idx, row)`` is true are not evaluated either. Only
+    ``max_concurrency`` rows are held in memory. Returns the number of rows
+    evaluated by this call.
+    """
+    logger = logging.getLogger()
+    completed = results_log.completed()
+    logger.info(
+        f"Starting streaming evaluation with {len(completed)} rows already "
+        f"in {results_log.path}"
     )
 
-    logger.info("Creating DataFrame from evaluation results")
-    df = pd.DataFrame(eval_results)
-    ## clean up new lines to be html breaks
-    df_html = df.to_html().replace("\\n", "<br>")
+    evaluate = _row_evaluator(sequential)
+
+    async def evaluate_row(idx, row):
+        result = await evaluate(
+            idx, row, quiz_bank, assistant, evaluator, callbacks, caller
+        )
+        return {"index": idx, **result}
+
+    def checkpoint(tasks):
+        for task in tasks:
+            results_log.append(task.result())
+
+    evaluated = 0
+    pending = set()
+    for idx, row in enumerate(rows):
+        if results_log.is_done(completed, idx, row):
+            continue
+        if skip is not None and skip(idx, row):
+            continue
+        if len(pending) >= max_concurrency:
+            finished, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            checkpoint(finished)
+        pending.add(asyncio.create_task(evaluate_row(idx, row)))
+        evaluated += 1
+
+    if pending:
+        finished, _ = await asyncio.wait(pending)
+        checkpoint(finished)
+
+    logger.info(f"Completed streaming evaluation of {evaluated} new examples")
+    return evaluated
+
+
+def publish_run(
+    store,
+    run_id,
+    eval_results,
+    metrics,
+    report_page_size=DEFAULT_PAGE_SIZE,
+    report_rows="all",
+    metrics_prom_path=None,
+):
+    """Store a run's graded rows and write its HTML report and call metrics.
+
+    Rows go to the store and the report as ``eval_results`` yields them, so a
+    generator of results is never held in memory as a whole.
+    """
+    logger = logging.getLogger()
 
     # Create reports directory if it doesn't exist
     os.makedirs("reports", exist_ok=True)
@@ -155,21 +367,683 @@ def report_evals():
 
     # Create timestamp for filename
     timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
-    filename = f"eval_results_{timestamp}.html"
-    filepath = f"reports/{filename}"
+    report_dir = f"reports/eval_results_{timestamp}"
+
+    # The HTML report shows each row as the results store records it, paged
+    # as the rows arrive so memory stays flat however big the run is
+    logger.info(f"Saving evaluation results to {report_dir}")
+    with ReportWriter(
+        report_dir,
+        page_size=report_page_size,
+        include=report_rows,
+        title=f"Eval run {run_id}",
+    ) as report:
+
+        def reported(results):
+            for position, result in enumerate(results):
+                row = stored_result(result, position)
+                # Rows evaluated by this run, as opposed to carried forward unchanged
+                report.add({"fresh": row["carried_from"] is None, **row})
+                yield result
+
+        store.append_results(run_id, reported(eval_results))
+    summary = report.summary()
+    if summary["errors"]:
+        logger.warning(
+            f"{summary['errors']} of {summary['rows']} rows failed; see the error column"
+        )
 
-    # Save to reports directory in project with timestamp in filename
-    logger.info(f"Saving evaluation results to {filepath}")
-    with open(filepath, "w") as f:
-        f.write(df_html)
+    logger.info(f"Evaluation report saved successfully to {report_dir}/index.html")
+
+    metrics_path = f"reports/eval_metrics_{timestamp}.json"
+    metrics.write_json(metrics_path)
+    logger.info(f"Call metrics saved to {metrics_path}")
+    if metrics_prom_path:
+        metrics.write_prometheus(metrics_prom_path)
+    logger.info(f"Call metrics:\n{format_summary(metrics.summary())}")
+
+
+def report_evals(
+    max_concurrency=DEFAULT_MAX_CONCURRENCY,
+    prune_quiz_bank=False,
+    pre_route=False,
+    cascade_grader=False,
+    dataset_path=DATASET_PATH,
+    results_log_path=None,
+    results_store_path=DEFAULT_STORE_PATH,
+    pack_size=1,
+    metrics_prom_path=None,
+    adaptive=True,
+    max_retries=3,
+    attempt_timeout_s=60.0,
+    call_deadline_s=300.0,
+    samples=1,
+    pass_threshold=DEFAULT_PASS_THRESHOLD,
+    confidence=DEFAULT_CONFIDENCE,
+    dedupe=True,
+    normalize_inputs=False,
+    incremental=True,
+    report_page_size=DEFAULT_PAGE_SIZE,
+    report_rows="all",
+    shard_index=0,
+    shard_count=1,
+    shard_output=None,
+):
+    logger = setup_logging()
+    check_shard(shard_index, shard_count)
+    if shard_count > 1 and shard_output is None:
+        shard_output = default_shard_path(shard_index, shard_count)
+    logger.info("Starting evaluation report generation")
+    quiz_bank_index = None
+    if prune_quiz_bank:
+        # Prompts render only the subjects they need, so the bank is never
+        # decoded as a whole; the run records the file's digest instead
+        bank_store = get_quiz_bank_store(app.QUIZ_BANK_PATH)
+        quiz_bank_index = bank_store.index()
+        logger.info(
+            f"Pruning quiz bank prompts ({len(quiz_bank_index.subjects)} subjects indexed)"
+        )
+        quiz_bank = None
+        quiz_bank_hash = bank_store.fingerprint()
+    else:
+        quiz_bank = get_quiz_bank()
+        quiz_bank_hash = fingerprint(quiz_bank)
+    sequential = None
+    # ResilientCaller owns retries and backoff; SDK retries would hide 429s and
+    # 5xx errors from the adaptive concurrency limit and multiply the attempts
+    llm_kwargs = {"max_retries": 0}
+    if samples > 1:
+        # Sample each row until its pass rate clears or misses the threshold;
+        # repeated samples have to reach the API, so responses are not cached
+        sequential = functools.partial(
+            SequentialTest, pass_threshold, confidence, max_samples=samples
+        )
+        llm_kwargs["cache"] = False
+        logger.info(
+            f"Sampling each row up to {samples} times against a "
+            f"{pass_threshold:.0%} pass rate at {confidence:.0%} confidence"
+        )
+    llm = create_llm(**llm_kwargs)
+    assistant = assistant_chain(llm=llm, quiz_bank_index=quiz_bank_index)
+    model_graded_evaluator = create_eval_chain(llm=create_llm(**llm_kwargs))
+    grader_prompt = quiz_bank_system_prompt + quiz_bank_user_message
+
+    # Retry transient API errors per call and record rows that still fail;
+    # max_concurrency caps the adaptive limit instead of fixing it
+    concurrency = (
+        AdaptiveConcurrency(
+            initial_limit=min(4, max_concurrency), max_limit=max_concurrency
+        )
+        if adaptive
+        else None
+    )
+
+    packed = None
+    if pack_size > 1:
+        # Grade up to pack_size quizzes per request against one copy of the bank;
+        # each pack request takes one adaptive slot, not each item in it
+        packed = PackedGrader(
+            create_llm(**llm_kwargs), pack_size=pack_size, concurrency=concurrency
+        )
+        model_graded_evaluator = packed.as_runnable()
+        grader_prompt = quiz_bank_system_prompt + packed_user_message
+
+    cascade = CascadingGrader(model_graded_evaluator) if cascade_grader else None
+    if cascade is not None:
+        model_graded_evaluator = cascade.as_runnable()
+    # Pruned last, so the local grounding check and the model grader both see
+    # the subjects the quiz references rather than no context at all
+    model_graded_evaluator = prune_context(model_graded_evaluator, quiz_bank_index)
+
+    router = CategoryRouter() if pre_route else None
+    if router is not None:
+        assistant = routed_assistant_chain(assistant, router)
+
+    flight = None
+    if dedupe and sequential is None:
+        # Identical requests in one run share a call; sampled rows must not
+        flight = SingleFlight(normalize=normalize_inputs)
+        assistant = flight.wrap(assistant, "assistant")
+        model_graded_evaluator = flight.wrap(model_graded_evaluator, "grader")
+
+    # Everything besides the input that decides a row's result; a row whose
+    # fingerprint matches a stored result is carried forward, not re-evaluated.
+    # The endpoint and cassette are included so grades from a fake server or a
+    # recording are never carried into a run against the real API.
+    source = completion_source(llm)
+    run_config = config_fingerprint(
+        model=llm.model_name,
+        temperature=llm.temperature,
+        **source,
+        prompt_hash=fingerprint(build_system_message("")),
+        # A pruned row only sees its own subjects; see fingerprint_row
+        quiz_bank_hash=None if quiz_bank_index else quiz_bank_hash,
+        grader_prompt_hash=fingerprint(grader_prompt),
+        prune_quiz_bank=prune_quiz_bank,
+        pre_route=pre_route,
+        cascade_grader=cascade_grader,
+        pack_size=pack_size,
+        samples=samples,
+        pass_threshold=pass_threshold if samples > 1 else None,
+        confidence=confidence if samples > 1 else None,
+    )
+
+    run = dict(
+        model=llm.model_name,
+        temperature=llm.temperature,
+        **source,
+        prompt_hash=fingerprint(build_system_message("")),
+        grader_prompt_hash=fingerprint(grader_prompt),
+        quiz_bank_hash=quiz_bank_hash,
+        dataset=dataset_path,
+        prune_quiz_bank=prune_quiz_bank,
+        pre_route=pre_route,
+        cascade_grader=cascade_grader,
+        pack_size=pack_size,
+        adaptive=adaptive,
+        max_retries=max_retries,
+        samples=samples,
+        dedupe=flight is not None,
+        normalize_inputs=normalize_inputs,
+        pass_threshold=pass_threshold if samples > 1 else None,
+        confidence=confidence if samples > 1 else None,
+        incremental=incremental,
+        config_fingerprint=run_config,
+    )
+    store = ResultsStore(results_store_path)
+    run_id = None
+    if shard_output is None:
+        run_id = store.start_run(**run)
+        logger.info(f"Recording run {run_id} in {results_store_path}")
+    else:
+        logger.info(
+            f"Evaluating shard {shard_index} of {shard_count} into {shard_output}"
+        )
 
-    logger.info(f"Evaluation report saved successfully to {filepath}")
+    def fingerprint_row(user_input):
+        if quiz_bank_index is not None:
+            # Editing one subject only re-runs the rows whose prompt includes it
+            user_input += "\x00" + quiz_bank_index.render_for_request(user_input)
+        return row_fingerprint(user_input, run_config)
 
+    # Only the fingerprints of carried rows are kept; their results are read
+    # back from the store while the run is written out
+    carried = {}
 
-def main():
+    def carry_forward(idx, row):
+        key = fingerprint_row(row["input"])
+        if store.prior_result(key) is None:
+            return False
+        carried[idx] = key
+        return True
+
+    def skip(idx, row):
+        if not in_shard(idx, shard_index, shard_count):
+            return True
+        return incremental and carry_forward(idx, row)
+
+    caller = ResilientCaller(
+        concurrency,
+        RetryPolicy(
+            max_attempts=max_retries + 1,
+            attempt_timeout_s=attempt_timeout_s,
+            deadline_s=call_deadline_s,
+        ),
+    )
+
+    metrics = MetricsCallbackHandler()
+    logger.info(f"Evaluating {dataset_path} with assistant and evaluator")
+    if results_log_path:
+        # Stream rows from disk and checkpoint each graded row so reruns resume
+        results_log = ResultsLog(results_log_path)
+        asyncio.run(
+            aevaluate_stream(
+                read_dataset(dataset_path),
+                quiz_bank,
+                assistant,
+                model_graded_evaluator,
+                results_log,
+                max_concurrency=max_concurrency,
+                callbacks=[metrics],
+                caller=caller,
+                sequential=sequential,
+                skip=skip,
+            )
+        )
+        fresh = results_log.iter_results()
+    else:
+        fresh = asyncio.run(
+            aevaluate_dataset(
+                list(read_dataset(dataset_path)),
+                quiz_bank,
+                assistant,
+                model_graded_evaluator,
+                max_concurrency=max_concurrency,
+                callbacks=[metrics],
+                caller=caller,
+                sequential=sequential,
+                skip=skip,
+            )
+        )
+
+    def carried_results():
+        for idx, key in carried.items():
+            prior = store.prior_result(key)
+            prior.pop("row_index")
+            yield {**prior, "index": idx}
+
+    scorer = KeywordScorer(read_dataset(dataset_path))
+    # Only running totals outlive the rows they count
+    counts = dict.fromkeys(
+        (
+            "rows",
+            "fresh",
+            "failed",
+            "well_formed",
+            "keyword_passed",
+            "sampled",
+            "samples",
+            "undecided",
+        ),
+        0,
+    )
+
+    def checked_results():
+        """Fresh and carried rows in dataset order, with local checks added.
+
+        Both inputs are sorted by index, so one merge pass over them and the
+        dataset annotates every row without holding the run in memory. When an
+        index has both (a resumed log can hold a row that failed before it
+        could be carried), a successful row wins, and the fresh one wins a tie.
+        """
+        rows = enumerate(read_dataset(dataset_path))
+        idx, row = -1, None
+        merged = heapq.merge(fresh, carried_results(), key=lambda r: r["index"])
+        for _, group in itertools.groupby(merged, key=lambda r: r["index"]):
+            group = list(group)
+            result = next(
+                (item for item in group if item.get("status") != "failed"), group[0]
+            )
+            counts["rows"] += 1
+            if result.get("carried_from") is None:
+                result["fingerprint"] = fingerprint_row(result["input"])
+                counts["fresh"] += 1
+                if "samples" in result:
+                    counts["sampled"] += 1
+                    counts["samples"] += result["samples"]
+                    counts["undecided"] += not result["decided"]
+            if result.get("status") == "failed":
+                counts["failed"] += 1
+                yield result
+                continue
+
+            # Local format check: quiz, refusal or other, and how a quiz
+            # departs from the format the system prompt asks for
+            parsed = parse_quiz(result.get("output"))
+            result["response_kind"] = parsed.kind
+            result["format_problems"] = "; ".join(parsed.problems) or None
+            counts["well_formed"] += parsed.valid
+
+            # Deterministic keyword checks against the dataset's expected
+            # category and subjects; recomputed for carried rows too
+            while idx < result["index"]:
+                idx, row = next(rows)
+            score = scorer.score(row, result.get("output"))
+            result["keyword_hits"] = ", ".join(score.hits)
+            result["keyword_passed"] = score.passed
+            counts["keyword_passed"] += bool(score.passed)
+            yield result
+
+    if shard_output is not None:
+        write_shard(
+            shard_output, shard_index, shard_count, run, checked_results(), metrics
+        )
+        logger.info(
+            f"Shard {shard_index} of {shard_count} saved to {shard_output} "
+            f"({counts['rows']} rows, {counts['failed']} failed)"
+        )
+    else:
+        publish_run(
+            store,
+            run_id,
+            checked_results(),
+            metrics,
+            report_page_size=report_page_size,
+            report_rows=report_rows,
+            metrics_prom_path=metrics_prom_path,
+        )
+    store.close()
+    logger.info(
+        f"Evaluated {counts['fresh']} rows; carried {counts['rows'] - counts['fresh']} "
+        "unchanged rows forward from earlier runs"
+    )
+    logger.info(
+        f"{counts['well_formed']} of {counts['rows']} answers are well-formed quizzes"
+    )
+    logger.info(
+        f"Keyword checks passed for {counts['keyword_passed']} of {counts['rows']} "
+        f"rows ({len(scorer.matcher.keywords)} expected keywords)"
+    )
+
+    logger.info(f"Call retry stats: {caller.stats()}")
+    if sequential is not None:
+        logger.info(
+            f"Sequential sampling: {counts['samples']} samples for "
+            f"{counts['sampled']} rows (at most {samples * counts['sampled']}), "
+            f"{counts['undecided']} undecided at the limit"
+        )
+    if router is not None:
+        logger.info(f"Pre-router stats: {router.stats()}")
+    if cascade is not None:
+        logger.info(f"Cascading grader stats: {cascade.stats()}")
+    if packed is not None:
+        logger.info(f"Packed grader stats: {packed.stats()}")
+    if flight is not None:
+        logger.info(f"Request dedupe stats: {flight.stats()}")
+    if llm_cache.cache_enabled():
+        logger.info(f"LLM cache stats: {llm_cache.open_llm_cache().stats()}")
+
+
+def merge_shard_outputs(
+    shard_paths,
+    results_store_path=DEFAULT_STORE_PATH,
+    report_page_size=DEFAULT_PAGE_SIZE,
+    report_rows="all",
+    metrics_prom_path=None,
+):
+    """Record a full set of shard files as one run and write its report."""
+    logger = setup_logging()
+    run, rows = merge_shards(shard_paths)
+    store = ResultsStore(results_store_path)
+    run_id = store.start_run(**run, shards=len(shard_paths))
+    logger.info(
+        f"Merging {len(shard_paths)} shards into run {run_id} in {results_store_path}"
+    )
+    publish_run(
+        store,
+        run_id,
+        rows,
+        merge_metrics(shard_paths),
+        report_page_size=report_page_size,
+        report_rows=report_rows,
+        metrics_prom_path=metrics_prom_path,
+    )
+    store.close()
+    return run_id
+
+
+def _run_shard(cache_enabled, kwargs):
+    # Worker processes start fresh; carry over the parent's cache setting
+    llm_cache.configure_llm_cache(enabled=cache_enabled)
+    report_evals(**kwargs)
+
+
+def report_evals_parallel(
+    workers,
+    results_store_path=DEFAULT_STORE_PATH,
+    results_log_path=None,
+    report_page_size=DEFAULT_PAGE_SIZE,
+    report_rows="all",
+    metrics_prom_path=None,
+    **kwargs,
+):
+    """Evaluate the dataset as one shard per worker process, then merge them."""
+    logger = setup_logging()
+    # Create the store up front; workers only read earlier results from it
+    ResultsStore(results_store_path).close()
+    with tempfile.TemporaryDirectory(prefix="eval_shards_") as directory:
+        shard_paths = [
+            default_shard_path(index, workers, directory) for index in range(workers)
+        ]
+        logger.info(f"Evaluating {workers} shards in parallel worker processes")
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(workers, mp_context=context) as pool:
+            futures = [
+                pool.submit(
+                    _run_shard,
+                    llm_cache.cache_enabled(),
+                    dict(
+                        kwargs,
+                        results_store_path=results_store_path,
+                        # Each worker resumes from its own log
+                        results_log_path=(
+                            f"{results_log_path}.shard-{index}-of-{workers}"
+                            if results_log_path
+                            else None
+                        ),
+                        shard_index=index,
+                        shard_count=workers,
+                        shard_output=shard_paths[index],
+                    ),
+                )
+                for index in range(workers)
+            ]
+            for future in futures:
+                future.result()
+        return merge_shard_outputs(
+            shard_paths,
+            results_store_path,
+            report_page_size=report_page_size,
+            report_rows=report_rows,
+            metrics_prom_path=metrics_prom_path,
+        )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate evaluation artifacts")
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=DEFAULT_MAX_CONCURRENCY,
+        help="Maximum number of dataset rows evaluated at the same time",
+    )
+    parser.add_argument(
+        "--dataset",
+        default=DATASET_PATH,
+        help="Dataset to evaluate (.jsonl or .csv)",
+    )
+    parser.add_argument(
+        "--results-log",
+        help="Stream rows from the dataset and checkpoint results to this JSONL file; "
+        "rerunning with the same log resumes after the last graded row",
+    )
+    parser.add_argument(
+        "--results-store",
+        default=DEFAULT_STORE_PATH,
+        help="SQLite database the run and its results are appended to",
+    )
+    parser.add_argument(
+        "--cache",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Serve repeated prompts from the on-disk LLM cache (default: EVAL_LLM_CACHE)",
+    )
+    parser.add_argument(
+        "--clear-cache",
+        action="store_true",
+        help="Empty the on-disk LLM cache before running",
+    )
+    parser.add_argument(
+        "--prune-quiz-bank",
+        action="store_true",
+        help="Send only the quiz bank subjects each request and quiz need",
+    )
+    parser.add_argument(
+        "--pre-route",
+        action="store_true",
+        help="Answer requests for topics outside the quiz bank locally",
+    )
+    parser.add_argument(
+        "--cascade-grader",
+        action="store_true",
+        help="Grade clear-cut quizzes locally and escalate the rest to the LLM grader",
+    )
+    parser.add_argument(
+        "--pack-size",
+        type=int,
+        default=1,
+        help="Grade up to this many quizzes per grader request against one copy of "
+        "the quiz bank (1 grades each quiz on its own)",
+    )
+    parser.add_argument(
+        "--metrics-prom",
+        help="Also write the per-call latency and token metrics to this file in the "
+        "Prometheus text format",
+    )
+    parser.add_argument(
+        "--adaptive",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Adjust the number of concurrent model calls to latency and throttling, "
+        "up to --max-concurrency (default: on)",
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=3,
+        help="Retries per model call on rate limits, server errors and timeouts",
+    )
+    parser.add_argument(
+        "--attempt-timeout",
+        type=float,
+        default=60.0,
+        help="Seconds before a single model call attempt is abandoned",
+    )
+    parser.add_argument(
+        "--call-deadline",
+        type=float,
+        default=300.0,
+        help="Seconds a model call may take including retries before its row is "
+        "recorded as failed",
+    )
+    parser.add_argument(
+        "--samples",
+        type=int,
+        default=1,
+        help="Sample each row up to this many times, stopping once its pass rate is "
+        "decided (1 evaluates each row once)",
+    )
+    parser.add_argument(
+        "--pass-threshold",
+        type=float,
+        default=DEFAULT_PASS_THRESHOLD,
+        help="Pass rate a sampled row must reach",
+    )
+    parser.add_argument(
+        "--confidence",
+        type=float,
+        default=DEFAULT_CONFIDENCE,
+        help="Confidence of the sequential pass/fail decision and reported interval",
+    )
+    parser.add_argument(
+        "--dedupe",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Share one call between identical assistant or grader requests in the "
+        "run (default: on; off when --samples > 1)",
+    )
+    parser.add_argument(
+        "--normalize-inputs",
+        action="store_true",
+        help="Ignore whitespace and case when matching identical requests",
+    )
+    parser.add_argument(
+        "--incremental",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Carry forward stored results of rows whose input, prompts, quiz bank, "
+        "model and grader are unchanged instead of evaluating them again (default: on)",
+    )
+    parser.add_argument(
+        "--report-page-size",
+        type=int,
+        default=DEFAULT_PAGE_SIZE,
+        help="Rows per page of the HTML report",
+    )
+    parser.add_argument(
+        "--report-rows",
+        choices=["all", "failures"],
+        default="all",
+        help="Rows rendered into report pages; the summary page always counts all rows",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Evaluate the dataset as this many shards in parallel worker processes "
+        "and merge them into one run",
+    )
+    parser.add_argument(
+        "--shard-index",
+        type=int,
+        default=0,
+        help="Evaluate only this shard of the dataset (0-based), e.g. one CI matrix job",
+    )
+    parser.add_argument(
+        "--shard-count",
+        type=int,
+        default=1,
+        help="Number of shards the dataset is split into",
+    )
+    parser.add_argument(
+        "--shard-output",
+        help="File the shard's results are written to instead of the results store "
+        "(default: shards/shard-<index>-of-<count>.jsonl)",
+    )
+    parser.add_argument(
+        "--merge-shards",
+        nargs="+",
+        metavar="SHARD",
+        help="Merge these shard files into one run and report instead of evaluating",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    llm_cache.configure_llm_cache(enabled=args.cache, clear=args.clear_cache)
     logger = logging.getLogger()
     logger.info("Starting evaluation process")
-    report_evals()
+    options = dict(
+        max_concurrency=args.max_concurrency,
+        prune_quiz_bank=args.prune_quiz_bank,
+        pre_route=args.pre_route,
+        cascade_grader=args.cascade_grader,
+        dataset_path=args.dataset,
+        results_log_path=args.results_log,
+        results_store_path=args.results_store,
+        pack_size=args.pack_size,
+        metrics_prom_path=args.metrics_prom,
+        adaptive=args.adaptive,
+        max_retries=args.max_retries,
+        attempt_timeout_s=args.attempt_timeout,
+        call_deadline_s=args.call_deadline,
+        samples=args.samples,
+        pass_threshold=args.pass_threshold,
+        confidence=args.confidence,
+        dedupe=args.dedupe,
+        normalize_inputs=args.normalize_inputs,
+        incremental=args.incremental,
+        report_page_size=args.report_page_size,
+        report_rows=args.report_rows,
+    )
+    if args.merge_shards:
+        merge_shard_outputs(
+            args.merge_shards,
+            args.results_store,
+            report_page_size=args.report_page_size,
+            report_rows=args.report_rows,
+            metrics_prom_path=args.metrics_prom,
+        )
+    elif args.workers > 1:
+        report_evals_parallel(args.workers, **options)
+    else:
+        report_evals(
+            **options,
+            shard_index=args.shard_index,
+            shard_count=args.shard_count,
+            shard_output=args.shard_output,
+        )
     logger.info("Evaluation process completed")
 
 
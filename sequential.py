@@ -0,0 +1,145 @@
+"""Sequential early stopping for repeated-sample evals.
+
+A non-deterministic check (a model-graded test, a dataset row) is sampled until
+its pass rate is clearly above or below a threshold, instead of a fixed number
+of times. ``SequentialTest`` runs Wald's SPRT of ``p <= threshold - margin``
+against ``p >= threshold + margin`` with error rates ``1 - confidence``, so a
+case that always passes or fails is decided after a handful of samples and only
+borderline cases use the whole ``max_samples`` budget. Every result carries the
+Wilson score interval of its pass rate:
+
+    result = sample_until_decided(lambda: grade(answer()) == "Y", SequentialTest(0.9))
+    print(format_result(result))  # "pass: 27/27 (100.0%, 95% CI 87.5%-100.0%)"
+
+A case still undecided at ``max_samples`` is judged by its observed pass rate
+and reported with ``decided=False``.
+"""
+
+import math
+from collections import namedtuple
+from statistics import NormalDist
+
+# Shared by the pytest options and save_eval_artifacts.py, so a sampled check
+# and a sampled eval row are held to the same bar
+DEFAULT_PASS_THRESHOLD = 0.9
+DEFAULT_CONFIDENCE = 0.95
+
+SequentialResult = namedtuple(
+    "SequentialResult",
+    ["passed", "decided", "passes", "samples", "pass_rate", "interval", "confidence"],
+)
+
+
+def wilson_interval(passes, samples, confidence=DEFAULT_CONFIDENCE):
+    """Wilson score interval for a binomial pass rate; (0, 1) with no samples."""
+    if samples == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    rate = passes / samples
+    denominator = 1 + z * z / samples
+    center = (rate + z * z / (2 * samples)) / denominator
+    spread = (
+        z
+        * math.sqrt(rate * (1 - rate) / samples + z * z / (4 * samples * samples))
+        / denominator
+    )
+    return max(0.0, center - spread), min(1.0, center + spread)
+
+
+class SequentialTest:
+    def __init__(
+        self,
+        threshold=DEFAULT_PASS_THRESHOLD,
+        confidence=DEFAULT_CONFIDENCE,
+        margin=0.05,
+        min_samples=1,
+        max_samples=50,
+    ):
+        self.threshold = threshold
+        self.confidence = confidence
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        # Keep both hypotheses strictly inside (0, 1) so every sample moves the ratio
+        epsilon = 1e-3
+        self.p0 = min(max(threshold - margin, epsilon), 1 - 2 * epsilon)
+        self.p1 = max(min(threshold + margin, 1 - epsilon), self.p0 + epsilon)
+        error = 1 - confidence
+        self.upper = math.log((1 - error) / error)
+        self.lower = math.log(error / (1 - error))
+        self.passes = 0
+        self.samples = 0
+        self.log_ratio = 0.0
+
+    def update(self, passed):
+        """Record one sample; returns True/False once decided, else None."""
+        self.samples += 1
+        if passed:
+            self.passes += 1
+            self.log_ratio += math.log(self.p1 / self.p0)
+        else:
+            self.log_ratio += math.log((1 - self.p1) / (1 - self.p0))
+        return self.decision()
+
+    def decision(self):
+        if self.samples < self.min_samples:
+            return None
+        if self.log_ratio >= self.upper:
+            return True
+        if self.log_ratio <= self.lower:
+            return False
+        return None
+
+    @property
+    def done(self):
+        return self.decision() is not None or self.samples >= self.max_samples
+
+    def result(self):
+        decision = self.decision()
+        pass_rate = self.passes / self.samples if self.samples else None
+        if decision is None:
+            passed = pass_rate is not None and pass_rate >= self.threshold
+        else:
+            passed = decision
+        return SequentialResult(
+            passed,
+            decision is not None,
+            self.passes,
+            self.samples,
+            pass_rate,
+            wilson_interval(self.passes, self.samples, self.confidence),
+            self.confidence,
+        )
+
+
+def sample_until_decided(check, test):
+    """Call check() (returning truthy for a pass) until test is done."""
+    while not test.done:
+        test.update(bool(check()))
+    return test.result()
+
+
+async def asample_until_decided(acheck, test):
+    while not test.done:
+        test.update(bool(await acheck()))
+    return test.result()
+
+
+def format_result(result):
+    low, high = result.interval
+    verdict = "pass" if result.passed else "fail"
+    rate = "-" if result.pass_rate is None else f"{result.pass_rate:.1%}"
+    return (
+        f"{verdict}: {result.passes}/{result.samples} ({rate}, "
+        f"{result.confidence:.0%} CI {low:.1%}-{high:.1%})"
+        + ("" if result.decided else ", undecided at the sample limit")
+    )
+
+
+def assert_pass_rate(check, test, message=None):
+    """Sample check() sequentially and assert the pass rate clears the threshold."""
+    result = sample_until_decided(check, test)
+    assert result.passed, (
+        f"{message or 'Pass rate below threshold'} "
+        f"(threshold {test.threshold:.0%}): {format_result(result)}"
+    )
+    return result
@@ -0,0 +1,108 @@
+"""Deterministic dataset sharding for evals spread over processes or CI jobs.
+
+Shard ``i`` of ``n`` evaluates the dataset rows whose position modulo ``n`` is
+``i``, so shards are the same size to within a row and every row belongs to
+exactly one of them. A shard writes its graded rows, in dataset order, to a JSONL
+file whose first line is a header naming the shard and the run configuration,
+with the shard's call metrics beside it:
+
+    shards/shard-0.jsonl          {"shard": {"index": 0, "count": 4, "run": {...}}}
+                                  {"index": 0, "input": ..., "decision": "Y", ...}
+    shards/shard-0.metrics.json
+
+``merge_shards`` checks that a full set of shards from one configuration is
+present and streams their rows back in dataset order, so the merged run has the
+same ordering and aggregates as a serial one.
+"""
+
+import heapq
+import json
+import os
+
+from metrics import MetricsCallbackHandler
+
+
+def in_shard(idx, shard_index, shard_count):
+    return idx % shard_count == shard_index
+
+
+def check_shard(shard_index, shard_count):
+    if shard_count < 1 or not 0 <= shard_index < shard_count:
+        raise ValueError(
+            f"Shard index must be between 0 and {shard_count - 1}, not {shard_index}"
+        )
+
+
+def default_shard_path(shard_index, shard_count, directory="shards"):
+    return os.path.join(directory, f"shard-{shard_index}-of-{shard_count}.jsonl")
+
+
+def metrics_path_for(shard_path):
+    return os.path.splitext(shard_path)[0] + ".metrics.json"
+
+
+def write_shard(path, shard_index, shard_count, run, results, metrics=None):
+    """Write a shard's header and graded rows; results must be in dataset order."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    header = {"index": shard_index, "count": shard_count, "run": run}
+    with open(path, "w") as file:
+        file.write(json.dumps({"shard": header}, default=str) + "\n")
+        for result in results:
+            file.write(json.dumps(result, default=str) + "\n")
+    if metrics is not None:
+        metrics.write_json(metrics_path_for(path))
+
+
+def read_shard_header(path):
+    with open(path, "r") as file:
+        first = file.readline()
+    header = json.loads(first).get("shard") if first.strip() else None
+    if header is None:
+        raise ValueError(f"{path} is not a shard file")
+    return header
+
+
+def read_shard_results(path):
+    with open(path, "r") as file:
+        file.readline()
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def merge_shards(paths):
+    """Return the run configuration and every shard's rows in dataset order.
+
+    Raises ValueError unless paths hold each shard of one run exactly once.
+    """
+    headers = [read_shard_header(path) for path in paths]
+    if not headers:
+        raise ValueError("No shards to merge")
+    count = headers[0]["count"]
+    indices = sorted(header["index"] for header in headers)
+    if any(header["count"] != count for header in headers):
+        raise ValueError("Shards were split with different shard counts")
+    if indices != list(range(count)):
+        raise ValueError(f"Expected shards 0-{count - 1} once each, got {indices}")
+    fingerprints = {header["run"].get("config_fingerprint") for header in headers}
+    if len(fingerprints) > 1:
+        raise ValueError("Shards were evaluated with different configurations")
+
+    rows = heapq.merge(
+        *(read_shard_results(path) for path in paths),
+        key=lambda result: result["index"],
+    )
+    return headers[0]["run"], rows
+
+
+def merge_metrics(paths):
+    """Combine the shards' call metrics into one handler, as if from one run."""
+    metrics = MetricsCallbackHandler()
+    for path in paths:
+        metrics_path = metrics_path_for(path)
+        if os.path.exists(metrics_path):
+            with open(metrics_path, "r") as file:
+                metrics.records.extend(json.load(file)["records"])
+    return metrics
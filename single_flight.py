@@ -0,0 +1,171 @@
+"""Coalesce identical assistant and grader requests within a run.
+
+Datasets repeat inputs, and at temperature 0 the same answer is graded against
+the same quiz bank again and again. ``SingleFlight.wrap`` puts a chain behind a
+key on its inputs: while a call for a key is in flight, identical requests wait
+for it instead of making their own, and once it has finished its result is
+reused for the rest of the run. Failures are never reused, so retries still
+reach the API:
+
+    flight = SingleFlight(normalize=True)
+    assistant = flight.wrap(assistant_chain(), "assistant")
+    grader = flight.wrap(create_quiz_bank_grader(), "grader")
+    ...
+    print(flight.stats())  # {"requests": 120, "calls": 71, "coalesced": 9, ...}
+
+With ``normalize=True`` string inputs are compared with whitespace collapsed
+and case folded, so "Quiz me  about Paris" and "quiz me about paris" share a
+call. Unlike the on-disk LLM cache this needs no configuration, works for
+chains that never reach a model (the local pre-router and grounding check),
+and also joins requests that are still in flight.
+"""
+
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+
+from langchain_core.runnables import RunnableLambda
+
+from adaptive import detach_slot, holding_slot, release_slot
+
+DEFAULT_MAX_ENTRIES = 10_000
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    return _WHITESPACE.sub(" ", text).strip().casefold()
+
+
+def _normalized(value):
+    if isinstance(value, str):
+        return normalize_text(value)
+    if isinstance(value, dict):
+        return {key: _normalized(item) for key, item in value.items()}
+    return value
+
+
+class SingleFlight:
+    def __init__(self, normalize=False, remember=True, max_entries=DEFAULT_MAX_ENTRIES):
+        self.normalize = normalize
+        self.remember = remember
+        self.max_entries = max_entries
+        self.requests = 0
+        self.calls = 0
+        self.coalesced = 0
+        self.reused = 0
+        self._results = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def key(self, namespace, inputs):
+        if self.normalize:
+            inputs = _normalized(inputs)
+        payload = json.dumps([namespace, inputs], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _lookup(self, key):
+        """Return ("done", result), ("wait", future) or ("lead", None); call under the lock."""
+        self.requests += 1
+        if key in self._results:
+            self._results.move_to_end(key)
+            self.reused += 1
+            return "done", self._results[key]
+        if key in self._in_flight:
+            self.coalesced += 1
+            return "wait", self._in_flight[key]
+        self.calls += 1
+        return "lead", None
+
+    def _finish(self, key, result=None, failed=False):
+        with self._lock:
+            self._in_flight.pop(key, None)
+            if self.remember and not failed:
+                self._results[key] = result
+                if len(self._results) > self.max_entries:
+                    self._results.popitem(last=False)
+
+    def invoke(self, runnable, namespace, inputs, config=None):
+        key = self.key(namespace, inputs)
+        with self._lock:
+            state, value = self._lookup(key)
+            if state == "lead":
+                future = concurrent.futures.Future()
+                self._in_flight[key] = future
+        if state == "done":
+            return value
+        if state == "wait":
+            if isinstance(value, concurrent.futures.Future):
+                return value.result()
+            # An async call in flight cannot be awaited from sync code; make our own
+            with self._lock:
+                self.coalesced -= 1
+                self.calls += 1
+            return runnable.invoke(inputs, config=config)
+
+        try:
+            result = runnable.invoke(inputs, config=config)
+        except BaseException as error:
+            self._finish(key, failed=True)
+            future.set_exception(error)
+            raise
+        self._finish(key, result)
+        future.set_result(result)
+        return result
+
+    async def ainvoke(self, runnable, namespace, inputs, config=None):
+        key = self.key(namespace, inputs)
+        with self._lock:
+            state, value = self._lookup(key)
+            if state == "lead":
+                # The call runs as its own task so a waiter giving up (e.g. an
+                # attempt timeout) does not cancel it for everyone else; the
+                # task holds the leader's caller slot until the call is done
+                value = asyncio.ensure_future(
+                    self._run(runnable, key, inputs, config, detach_slot())
+                )
+                self._in_flight[key] = value
+        if state == "done":
+            return value
+        if state == "wait":
+            # A waiter makes no request of its own; its caller slot can go to
+            # one that does
+            await release_slot()
+        if isinstance(value, concurrent.futures.Future):
+            return await asyncio.wrap_future(value)
+        return await asyncio.shield(value)
+
+    async def _run(self, runnable, key, inputs, config, slot=None):
+        try:
+            async with holding_slot(slot):
+                result = await runnable.ainvoke(inputs, config=config)
+        except BaseException:
+            self._finish(key, failed=True)
+            raise
+        self._finish(key, result)
+        return result
+
+    def wrap(self, runnable, namespace):
+        """Return a runnable that sends runnable's calls through this single flight."""
+
+        def invoke(inputs, config):
+            return self.invoke(runnable, namespace, inputs, config)
+
+        async def ainvoke(inputs, config):
+            return await self.ainvoke(runnable, namespace, inputs, config)
+
+        return RunnableLambda(invoke, afunc=ainvoke, name=f"SingleFlight[{namespace}]")
+
+    def stats(self):
+        saved = self.coalesced + self.reused
+        return {
+            "requests": self.requests,
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "reused": self.reused,
+            "saved_rate": saved / self.requests if self.requests else 0.0,
+        }
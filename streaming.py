@@ -0,0 +1,151 @@
+"""Streaming assertions that stop reading as soon as the outcome is known.
+
+Tests like "the answer mentions Paris" or "the bot declines" are usually decided
+by the first few tokens. ``stream_until`` / ``astream_until`` stream the chain's
+output and feed the text received so far to a predicate after every chunk. When
+the predicate returns True or False the stream is closed, which closes the HTTP
+response and cancels the rest of the generation:
+
+    answer = assert_stream(
+        get_assistant_chain(),
+        {"question": "Generate a quiz about Rome"},
+        contains_any(["I'm sorry"]),
+    )
+
+A predicate is called as ``predicate(text, done)`` and returns True (pass),
+False (fail) or None (undecided). With ``done=True`` the stream has ended and it
+must decide.
+
+Chat models skip their cache when streaming, so a chain whose model answers
+from the LLM cache or a cassette is invoked instead and decided on the whole
+answer; a replayed run never streams from the API.
+"""
+
+import asyncio
+import time
+from collections import namedtuple
+
+from langchain_core.caches import BaseCache
+from langchain_core.globals import get_llm_cache
+
+StreamResult = namedtuple(
+    "StreamResult", ["passed", "text", "decided_early", "chunks", "elapsed_s"]
+)
+
+
+def contains_any(keywords):
+    """Pass as soon as any keyword appears (case-insensitive); fail at the end otherwise."""
+    keywords = [keyword.lower() for keyword in keywords]
+
+    def predicate(text, done):
+        lowered = text.lower()
+        if any(keyword in lowered for keyword in keywords):
+            return True
+        return False if done else None
+
+    return predicate
+
+
+def starts_with(prefix):
+    """Decide once len(prefix) characters have arrived (case and leading space ignored)."""
+    prefix = prefix.lower()
+
+    def predicate(text, done):
+        head = text.lstrip().lower()
+        if len(head) >= len(prefix) or done:
+            return head.startswith(prefix)
+        return None
+
+    return predicate
+
+
+def all_of(*predicates):
+    """Pass when every predicate passes; fail as soon as one fails."""
+
+    def predicate(text, done):
+        verdicts = [check(text, done) for check in predicates]
+        if False in verdicts:
+            return False
+        if None in verdicts:
+            return None
+        return True
+
+    return predicate
+
+
+def _decide(predicate, text, done):
+    verdict = predicate(text, done)
+    if done and verdict is None:
+        raise ValueError("Predicate must return True or False once the stream ends")
+    return verdict
+
+
+def uses_cache(chain):
+    """Whether a model in the chain answers from a cache or cassette."""
+    # Imported here: langchain_core.language_models is slow to import
+    from langchain_core.language_models import BaseLanguageModel
+
+    for node in chain.get_graph().nodes.values():
+        if not isinstance(node.data, BaseLanguageModel):
+            continue
+        cache = node.data.cache
+        if isinstance(cache, BaseCache):
+            return True
+        # None and True both mean the global LangChain cache
+        if cache is not False and get_llm_cache() is not None:
+            return True
+    return False
+
+
+def stream_until(chain, inputs, predicate, config=None):
+    """Stream chain output until predicate decides, then stop the generation.
+
+    Runs ``astream_until`` on a private event loop: a sync ``stream()`` closed
+    early still reads the rest of the model output, ``astream`` cancels it.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(astream_until(chain, inputs, predicate, config=config))
+    raise RuntimeError(
+        "stream_until cannot run inside an event loop; use astream_until"
+    )
+
+
+async def astream_until(chain, inputs, predicate, config=None):
+    """Stream chain output with ``astream`` until predicate decides."""
+    start = time.perf_counter()
+    if uses_cache(chain):
+        text = await chain.ainvoke(inputs, config=config)
+        verdict = _decide(predicate, text, done=True)
+        return StreamResult(verdict, text, False, 1, time.perf_counter() - start)
+
+    parts = []
+    verdict = None
+    stream = chain.astream(inputs, config=config)
+    try:
+        async for chunk in stream:
+            parts.append(chunk)
+            verdict = _decide(predicate, "".join(parts), done=False)
+            if verdict is not None:
+                break
+    finally:
+        # Closing the stream closes the HTTP response mid-generation
+        await stream.aclose()
+
+    text = "".join(parts)
+    decided_early = verdict is not None
+    if not decided_early:
+        verdict = _decide(predicate, text, done=True)
+    return StreamResult(
+        verdict, text, decided_early, len(parts), time.perf_counter() - start
+    )
+
+
+def assert_stream(chain, inputs, predicate, message=None, config=None):
+    """Assert that predicate passes on the streamed output and return the text read."""
+    result = stream_until(chain, inputs, predicate, config=config)
+    assert result.passed, (
+        message or f"Streamed response failed the check: {result.text}"
+    )
+    return result.text
@@ -0,0 +1,269 @@
+import asyncio
+import json
+import os
+import pytest
+
+from langchain_core.runnables import RunnableLambda
+
+from adaptive import (
+    AdaptiveConcurrency,
+    CallFailed,
+    ResilientCaller,
+    RetryPolicy,
+    is_retryable,
+    is_throttle,
+    retry_after_seconds,
+)
+import app
+from app import assistant_chain, create_llm
+from fake_openai_server import FakeOpenAIServer
+from results_store import ResultsStore
+from save_eval_artifacts import aevaluate_dataset, create_eval_chain, report_evals
+
+
+class StatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = type("Response", (), {"headers": headers or {}})()
+
+
+def fast_retries(**kwargs):
+    kwargs.setdefault("base_delay_s", 0.001)
+    kwargs.setdefault("max_delay_s", 0.01)
+    return RetryPolicy(seed=0, **kwargs)
+
+
+@pytest.mark.parametrize(
+    "error, retryable, throttle",
+    [
+        (StatusError(429), True, True),
+        (StatusError(500), True, True),
+        (StatusError(408), True, False),
+        (StatusError(400), False, False),
+        (asyncio.TimeoutError(), True, True),
+        (ConnectionResetError(), True, False),
+        (ValueError("bad prompt"), False, False),
+    ],
+)
+def test_error_classification(error, retryable, throttle):
+    assert is_retryable(error) is retryable
+    assert is_throttle(error) is throttle
+
+
+def test_retry_after_header_sets_the_minimum_backoff():
+    error = StatusError(429, {"retry-after-ms": "250"})
+    assert retry_after_seconds(error) == 0.25
+    assert fast_retries().backoff(1, error) >= 0.25
+
+
+def test_limit_grows_additively_and_halves_on_throttle():
+    controller = AdaptiveConcurrency(initial_limit=4, max_limit=8, cooldown_s=10)
+    # About one more slot per `limit` successful calls
+    for _ in range(5):
+        controller.on_success(0.1)
+    assert controller.stats()["limit"] == 5
+
+    controller.on_throttle()
+    # A burst of failures from calls already in flight halves the limit once
+    controller.on_throttle()
+    assert controller.stats()["limit"] == 2
+    assert controller.decreases == 1
+
+    for _ in range(100):
+        controller.on_success(0.1)
+    assert controller.stats()["limit"] == 8
+
+
+def test_slow_calls_do_not_raise_the_limit():
+    controller = AdaptiveConcurrency(initial_limit=2, target_latency_s=0.5)
+    controller.on_success(1.0)
+    assert controller.limit == 2
+
+
+def test_calls_never_exceed_the_limit():
+    controller = AdaptiveConcurrency(initial_limit=3, max_limit=3)
+    caller = ResilientCaller(controller, fast_retries())
+    in_flight = 0
+    peak = 0
+
+    async def work():
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+
+    async def run_all():
+        await asyncio.gather(*(caller.call(work) for _ in range(12)))
+
+    asyncio.run(run_all())
+    assert peak == 3
+
+
+def test_transient_errors_are_retried():
+    failures = [StatusError(429), StatusError(503)]
+
+    async def flaky():
+        if failures:
+            raise failures.pop(0)
+        return "ok"
+
+    caller = ResilientCaller(AdaptiveConcurrency(), fast_retries())
+    result, attempts = asyncio.run(caller.call(flaky))
+
+    assert (result, attempts) == ("ok", 3)
+    assert caller.stats()["retries"] == 2
+
+
+def test_permanent_errors_fail_without_retrying():
+    async def bad_request():
+        raise StatusError(400)
+
+    caller = ResilientCaller(retry=fast_retries())
+    with pytest.raises(CallFailed) as failure:
+        asyncio.run(caller.call(bad_request))
+
+    assert failure.value.attempts == 1
+    assert caller.stats()["failures"] == 1
+
+
+def test_programming_errors_are_raised_not_recorded():
+    async def broken():
+        return None.context
+
+    caller = ResilientCaller(retry=fast_retries())
+    with pytest.raises(AttributeError):
+        asyncio.run(caller.call(broken))
+
+    assert caller.stats()["failures"] == 0
+
+
+def test_slow_attempts_time_out_and_retry():
+    calls = 0
+
+    async def hangs_once():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(10)
+        return "ok"
+
+    caller = ResilientCaller(retry=fast_retries(attempt_timeout_s=0.05))
+    assert asyncio.run(caller.call(hangs_once)) == ("ok", 2)
+
+
+def test_deadline_stops_retries():
+    async def always_throttled():
+        raise StatusError(429, {"retry-after": "1"})
+
+    caller = ResilientCaller(retry=fast_retries(max_attempts=10, deadline_s=0.5))
+    with pytest.raises(CallFailed) as failure:
+        asyncio.run(caller.call(always_throttled))
+
+    # The second attempt would only start after the 1s Retry-After
+    assert failure.value.attempts == 1
+
+
+def test_failed_rows_are_recorded_instead_of_raised(setup_logging):
+    logger = setup_logging
+    logger.info("Testing that a row failing every retry does not abort the run")
+
+    async def answer(inputs):
+        if "topic 1" in inputs["question"]:
+            raise StatusError(429)
+        return "answer"
+
+    async def grade(inputs):
+        return "Decision: Y"
+
+    dataset = [{"input": f"Quiz me about topic {idx}"} for idx in range(3)]
+    caller = ResilientCaller(AdaptiveConcurrency(), fast_retries(max_attempts=3))
+    results = asyncio.run(
+        aevaluate_dataset(
+            dataset,
+            "bank",
+            RunnableLambda(answer),
+            RunnableLambda(grade),
+            caller=caller,
+        )
+    )
+    logger.info(f"Results: {results}")
+
+    assert [result["status"] for result in results] == ["ok", "failed", "ok"]
+    assert results[1]["attempts"] == 3
+    assert "429" in results[1]["error"]
+    assert results[1]["grader_response"] is None
+    assert results[0]["attempts"] == 2
+
+
+def test_eval_survives_a_throttling_api(setup_logging):
+    logger = setup_logging
+    logger.info("Testing an eval run against an API that throttles half the calls")
+
+    with FakeOpenAIServer(error_rate=0.5, error_status=429, retry_after=0.01) as server:
+        # Let the caller do all the retrying so the test sees every 429
+        llm = create_llm(base_url=server.base_url, openai_api_key="fake", max_retries=0)
+        controller = AdaptiveConcurrency(initial_limit=8, max_limit=8, cooldown_s=0)
+        caller = ResilientCaller(controller, fast_retries(max_attempts=10))
+        results = asyncio.run(
+            aevaluate_dataset(
+                [{"input": f"Quiz me about topic {idx}"} for idx in range(8)],
+                "bank",
+                assistant_chain(llm=llm),
+                create_eval_chain(llm=llm),
+                caller=caller,
+            )
+        )
+        stats = server.stats()
+    logger.info(f"Server stats: {stats}, caller stats: {caller.stats()}")
+
+    assert all(result["status"] == "ok" for result in results)
+    assert stats["errors"] > 0
+    assert caller.stats()["retries"] == stats["errors"]
+    assert controller.decreases > 0
+
+
+def test_report_evals_leaves_retries_to_the_caller(
+    tmp_path, monkeypatch, setup_logging
+):
+    logger = setup_logging
+    logger.info("Testing that every HTTP attempt is one of the caller's attempts")
+    monkeypatch.setattr(app, "QUIZ_BANK_PATH", os.path.abspath(app.QUIZ_BANK_PATH))
+    monkeypatch.chdir(tmp_path)
+    for name in ("EVAL_LLM_CACHE", "EVAL_CASSETTE", "EVAL_RATE_LIMIT_RPM"):
+        monkeypatch.delenv(name, raising=False)
+    dataset = tmp_path / "dataset.jsonl"
+    dataset.write_text(
+        "".join(
+            json.dumps({"input": f"Quiz me about topic {idx}"}) + "\n"
+            for idx in range(4)
+        )
+    )
+    store_path = str(tmp_path / "results.sqlite")
+
+    with FakeOpenAIServer(error_rate=0.4, error_status=429, retry_after=0.01) as server:
+        monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+        monkeypatch.setenv("OPENAI_API_KEY", "fake")
+        report_evals(
+            dataset_path=str(dataset),
+            results_store_path=store_path,
+            dedupe=False,
+            max_retries=8,
+        )
+        stats = server.stats()
+
+    store = ResultsStore(store_path)
+    attempts = sum(
+        row["attempts"] for row in store.run_results(store.runs()[0]["run_id"])
+    )
+    store.close()
+    logger.info(f"Server stats: {stats}, recorded attempts: {attempts}")
+    assert stats["errors"] > 0
+    # With SDK retries some requests would never reach the caller
+    assert attempts == stats["requests"]
+
+
+# Run all tests if script is executed directly
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
@@ -1,4 +1,5 @@
-from app import assistant_chain
+from app import get_assistant_chain
+from streaming import assert_stream, contains_any, stream_until
 import os
 import sys
 import pytest
@@ -12,61 +13,65 @@ def test_science_quiz(setup_logging, langchain_tracer):
     logger = setup_logging
     logger.info("Testing science quiz generation")
 
-    assistant = assistant_chain()
+    assistant = get_assistant_chain()
     question = "Generate a quiz about science."
     logger.info(f"Sending request: {question}")
 
-    answer = assistant.invoke(
-        {"question": question}, config={"callbacks": [langchain_tracer]}
-    )
-    logger.info(f"Response received: {answer}")
-
     expected_subjects = ["davinci", "telescope", "physics", "curie"]
     logger.info(f"Checking for expected subjects: {expected_subjects}")
 
-    assert any(
-        subject.lower() in answer.lower() for subject in expected_subjects
-    ), f"Expected the assistant questions to include '{expected_subjects}', but it did not"
+    # Stops reading as soon as one of the subjects shows up
+    answer = assert_stream(
+        assistant,
+        {"question": question},
+        contains_any(expected_subjects),
+        f"Expected the assistant questions to include '{expected_subjects}', but it did not",
+        config={"callbacks": [langchain_tracer]},
+    )
+    logger.info(f"Response received: {answer}")
 
 
 def test_geography_quiz(setup_logging, langchain_tracer):
     logger = setup_logging
     logger.info("Testing geography quiz generation")
 
-    assistant = assistant_chain()
+    assistant = get_assistant_chain()
     question = "Generate a quiz about geography."
     logger.info(f"Sending request: {question}")
 
-    answer = assistant.invoke(
-        {"question": question}, config={"callbacks": [langchain_tracer]}
-    )
-    logger.info(f"Response received: {answer}")
-
     expected_subjects = ["paris", "france", "louvre"]
     logger.info(f"Checking for expected subjects: {expected_subjects}")
 
-    assert any(
-        subject.lower() in answer.lower() for subject in expected_subjects
-    ), f"Expected the assistant questions to include '{expected_subjects}', but it did not"
+    answer = assert_stream(
+        assistant,
+        {"question": question},
+        contains_any(expected_subjects),
+        f"Expected the assistant questions to include '{expected_subjects}', but it did not",
+        config={"callbacks": [langchain_tracer]},
+    )
+    logger.info(f"Response received: {answer}")
 
 
 def test_decline_unknown_subjects(setup_logging, langchain_tracer):
     logger = setup_logging
     logger.info("Testing decline for unknown subjects")
 
-    assistant = assistant_chain()
+    assistant = get_assistant_chain()
     question = "Generate a quiz about Rome"
     logger.info(f"Sending request: {question}")
 
-    answer = assistant.invoke(
-        {"question": question}, config={"callbacks": [langchain_tracer]}
-    )
-    logger.info(f"Response received: {answer}")
-
     # We'll look for a substring of the message the bot prints when it gets a question about any
     decline_response = "I'm sorry"
     logger.info(f"Checking for decline response: '{decline_response}'")
 
+    answer = stream_until(
+        assistant,
+        {"question": question},
+        contains_any([decline_response]),
+        config={"callbacks": [langchain_tracer]},
+    ).text
+    logger.info(f"Response received: {answer}")
+
     assert (
         decline_response.lower() in answer.lower()
     ), f"Expected the bot to decline with '{decline_response}' got {answer}"
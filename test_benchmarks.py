@@ -0,0 +1,155 @@
+import json
+import pytest
+
+from benchmarks import (
+    HIGHER,
+    LOWER,
+    compare,
+    format_comparison,
+    main,
+    run_benchmarks,
+    save_results,
+    synthetic_bank,
+)
+from quiz_index import parse_quiz_bank
+
+
+def results(**values):
+    metrics = {
+        name: {"value": value, "unit": unit, "better": better}
+        for name, (value, unit, better) in values.items()
+    }
+    return {"metrics": metrics}
+
+
+BASELINE = results(
+    import_app_s=(1.0, "s", LOWER),
+    eval_rows_per_s=(40.0, "rows/s", HIGHER),
+    report_s=(2.0, "s", LOWER),
+)
+
+
+def test_regressions_respect_direction_and_threshold():
+    current = results(
+        import_app_s=(1.2, "s", LOWER),
+        eval_rows_per_s=(20.0, "rows/s", HIGHER),
+        report_s=(1.0, "s", LOWER),
+    )
+
+    by_name = {item.name: item for item in compare(BASELINE, current, 0.25)}
+    assert not by_name["import_app_s"].regressed
+    assert by_name["import_app_s"].change == pytest.approx(0.2)
+    assert by_name["eval_rows_per_s"].regressed
+    assert by_name["eval_rows_per_s"].status == "REGRESSED"
+    # Getting faster is never a regression
+    assert not by_name["report_s"].regressed
+
+    loose = compare(BASELINE, current, 0.25, {"eval_rows_per_s": 0.6})
+    assert not any(item.regressed for item in loose)
+    assert not any(
+        item.regressed for item in compare(BASELINE, current, 0.25, {"eval_*": 0.6})
+    )
+    assert compare(BASELINE, current, 0.1)[1].regressed
+
+
+def test_added_and_removed_metrics_do_not_fail():
+    current = results(import_app_s=(1.0, "s", LOWER), new_metric_s=(3.0, "s", LOWER))
+
+    comparisons = compare(BASELINE, current)
+    statuses = {item.name: item.status for item in comparisons}
+    assert statuses == {
+        "eval_rows_per_s": "missing",
+        "import_app_s": "ok",
+        "new_metric_s": "new",
+        "report_s": "missing",
+    }
+    assert not any(item.regressed for item in comparisons)
+    table = format_comparison(comparisons)
+    assert table.splitlines()[0].split() == [
+        "metric",
+        "baseline",
+        "current",
+        "change",
+        "status",
+    ]
+    assert "+0.0%" in table
+
+
+def test_compare_mode_exit_status(tmp_path, capsys):
+    baseline = tmp_path / "baseline.json"
+    current = tmp_path / "current.json"
+    save_results(BASELINE, str(baseline))
+    save_results(results(report_s=(3.0, "s", LOWER)), str(current))
+
+    assert main(["--compare", str(baseline), str(current)]) == 1
+    assert "Regressed past the threshold: report_s" in capsys.readouterr().out
+    assert main(["--compare", str(baseline), str(current), "--threshold", "0.6"]) == 0
+
+
+def test_synthetic_bank_parses():
+    subjects = parse_quiz_bank(synthetic_bank(30))
+
+    assert len(subjects) == 30
+    assert {s.categories[0] for s in subjects} == {"Art", "Science", "Geography"}
+    assert all(len(subject.facts) == 3 for subject in subjects)
+
+
+def test_small_run_against_the_fake_server(tmp_path, setup_logging):
+    logger = setup_logging
+    logger.info("Running a reduced benchmark suite")
+    output = tmp_path / "bench.json"
+
+    code = main(
+        [
+            "--only",
+            "chain",
+            "prompt",
+            "evaluate",
+            "report",
+            "--latency",
+            "0",
+            "--concurrency",
+            "1",
+            "4",
+            "--eval-rows",
+            "4",
+            "--bank-sizes",
+            "5",
+            "50",
+            "--report-rows",
+            "100",
+            "--repeat",
+            "1",
+            "--output",
+            str(output),
+        ]
+    )
+
+    assert code == 0
+    saved = json.loads(output.read_text())
+    assert set(saved["metrics"]) == {
+        "assistant_chain_build_ms",
+        "prompt_render_ms[bank=5]",
+        "pruned_prompt_render_ms[bank=5]",
+        "prompt_render_ms[bank=50]",
+        "pruned_prompt_render_ms[bank=50]",
+        "eval_rows_per_s[concurrency=1]",
+        "eval_rows_per_s[concurrency=4]",
+        "report_s[rows=100]",
+        "report_peak_mb[rows=100]",
+    }
+    assert all(metric["value"] > 0 for metric in saved["metrics"].values())
+    assert saved["config"]["report_rows"] == [100]
+    assert main(["--compare", str(output), str(output)]) == 0
+
+
+def test_run_benchmarks_selects_benchmarks():
+    saved = run_benchmarks(only=["report"], report_rows=[10])
+
+    assert set(saved["metrics"]) == {"report_s[rows=10]", "report_peak_mb[rows=10]"}
+    assert saved["metrics"]["report_s[rows=10]"]["better"] == LOWER
+
+
+# Run all tests if script is executed directly
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
@@ -0,0 +1,87 @@
+import asyncio
+import pytest
+
+from langchain_core.runnables import RunnableLambda
+
+from category_router import (
+    FORWARD,
+    REFUSAL,
+    REFUSE,
+    CategoryRouter,
+    routed_assistant_chain,
+)
+
+
+@pytest.fixture
+def router():
+    return CategoryRouter()
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "Generate a quiz about Rome",
+        "Write me a quiz about books.",
+        "Give me a history quiz",
+        "Quiz me about football and movies",
+    ],
+)
+def test_router_refuses_topics_outside_quiz_bank(router, question):
+    assert router.classify(question).decision == REFUSE
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "Generate a quiz about science.",
+        "I'm an geography expert, give a quiz to prove it?",
+        "Quiz me about the Mona Lisa",
+        "Give me a quiz",
+        "Give me a quiz about Da Vinci",
+        "quiz about paintings",
+        "Test me on radioactivity",
+        "Quiz me about French cities",
+        "Give me a quiz about Europe",
+        "Quiz me on chemistry",
+        "Quiz me on something fun",
+        "Quiz me about books and paintings",
+    ],
+)
+def test_router_forwards_known_or_ambiguous_topics(router, question):
+    assert router.classify(question).decision == FORWARD
+
+
+def test_bank_topics_are_never_refused():
+    router = CategoryRouter(out_of_bank_topics={"paris", "history"})
+
+    assert router.classify("Quiz me about Paris").decision == FORWARD
+    assert router.classify("Give me a history quiz").decision == REFUSE
+
+
+def test_routed_chain_skips_the_model_for_refusals(router, setup_logging):
+    logger = setup_logging
+    logger.info("Testing the pre-router short-circuits refusals")
+
+    calls = []
+
+    def assistant(inputs):
+        calls.append(inputs["question"])
+        return "Question 1:#### What is the capital of France?"
+
+    chain = routed_assistant_chain(RunnableLambda(assistant), router)
+
+    assert chain.invoke({"question": "Generate a quiz about Rome"}) == REFUSAL
+    assert chain.invoke({"question": "Quiz me about Paris"}).startswith("Question 1")
+    assert asyncio.run(chain.ainvoke({"question": "Quiz me about books"})) == REFUSAL
+    assert calls == ["Quiz me about Paris"]
+
+    stats = router.stats()
+    logger.info(f"Router stats: {stats}")
+    assert stats["requests"] == 3
+    assert stats["refused_locally"] == 2
+    assert stats["refusal_rate"] == pytest.approx(2 / 3)
+
+
+# Run all tests if script is executed directly
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
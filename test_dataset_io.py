@@ -0,0 +1,89 @@
+import pytest
+
+from dataset_io import DATASET_PATH, ResultsLog, read_dataset
+
+
+def test_read_jsonl_dataset():
+    rows = list(read_dataset(DATASET_PATH))
+    assert len(rows) == 3
+    assert rows[0]["response"] == "science"
+    assert rows[1]["subjects"] == ["paris", "france", "louvre"]
+
+
+def test_read_csv_dataset(tmp_path):
+    path = tmp_path / "dataset.csv"
+    path.write_text(
+        "input,response,subjects\n"
+        "Quiz me about Paris,geography,paris;france\n"
+        "Quiz me about books,,\n"
+    )
+    rows = list(read_dataset(str(path)))
+
+    assert rows[0]["subjects"] == ["paris", "france"]
+    assert rows[1]["input"] == "Quiz me about books"
+    assert rows[1]["subjects"] is None
+
+
+def test_read_dataset_is_lazy(tmp_path):
+    path = tmp_path / "dataset.jsonl"
+    path.write_text('{"input": "first"}\nnot json\n')
+    rows = read_dataset(str(path))
+
+    assert next(rows)["input"] == "first"
+
+
+def test_read_dataset_rejects_unknown_format():
+    with pytest.raises(ValueError):
+        read_dataset("dataset.xlsx")
+
+
+def test_results_log_skips_torn_lines(tmp_path):
+    path = tmp_path / "results.jsonl"
+    log = ResultsLog(str(path))
+    log.append({"index": 0, "input": "a", "output": "x", "grader_response": "Y"})
+    with open(path, "a") as file:
+        file.write('{"index": 1, "inp')
+
+    log = ResultsLog(str(path))
+    assert log.completed() == {0: "a"}
+    log.append({"index": 1, "input": "b", "output": "x", "grader_response": "Y"})
+    assert [result["input"] for result in log.read()] == ["a", "b"]
+
+
+def test_results_log_iterates_in_index_order(tmp_path):
+    log = ResultsLog(str(tmp_path / "results.jsonl"))
+    log.append({"index": 2, "input": "Quiz über Kunst", "status": "failed"})
+    log.append({"index": 0, "input": "a"})
+    log.append({"index": 2, "input": "Quiz über Kunst", "status": "ok"})
+    log.append({"index": 1, "input": "b"})
+
+    results = log.iter_results()
+    assert not isinstance(results, list)
+    assert [(r["index"], r.get("status")) for r in results] == [
+        (0, None),
+        (1, None),
+        (2, "ok"),
+    ]
+
+
+def test_results_log_reruns_changed_rows(tmp_path):
+    log = ResultsLog(str(tmp_path / "results.jsonl"))
+    log.append({"index": 0, "input": "a", "output": "x", "grader_response": "Y"})
+    completed = log.completed()
+
+    assert log.is_done(completed, 0, {"input": "a"})
+    assert not log.is_done(completed, 0, {"input": "changed"})
+    assert not log.is_done(completed, 1, {"input": "a"})
+
+
+def test_results_log_reruns_failed_rows(tmp_path):
+    log = ResultsLog(str(tmp_path / "results.jsonl"))
+    log.append({"index": 0, "input": "a", "output": None, "status": "failed"})
+    log.append({"index": 1, "input": "b", "output": "x", "grader_response": "Y"})
+
+    assert log.completed() == {1: "b"}
+
+
+# Run all tests if script is executed directly
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
@@ -0,0 +1,191 @@
+import asyncio
+import functools
+import os
+import pytest
+
+from app import QUIZ_BANK_PATH, create_llm
+from eval_matrix import (
+    Cell,
+    arun_matrix,
+    cost_usd,
+    expand_grid,
+    format_table,
+    main,
+    resolve_cell,
+)
+from fake_openai_server import FakeOpenAIServer
+from results_store import ResultsStore
+from single_flight import SingleFlight
+
+DATASET = [{"input": f"Quiz me about Paris {idx}"} for idx in range(3)]
+
+
+@pytest.fixture
+def server():
+    with FakeOpenAIServer(latency=0.01) as server:
+        yield server
+
+
+def fake_factory(server):
+    return functools.partial(
+        create_llm, base_url=server.base_url, openai_api_key="fake"
+    )
+
+
+def test_expand_grid():
+    cells = expand_grid(["a", "b"], [0.0, 0.7], ["default"], ["default", "v2.txt"])
+
+    assert len(cells) == 8
+    assert cells[0] == Cell("a", 0.0, "default", "default")
+
+
+def test_prompt_variant_gets_the_quiz_bank(tmp_path):
+    template = tmp_path / "concise.txt"
+    template.write_text("Write a short quiz from:\n{quiz_bank}")
+
+    system_message, quiz_bank = resolve_cell(
+        Cell("a", 0.0, str(template), QUIZ_BANK_PATH)
+    )
+    assert system_message.startswith("Write a short quiz from:\n1. Subject:")
+    assert quiz_bank in system_message
+
+
+def test_cost_uses_the_price_table():
+    assert cost_usd("gpt-4o-mini", 1_000_000, 1_000_000) == pytest.approx(0.75)
+    assert cost_usd("unknown-model", 10, 10) is None
+
+
+def test_matrix_compares_cells_and_dedupes(server, tmp_path, setup_logging):
+    logger = setup_logging
+    logger.info("Testing a 2x2 matrix with a duplicated quiz bank")
+
+    # Same contents as the default bank, so those cells are not evaluated twice
+    copy = tmp_path / "quiz_bank_copy.txt"
+    copy.write_text(open(QUIZ_BANK_PATH).read())
+    cells = expand_grid(
+        ["gpt-3.5-turbo", "gpt-4o-mini"],
+        [0.0, 0.7],
+        ["default"],
+        ["default", str(copy)],
+    )
+    store = ResultsStore(str(tmp_path / "results.sqlite"))
+
+    table = asyncio.run(
+        arun_matrix(
+            cells,
+            DATASET,
+            max_concurrency=4,
+            llm_factory=fake_factory(server),
+            store=store,
+        )
+    )
+    logger.info(f"Comparison table:\n{format_table(table)}")
+
+    assert len(table) == 4
+    assert {(row["model"], row["temperature"]) for row in table} == {
+        ("gpt-3.5-turbo", 0.0),
+        ("gpt-3.5-turbo", 0.7),
+        ("gpt-4o-mini", 0.0),
+        ("gpt-4o-mini", 0.7),
+    }
+    # 4 cells x 3 rows, each answered and graded once
+    assert server.stats()["requests"] == 24
+    assert server.stats()["peak_in_flight"] <= 4
+    for row in table:
+        assert row["rows"] == 3 and row["graded"] == 3
+        assert row["pass_rate"] == 1.0
+        assert row["tokens"] > 0 and row["cost_usd"] > 0
+
+    assert len(store.runs()) == 4
+    assert all('"matrix"' in run["metadata"] for run in store.runs())
+    store.close()
+
+
+def test_cells_with_the_same_answer_share_a_grader_call(server):
+    flight = SingleFlight()
+    table = asyncio.run(
+        arun_matrix(
+            expand_grid(["gpt-3.5-turbo", "gpt-4o-mini"], [0.0, 0.7]),
+            DATASET,
+            llm_factory=fake_factory(server),
+            flight=flight,
+        )
+    )
+
+    assert all(row["graded"] == 3 for row in table)
+    # The stand-in returns the same quiz for every request, so 12 answers and
+    # a single grading call
+    assert server.stats()["requests"] == 13
+    assert flight.stats()["coalesced"] + flight.stats()["reused"] == 11
+    # Every cell received the one grade, so each pays a quarter of it
+    shares = [row["grader_tokens"] for row in table]
+    assert len(set(shares)) == 1 and shares[0] > 0
+
+
+def test_repeated_inputs_are_only_shared_at_temperature_zero(server):
+    flight = SingleFlight()
+    table = asyncio.run(
+        arun_matrix(
+            expand_grid(["gpt-3.5-turbo"], [0.0, 0.7]),
+            [{"input": "Quiz me about Paris"}] * 3,
+            llm_factory=fake_factory(server),
+            flight=flight,
+        )
+    )
+
+    assert all(row["graded"] == 3 for row in table)
+    # One answer at temperature 0, three samples at 0.7, and one shared grade
+    assert server.stats()["requests"] == 1 + 3 + 1
+
+
+def test_format_table_aligns_columns():
+    row = {
+        "model": "gpt-4o-mini",
+        "temperature": 0.0,
+        "prompt": "default",
+        "quiz_bank": "default",
+        "pass_rate": 0.5,
+        "failed": 0,
+        "latency_p50_s": 1.234,
+        "latency_p95_s": None,
+        "tokens": 120,
+        "cost_usd": 0.0001,
+    }
+    header, line = format_table([row]).splitlines()
+
+    assert header.startswith("model")
+    assert "50.0%" in line and "1.23" in line and " - " in line
+    assert header.index("pass_rate") == line.index("50.0%")
+
+
+def test_cli_writes_the_comparison_table(server, tmp_path, monkeypatch, capsys):
+    dataset = tmp_path / "dataset.jsonl"
+    dataset.write_text('{"input": "Quiz me about Paris"}\n')
+    quiz_bank = os.path.abspath(QUIZ_BANK_PATH)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+    monkeypatch.setenv("OPENAI_API_KEY", "fake")
+
+    main(
+        [
+            "--models",
+            "gpt-3.5-turbo",
+            "gpt-4o-mini",
+            "--quiz-banks",
+            quiz_bank,
+            "--dataset",
+            str(dataset),
+            "--results-store",
+            str(tmp_path / "results.sqlite"),
+            "--no-cache",
+        ]
+    )
+
+    output = capsys.readouterr().out
+    assert "gpt-4o-mini" in output and "gpt-3.5-turbo" in output
+    assert list((tmp_path / "reports").glob("eval_matrix_*.json"))
+
+
+# Run all tests if script is executed directly
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
@@ -0,0 +1,198 @@
+import asyncio
+import pytest
+
+from adaptive import AdaptiveConcurrency, ResilientCaller
+from fake_openai_server import FakeOpenAIServer
+from graders import (
+    PackedGrader,
+    agrade_batch,
+    create_format_grader,
+    create_hallucination_grader,
+    create_quiz_bank_grader,
+    get_format_grader,
+    grade_batch,
+    parse_packed_verdicts,
+)
+from results_store import parse_decision
+from quiz_index import load_quiz_bank_index
+
+
+def echo_responder(messages):
+    # Answer with the rendered human message so tests can see what the grader sent
+    return next(m["content"] for m in messages if m["role"] == "user")
+
+
+def test_format_grader_fills_response_at_invoke_time(setup_logging, fake_llm):
+    logger = setup_logging
+    logger.info("Testing that one format grader renders each response")
+
+    with FakeOpenAIServer(responder=echo_responder) as server:
+        grader = create_format_grader(llm=fake_llm(server))
+        first = grader.invoke({"agent_response": "Question 1:#### First?"})
+        second = grader.invoke({"agent_response": "Not a quiz"})
+
+    assert "[Response]: Question 1:#### First?" in first
+    assert "[Response]: Not a quiz" in second
+
+
+def test_hallucination_grader_renders_context_and_quiz(fake_llm):
+    with FakeOpenAIServer(responder=echo_responder) as server:
+        grader = create_hallucination_grader(llm=fake_llm(server))
+        rendered = grader.invoke(
+            {"context": "Paris facts {braces}", "agent_response": "Quiz"}
+        )
+
+    # Braces in the quiz bank are data, not template variables
+    assert "[Question Bank]: Paris facts {braces}" in rendered
+    assert "[Quiz]: Quiz" in rendered
+
+
+def test_quiz_bank_grader_prunes_context_with_index(fake_llm):
+    index = load_quiz_bank_index("quiz_bank.txt")
+    quiz = "Question 1:#### What is the capital of France?"
+    with FakeOpenAIServer(responder=echo_responder) as server:
+        grader = create_quiz_bank_grader(llm=fake_llm(server), quiz_bank_index=index)
+        rendered = grader.invoke({"context": "unused", "agent_response": quiz})
+
+    assert "Subject: Paris" in rendered
+    assert "Subject: Telescopes" not in rendered
+
+
+def test_grade_batch_bounds_concurrency(setup_logging, fake_llm):
+    logger = setup_logging
+    logger.info("Testing batched grading against the local OpenAI stand-in")
+
+    inputs = [{"agent_response": f"Question 1:#### Q{idx}?"} for idx in range(12)]
+    with FakeOpenAIServer(latency=0.05) as server:
+        grader = create_format_grader(llm=fake_llm(server))
+        verdicts = grade_batch(grader, inputs, max_concurrency=3)
+        stats = server.stats()
+
+    assert verdicts == ["Y"] * 12
+    assert stats["requests"] == 12
+    assert stats["peak_in_flight"] <= 3
+
+
+def test_agrade_batch_returns_results_in_input_order(fake_llm):
+    inputs = [{"agent_response": f"response {idx}"} for idx in range(6)]
+    with FakeOpenAIServer(responder=echo_responder, jitter=0.02) as server:
+        grader = create_format_grader(llm=fake_llm(server))
+        rendered = asyncio.run(agrade_batch(grader, inputs, max_concurrency=4))
+
+    for idx, text in enumerate(rendered):
+        assert f"[Response]: response {idx}\n" in text
+
+
+def test_cached_grader_is_built_once():
+    assert get_format_grader() is get_format_grader()
+
+
+def test_parse_packed_verdicts():
+    text = (
+        "Quiz 1: Decision: Y | Explanation: Paris facts\n"
+        "**Quiz 3:** Decision: <N> | Explanation: Mentions Rome\n"
+        "Quiz 9: Decision: Y | Explanation: Out of range"
+    )
+    verdicts = parse_packed_verdicts(text, 3)
+
+    assert sorted(verdicts) == [1, 3]
+    assert verdicts[1].decision == "Y"
+    assert verdicts[3] == ("N", "Mentions Rome")
+
+
+def test_packed_grader_sends_bank_once_per_pack(setup_logging, fake_llm):
+    logger = setup_logging
+    logger.info("Testing packed grading against the local OpenAI stand-in")
+
+    responses = [f"Question 1:#### Q{idx}?" for idx in range(10)]
+    with FakeOpenAIServer() as server:
+        packed = PackedGrader(fake_llm(server), pack_size=4)
+        results = packed.grade("bank", responses)
+        requests = server.stats()["requests"]
+
+    assert requests == 3
+    assert [parse_decision(result) for result in results] == ["Y"] * 10
+    assert packed.stats()["fallback_items"] == 0
+
+
+def test_packed_grader_falls_back_to_per_item_grading(fake_llm):
+    def partial_responder(messages):
+        user = next(m["content"] for m in messages if m["role"] == "user")
+        if "[Quiz 1]" in user:
+            # Verdict for the first quiz only; the second is unparseable
+            return "Quiz 1: Decision: N | Explanation: Made up\nQuiz 2: maybe"
+        return "Decision: Y\nExplanation: Per-item grade"
+
+    with FakeOpenAIServer(responder=partial_responder) as server:
+        packed = PackedGrader(fake_llm(server), pack_size=2)
+        results = packed.grade("bank", ["first quiz", "second quiz"])
+        requests = server.stats()["requests"]
+
+    assert results == [
+        "Decision: N\nExplanation: Made up",
+        "Decision: Y\nExplanation: Per-item grade",
+    ]
+    assert requests == 2
+    assert packed.stats()["fallback_items"] == 1
+
+
+def test_packed_runnable_collects_concurrent_calls(fake_llm):
+    async def grade_all(runnable, responses):
+        return await asyncio.gather(
+            *(
+                runnable.ainvoke({"context": "bank", "agent_response": response})
+                for response in responses
+            )
+        )
+
+    with FakeOpenAIServer(responder=echo_responder) as server:
+        packed = PackedGrader(fake_llm(server), pack_size=4, max_wait=0.01)
+        responses = [f"quiz {idx}" for idx in range(6)]
+        results = asyncio.run(grade_all(packed.as_runnable(), responses))
+        requests = server.stats()["requests"]
+
+    # One full pack, one pack flushed by the timer; echoes are unparseable so
+    # every item falls back and gets its own echoed prompt back
+    assert packed.stats()["packed_requests"] == 2
+    assert requests == 2 + 6
+    for idx, result in enumerate(results):
+        assert f"[Quiz]: quiz {idx}\n" in result
+
+
+def test_packs_are_not_capped_by_the_adaptive_limit(setup_logging, fake_llm):
+    logger = setup_logging
+    logger.info("Testing packed grading under a ResilientCaller")
+
+    controller = AdaptiveConcurrency(initial_limit=4, max_limit=4)
+    caller = ResilientCaller(controller)
+
+    async def grade_all(runnable, responses):
+        async def grade(response):
+            result, _ = await caller.call(
+                lambda: runnable.ainvoke(
+                    {"context": "bank", "agent_response": response}
+                )
+            )
+            return result
+
+        return await asyncio.gather(*(grade(response) for response in responses))
+
+    with FakeOpenAIServer(latency=0.01) as server:
+        packed = PackedGrader(
+            fake_llm(server), pack_size=8, max_wait=1.0, concurrency=controller
+        )
+        responses = [f"Question 1:#### Q{idx}?" for idx in range(16)]
+        results = asyncio.run(grade_all(packed.as_runnable(), responses))
+        stats = server.stats()
+
+    logger.info(f"Packed grader stats: {packed.stats()}")
+    # Waiting items hand back their slots, so packs fill past the limit of 4
+    assert packed.stats()["items_per_request"] == 8
+    assert [parse_decision(result) for result in results] == ["Y"] * 16
+    assert stats["peak_in_flight"] <= 4
+    assert controller.in_flight == 0
+
+
+# Run all tests if script is executed directly
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
@@ -0,0 +1,101 @@
+import asyncio
+import pytest
+
+from langchain_core.runnables import RunnableLambda
+
+from grounding import (
+    ESCALATE,
+    FAIL,
+    PASS,
+    CascadingGrader,
+    GroundingScorer,
+    index_for_context,
+)
+
+GROUNDED_QUIZ = (
+    "Question 1:#### What is the capital of France?\n\n"
+    "Question 2:#### Which museum in Paris displays the Mona Lisa?\n\n"
+    "Question 3:#### Where were the first refracting telescopes invented?"
+)
+
+UNGROUNDED_QUIZ = (
+    "Question 1:#### Who wrote Pride and Prejudice?\n\n"
+    "Question 2:#### In what year was Moby Dick published?"
+)
+
+
+@pytest.fixture
+def quiz_bank():
+    with open("quiz_bank.txt", "r") as file:
+        return file.read()
+
+
+def test_scorer_passes_grounded_quiz(quiz_bank):
+    result = GroundingScorer().score(GROUNDED_QUIZ, index_for_context(quiz_bank))
+    assert result.decision == PASS
+    assert result.confidence >= 0.75
+
+
+def test_scorer_tolerates_misspellings(quiz_bank):
+    quiz = "Question 1:#### Which telescope uses a gold-beryllium mirror?"
+    result = GroundingScorer().score(quiz, index_for_context(quiz_bank))
+    assert result.decision == PASS
+
+
+def test_scorer_escalates_a_made_up_fact(quiz_bank):
+    quiz = (
+        "Question 1:#### What is the capital of France?\n\n"
+        "Question 2:#### Which metal was the Mona Lisa painted on?"
+    )
+    result = GroundingScorer().score(quiz, index_for_context(quiz_bank))
+    assert result.decision == ESCALATE
+
+
+def test_scorer_fails_ungrounded_quiz(quiz_bank):
+    result = GroundingScorer().score(UNGROUNDED_QUIZ, index_for_context(quiz_bank))
+    assert result.decision == FAIL
+    assert result.confidence >= 0.75
+
+
+def test_scorer_escalates_refusals(quiz_bank):
+    refusal = "I'm sorry I do not have information about that"
+    result = GroundingScorer().score(refusal, index_for_context(quiz_bank))
+    assert result.decision == ESCALATE
+
+
+def test_cascading_grader_escalates_only_uncertain_quizzes(quiz_bank, setup_logging):
+    logger = setup_logging
+    logger.info("Testing the cascading grader")
+
+    escalated = []
+
+    def llm_grader(inputs):
+        escalated.append(inputs["agent_response"])
+        return "Decision: Y"
+
+    grader = CascadingGrader(RunnableLambda(llm_grader))
+    chain = grader.as_runnable()
+
+    passed = chain.invoke({"context": quiz_bank, "agent_response": GROUNDED_QUIZ})
+    failed = asyncio.run(
+        chain.ainvoke({"context": quiz_bank, "agent_response": UNGROUNDED_QUIZ})
+    )
+    uncertain = chain.invoke(
+        {"context": quiz_bank, "agent_response": "Question 1:#### Capital of Italy?"}
+    )
+    logger.info(f"Local pass: {passed}")
+
+    assert passed.startswith("Decision: Y")
+    assert failed.startswith("Decision: N")
+    assert uncertain == "Decision: Y"
+    assert escalated == ["Question 1:#### Capital of Italy?"]
+
+    stats = grader.stats()
+    logger.info(f"Grader stats: {stats}")
+    assert stats["escalated"] == 1
+    assert stats["escalation_rate"] == pytest.approx(1 / 3)
+
+
+# Run all tests if script is executed directly
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
@@ -0,0 +1,106 @@
+import random
+import pytest
+
+from dataset_io import DATASET_PATH, read_dataset
+from keyword_scorer import KeywordMatcher, KeywordScorer
+from results_store import ResultsStore
+
+
+def test_overlapping_keywords_are_all_found():
+    matcher = KeywordMatcher(["he", "she", "his", "hers", "Paris", "aris", "par"])
+
+    assert matcher.find("Ushers visit PARIS") == {
+        "he",
+        "she",
+        "hers",
+        "paris",
+        "aris",
+        "par",
+    }
+    assert matcher.find("nothing to see") == set()
+    assert matcher.find("") == set()
+
+
+def test_matches_substring_search():
+    rng = random.Random(0)
+    for _ in range(500):
+        keywords = [
+            "".join(rng.choice("abC") for _ in range(rng.randint(1, 5)))
+            for _ in range(8)
+        ]
+        text = "".join(rng.choice("aBcd") for _ in range(60))
+        expected = {k.lower() for k in keywords if k.lower() in text.lower()}
+        assert KeywordMatcher(keywords).find(text) == expected
+
+
+def test_score_requires_category_and_a_subject():
+    rows = [
+        {
+            "input": "science quiz",
+            "response": "science",
+            "subjects": ["curie", "physics"],
+        },
+        {"input": "Italy quiz", "response": "geography", "subjects": ["rome", "alps"]},
+        {"input": "any quiz", "response": "quiz"},
+        {"input": "free text"},
+    ]
+    scorer = KeywordScorer(rows)
+    scores = scorer.score_all(
+        rows,
+        [
+            "A Science quiz: who was Marie Curie?",
+            "Geography: name the capital of France",
+            "Here is your QUIZ",
+            "anything",
+        ],
+    )
+
+    assert scores[0].hits == ["science", "curie"] and scores[0].passed
+    assert scores[1].category_found and scores[1].subjects_found == []
+    assert not scores[1].passed
+    assert scores[2].passed and scores[2].subjects_found == []
+    assert scores[3].passed is None and scores[3].category_found is None
+    assert scorer.score(rows[0], None).passed is False
+
+
+def test_scorer_compiles_the_dataset_once():
+    dataset = list(read_dataset(DATASET_PATH))
+    scorer = KeywordScorer(dataset)
+
+    expected = {row["response"] for row in dataset}
+    expected.update(subject for row in dataset for subject in row["subjects"])
+    assert set(scorer.matcher.keywords) == expected
+
+
+def test_keyword_columns_are_stored(tmp_path):
+    row = {
+        "input": "Quiz me about Italy",
+        "response": "geography",
+        "subjects": ["rome"],
+    }
+    score = KeywordScorer([row]).score(row, "Geography question about Rome")
+
+    store = ResultsStore(str(tmp_path / "results.sqlite"))
+    run_id = store.start_run()
+    store.append_results(
+        run_id,
+        [
+            {
+                "input": row["input"],
+                "keyword_hits": ", ".join(score.hits),
+                "keyword_passed": score.passed,
+            }
+        ],
+    )
+    [stored] = store.run_results(run_id)
+    [history] = store.pass_rate_history()
+    store.close()
+
+    assert stored["keyword_hits"] == "geography, rome"
+    assert stored["keyword_passed"] == 1
+    assert history["keyword_pass_rate"] == 1.0
+
+
+# Run all tests if script is executed directly
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
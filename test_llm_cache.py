@@ -0,0 +1,101 @@
+import pytest
+
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.outputs import ChatGeneration
+from langchain_core.messages import AIMessage
+
+import llm_cache
+from llm_cache import SQLiteLLMCache
+
+
+def generations(text):
+    return [ChatGeneration(message=AIMessage(content=text))]
+
+
+def test_cache_serves_repeated_prompts(tmp_path, setup_logging):
+    logger = setup_logging
+    logger.info("Testing the LLM cache answers repeated prompts")
+
+    cache = SQLiteLLMCache(path=str(tmp_path / "cache.sqlite"))
+    llm = FakeListChatModel(responses=["first", "second"], cache=cache)
+
+    assert llm.invoke("Quiz me about Paris").content == "first"
+    # The fake model would answer "second" if the request reached it
+    assert llm.invoke("Quiz me about Paris").content == "first"
+    assert llm.invoke("Quiz me about Rome").content == "second"
+
+    stats = cache.stats()
+    logger.info(f"Cache stats: {stats}")
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["entries"] == 2
+
+
+def test_cache_persists_across_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    SQLiteLLMCache(path=path).update("prompt", "gpt-3.5-turbo", generations("Y"))
+
+    result = SQLiteLLMCache(path=path).lookup("prompt", "gpt-3.5-turbo")
+    assert result[0].message.content == "Y"
+
+
+def test_cache_keys_on_llm_configuration(tmp_path):
+    cache = SQLiteLLMCache(path=str(tmp_path / "cache.sqlite"))
+    cache.update("prompt", "temperature=0", generations("Y"))
+
+    assert cache.lookup("prompt", "temperature=1") is None
+    assert cache.lookup("prompt", "temperature=0") is not None
+
+
+def test_cache_ignores_client_retry_settings(tmp_path, monkeypatch):
+    from app import create_llm
+
+    monkeypatch.setenv("OPENAI_API_KEY", "fake")
+    cache = SQLiteLLMCache(path=str(tmp_path / "cache.sqlite"))
+    default = create_llm(cache=False)._get_llm_string()
+    no_retries = create_llm(cache=False, max_retries=0)._get_llm_string()
+    cache.update("prompt", default, generations("Y"))
+
+    assert no_retries != default
+    assert cache.lookup("prompt", no_retries)[0].message.content == "Y"
+    hotter = create_llm(cache=False, temperature=1, max_retries=0)._get_llm_string()
+    assert cache.lookup("prompt", hotter) is None
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = SQLiteLLMCache(path=str(tmp_path / "cache.sqlite"), max_entries=2)
+    cache.update("a", "llm", generations("a"))
+    cache.update("b", "llm", generations("b"))
+    cache.lookup("a", "llm")
+    cache.update("c", "llm", generations("c"))
+
+    assert cache.count() == 2
+    assert cache.lookup("b", "llm") is None
+    assert cache.lookup("a", "llm") is not None
+
+
+def test_cache_expires_old_entries(tmp_path):
+    cache = SQLiteLLMCache(path=str(tmp_path / "cache.sqlite"), max_age_seconds=0)
+    cache.update("a", "llm", generations("a"))
+
+    assert cache.lookup("a", "llm") is None
+
+
+def test_cache_is_opt_in(tmp_path, monkeypatch):
+    monkeypatch.setenv("EVAL_LLM_CACHE_PATH", str(tmp_path / "cache.sqlite"))
+    monkeypatch.setattr(llm_cache, "_cache", None)
+    monkeypatch.setattr(llm_cache, "_enabled", None)
+
+    monkeypatch.delenv("EVAL_LLM_CACHE", raising=False)
+    assert llm_cache.get_llm_cache() is None
+
+    monkeypatch.setenv("EVAL_LLM_CACHE", "1")
+    assert isinstance(llm_cache.get_llm_cache(), SQLiteLLMCache)
+
+    llm_cache.configure_llm_cache(enabled=False)
+    assert llm_cache.get_llm_cache() is None
+
+
+# Run all tests if script is executed directly
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
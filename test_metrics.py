@@ -0,0 +1,160 @@
+import asyncio
+import json
+import pytest
+
+from adaptive import ResilientCaller, RetryPolicy
+from app import assistant_chain
+from fake_openai_server import FakeOpenAIServer
+from graders import PackedGrader, create_format_grader
+from metrics import MetricsCallbackHandler, format_summary, percentile
+from save_eval_artifacts import aevaluate_dataset, create_eval_chain
+
+
+def test_percentile():
+    assert percentile([], 0.5) is None
+    assert percentile([3.0], 0.99) == 3.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 0.5) == 2.5
+    assert percentile(list(range(101)), 0.95) == 95
+
+
+def test_records_calls_by_chain_and_row(setup_logging, fake_llm):
+    logger = setup_logging
+    logger.info("Testing metrics for a dataset run against the local stand-in")
+
+    metrics = MetricsCallbackHandler()
+    dataset = [{"input": f"Quiz me about Paris {idx}"} for idx in range(4)]
+    with FakeOpenAIServer(latency=0.01) as server:
+        asyncio.run(
+            aevaluate_dataset(
+                dataset,
+                "bank",
+                assistant_chain(llm=fake_llm(server)),
+                create_eval_chain(llm=fake_llm(server)),
+                max_concurrency=2,
+                callbacks=[metrics],
+            )
+        )
+
+    calls = metrics.records
+    assert len(calls) == 8
+    assert sorted((record["chain"], record["row_index"]) for record in calls) == sorted(
+        [("assistant", idx) for idx in range(4)] + [("grader", idx) for idx in range(4)]
+    )
+    assert all(record["prompt_tokens"] > 0 for record in calls)
+
+    summary = metrics.summary()
+    assert summary["assistant"]["calls"] == 4
+    assert summary["grader"]["errors"] == 0
+    assert summary["assistant"]["latency_s"]["p50"] >= 0.01
+    logger.info(format_summary(summary))
+
+
+def test_streaming_records_time_to_first_token(fake_llm):
+    metrics = MetricsCallbackHandler()
+    with FakeOpenAIServer(token_latency=0.005) as server:
+        assistant = assistant_chain(llm=fake_llm(server, stream_usage=True))
+        chunks = list(
+            assistant.stream({"question": "Quiz me"}, config={"callbacks": [metrics]})
+        )
+
+    (record,) = metrics.records
+    assert len(chunks) > 1
+    assert 0 < record["ttft_s"] < record["latency_s"]
+    assert record["completion_tokens"] > 0
+
+
+def test_records_errors_and_retries(fake_llm):
+    metrics = MetricsCallbackHandler()
+    with FakeOpenAIServer(error_rate=1.0, error_status=500) as server:
+        grader = create_format_grader(llm=fake_llm(server, max_retries=0)).with_retry(
+            stop_after_attempt=2, wait_exponential_jitter=False
+        )
+        with pytest.raises(Exception):
+            grader.invoke({"agent_response": "quiz"}, config={"callbacks": [metrics]})
+
+    summary = metrics.summary()["grader"]
+    assert summary["calls"] == 2
+    assert summary["errors"] == 2
+    assert summary["retries"] == 1
+
+
+def test_records_resilient_caller_attempts(fake_llm):
+    metrics = MetricsCallbackHandler()
+    caller = ResilientCaller(retry=RetryPolicy(base_delay_s=0.01, seed=0))
+    # With this seed the grader's first two requests fail
+    with FakeOpenAIServer(error_rate=0.5, error_status=500, seed=1) as server:
+        (result,) = asyncio.run(
+            aevaluate_dataset(
+                [{"input": "Quiz me about Paris"}],
+                "bank",
+                assistant_chain(llm=fake_llm(server, max_retries=0)),
+                create_eval_chain(llm=fake_llm(server, max_retries=0)),
+                callbacks=[metrics],
+                caller=caller,
+            )
+        )
+
+    assert result["attempts"] == 4
+    assert [
+        (record["chain"], record["attempt"], record["error"])
+        for record in metrics.records
+    ] == [
+        ("assistant", 1, None),
+        ("grader", 1, "InternalServerError"),
+        ("grader", 2, "InternalServerError"),
+        ("grader", 3, None),
+    ]
+    summary = metrics.summary()
+    assert summary["assistant"]["retries"] == 0
+    assert summary["grader"]["retries"] == 2
+
+
+def test_records_packed_grader_calls_once(fake_llm):
+    metrics = MetricsCallbackHandler()
+    dataset = [{"input": f"Quiz me about Paris {idx}"} for idx in range(4)]
+    with FakeOpenAIServer() as server:
+        packed = PackedGrader(fake_llm(server), pack_size=4, max_wait=1.0)
+        asyncio.run(
+            aevaluate_dataset(
+                dataset,
+                "bank",
+                assistant_chain(llm=fake_llm(server)),
+                packed.as_runnable(),
+                callbacks=[metrics],
+            )
+        )
+
+    assert packed.stats()["packed_requests"] == 1
+    (call,) = [record for record in metrics.records if record["chain"] == "grader"]
+    assert call["rows"] == 4
+    summary = metrics.summary()["grader"]
+    assert (summary["calls"], summary["rows"], summary["errors"]) == (1, 4, 0)
+
+    grader = [row for row in metrics.row_records() if row["chain"] == "grader"]
+    assert sorted(row["row_index"] for row in grader) == [0, 1, 2, 3]
+    tokens = [row["prompt_tokens"] for row in grader]
+    assert max(tokens) - min(tokens) <= 1 and min(tokens) > 0
+    assert sum(tokens) == call["prompt_tokens"]
+
+
+def test_exports_json_and_prometheus(tmp_path, fake_llm):
+    metrics = MetricsCallbackHandler()
+    with FakeOpenAIServer() as server:
+        create_format_grader(llm=fake_llm(server)).invoke(
+            {"agent_response": "quiz"}, config={"callbacks": [metrics]}
+        )
+
+    metrics.write_json(tmp_path / "metrics.json")
+    exported = json.loads((tmp_path / "metrics.json").read_text())
+    assert exported["summary"]["grader"]["calls"] == 1
+    assert len(exported["records"]) == 1
+
+    text = metrics.to_prometheus()
+    assert "# TYPE eval_llm_call_seconds summary" in text
+    assert 'eval_llm_call_seconds{chain="grader",quantile="0.99"}' in text
+    assert 'eval_llm_calls_total{chain="grader"} 1' in text
+
+
+# Run all tests if script is executed directly
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
@@ -0,0 +1,136 @@
+import asyncio
+import openai
+import pytest
+
+from app import assistant_chain, create_llm
+from cassette import CassetteCache, CassetteMissError, RECORD, REPLAY
+from fake_openai_server import DEFAULT_QUIZ, FakeOpenAIServer, default_responder
+from quiz_index import load_quiz_bank_index
+from save_eval_artifacts import aevaluate_dataset, create_eval_chain
+
+
+@pytest.fixture
+def fake_openai():
+    with FakeOpenAIServer() as server:
+        yield server
+
+
+def test_assistant_chain_against_fake_server(fake_openai, setup_logging, fake_llm):
+    logger = setup_logging
+    logger.info("Testing assistant_chain against the local OpenAI stand-in")
+
+    assistant = assistant_chain(llm=fake_llm(fake_openai))
+    answer = assistant.invoke({"question": "Generate a quiz about Geography"})
+
+    assert answer == DEFAULT_QUIZ
+    assert fake_openai.stats()["requests"] == 1
+
+
+def test_streaming_against_fake_server(fake_openai, fake_llm):
+    assistant = assistant_chain(llm=fake_llm(fake_openai))
+    chunks = list(assistant.stream({"question": "Generate a quiz about Geography"}))
+
+    assert len(chunks) > 1
+    assert "".join(chunks) == DEFAULT_QUIZ
+
+
+def test_fake_server_uses_base_url_from_environment(fake_openai, monkeypatch):
+    monkeypatch.setenv("OPENAI_BASE_URL", fake_openai.base_url)
+    monkeypatch.setenv("OPENAI_API_KEY", "fake")
+
+    answer = assistant_chain(llm=create_llm()).invoke({"question": "Quiz me"})
+    assert answer == DEFAULT_QUIZ
+
+
+def test_evaluate_dataset_against_fake_server(setup_logging, fake_llm):
+    logger = setup_logging
+    logger.info("Testing concurrent dataset evaluation against the stand-in")
+
+    dataset = [{"input": f"Quiz me about Paris {idx}"} for idx in range(8)]
+    with FakeOpenAIServer(latency=0.05) as server:
+        results = asyncio.run(
+            aevaluate_dataset(
+                dataset,
+                "bank",
+                assistant_chain(llm=fake_llm(server)),
+                create_eval_chain(llm=fake_llm(server)),
+                max_concurrency=4,
+            )
+        )
+        logger.info(f"Server stats: {server.stats()}")
+
+        assert [result["grader_response"] for result in results] == ["Y"] * 8
+        assert server.stats()["requests"] == 16
+        assert 1 < server.stats()["peak_in_flight"] <= 4
+
+
+def test_pruned_prompts_against_fake_server(fake_llm):
+    requests = []
+
+    def responder(messages):
+        requests.append(messages)
+        return default_responder(messages)
+
+    index = load_quiz_bank_index()
+    with FakeOpenAIServer(responder=responder) as server:
+        assistant = assistant_chain(llm=fake_llm(server), quiz_bank_index=index)
+        evaluator = create_eval_chain(llm=fake_llm(server), quiz_bank_index=index)
+
+        answer = assistant.invoke({"question": "Generate a quiz about Art"})
+        evaluator.invoke({"context": index.render(), "agent_response": answer})
+
+    system_prompt = requests[0][0]["content"]
+    assert "Subject: Starry Night" in system_prompt
+    assert "Subject: Telescopes" not in system_prompt
+
+    grader_prompt = requests[1][1]["content"]
+    assert "Subject: Paris" in grader_prompt
+    assert "Subject: Starry Night" not in grader_prompt
+
+
+def test_fake_server_injects_errors(fake_llm):
+    with FakeOpenAIServer(error_rate=1.0) as server:
+        llm = fake_llm(server, max_retries=0)
+        with pytest.raises(openai.RateLimitError):
+            llm.invoke("Quiz me")
+        assert server.stats()["errors"] == 1
+
+
+def test_client_retries_injected_errors(fake_llm):
+    with FakeOpenAIServer(error_rate=0.5, retry_after=0.001, seed=3) as server:
+        llm = fake_llm(server, max_retries=10)
+        for _ in range(5):
+            assert llm.invoke("Quiz me").content == DEFAULT_QUIZ
+        assert server.stats()["errors"] > 0
+        assert server.stats()["requests"] == 5 + server.stats()["errors"]
+
+
+def test_cassette_records_then_replays(tmp_path, setup_logging, fake_llm):
+    logger = setup_logging
+    logger.info("Testing cassette record and replay")
+    path = str(tmp_path / "cassette.json")
+
+    with FakeOpenAIServer() as server:
+        recorder = CassetteCache(path, mode=RECORD)
+        assistant = assistant_chain(llm=fake_llm(server, cache=recorder))
+        recorded = assistant.invoke({"question": "Generate a quiz about Art"})
+        assert recorder.recorded == 1
+
+    # The server is gone: replay must not touch the network
+    player = CassetteCache(path, mode=REPLAY)
+    assistant = assistant_chain(llm=fake_llm(server, cache=player))
+    assert assistant.invoke({"question": "Generate a quiz about Art"}) == recorded
+    assert player.hits == 1
+
+    with pytest.raises(CassetteMissError):
+        assistant.invoke({"question": "Generate a quiz about Science"})
+
+
+def test_replay_requires_existing_cassette(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        CassetteCache(str(tmp_path / "missing.json"), mode=REPLAY)
+
+
+# Run all tests if script is executed directly
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
@@ -0,0 +1,132 @@
+import os
+import shutil
+import pytest
+
+import app
+from quiz_bank_store import QuizBankStore, get_quiz_bank_store
+from quiz_index import QuizBankIndex
+from results_store import fingerprint
+
+EXTRA_SUBJECT = """
+6. Subject: Rome
+   Categories: Geography, Art
+   Facts:
+    - Capital of Italy
+    - Home of the Colosseum
+"""
+
+
+@pytest.fixture
+def bank(tmp_path):
+    path = tmp_path / "quiz_bank.txt"
+    shutil.copy(app.QUIZ_BANK_PATH, path)
+    return path
+
+
+def edit(path, old, new):
+    path.write_text(path.read_text().replace(old, new))
+
+
+def test_subjects_are_parsed_on_demand(bank):
+    store = QuizBankStore(str(bank))
+
+    assert store.text() == bank.read_text()
+    assert store.stats()["subjects"] == 5 and store.parsed == 0
+    index = store.index()
+    assert index.match_categories("An art quiz") == ["Art"]
+    assert store.parsed == 0
+
+    art = index.render_for_request("Generate a quiz about art")
+    assert store.parsed == 3
+    expected = QuizBankIndex.from_text(bank.read_text())
+    assert art == expected.render_for_request("Generate a quiz about art")
+    quiz = "What did Leonardo DaVinci paint?"
+    assert index.render_for_quiz(quiz) == expected.render_for_quiz(quiz)
+    assert store.parsed == 3
+
+    assert index.render() == expected.render()
+    assert store.parsed == 5
+    assert [(s.name, s.categories, s.facts) for s in index.subjects] == [
+        (s.name, s.categories, s.facts) for s in expected.subjects
+    ]
+    assert store.index() is index
+
+
+def test_persisted_index_is_reused(bank):
+    first = QuizBankStore(str(bank))
+    first.refresh()
+    assert os.path.exists(first.index_path)
+    assert first.indexed == 5
+
+    second = QuizBankStore(str(bank))
+    assert second.refresh()
+    assert second.indexed == 0 and second.parsed == 0
+    assert second.entries == first.entries
+    assert second.text() == first.text()
+
+
+def test_edits_reindex_only_changed_subjects(bank):
+    store = QuizBankStore(str(bank))
+    store.subjects()
+    version = store.version
+
+    # Touching the file without changing it is not a change
+    os.utime(bank, ns=(1, 1))
+    assert not store.refresh() and store.version == version
+
+    edit(bank, "Capital of France", "Capital city of France")
+    with bank.open("a") as file:
+        file.write(EXTRA_SUBJECT)
+    assert store.refresh()
+    assert store.version == version + 1
+    assert store.indexed == 5 + 2
+    store.subjects()
+    assert store.parsed == 5 + 2
+    assert "Capital city of France" in store.index().subjects[1].facts
+    assert store.index().subjects_for_categories(["Geography"])[-1].name == "Rome"
+    assert store.index().match_subjects("Quiz me about Rome")[0].number == 6
+
+
+def test_stale_index_does_not_read_edited_subjects(bank):
+    store = QuizBankStore(str(bank))
+    index = store.index()
+    store.text()
+    assert store.fingerprint() == fingerprint(bank.read_text())
+
+    edit(bank, "Capital of France", "Capital city of France")
+    with pytest.raises(LookupError, match="Paris"):
+        index.subjects[1].text
+    # Unchanged subjects still render, and a fresh index sees the edit
+    assert index.subjects[0].text.startswith("1. Subject: Leonardo DaVinci")
+    assert "Capital city of France" in store.index().subjects[1].text
+
+
+def test_empty_and_missing_files(tmp_path):
+    empty = tmp_path / "empty.txt"
+    empty.write_text("")
+    store = QuizBankStore(str(empty))
+    assert store.text() == "" and store.entries == []
+
+    with pytest.raises(FileNotFoundError):
+        QuizBankStore(str(tmp_path / "missing.txt")).refresh()
+
+
+def test_system_message_follows_the_file(bank, monkeypatch):
+    monkeypatch.setattr(app, "QUIZ_BANK_PATH", str(bank))
+    before = app.get_system_message()
+    assert "Starry Night" in before
+    assert app.get_system_message() is before
+
+    with bank.open("a") as file:
+        file.write(EXTRA_SUBJECT)
+    after = app.get_system_message()
+    assert "6. Subject: Rome" in after and "6. Subject: Rome" not in before
+    assert get_quiz_bank_store(str(bank)).version == 2
+
+    monkeypatch.setattr(app, "QUIZ_BANK_PATH", str(bank.parent / "missing.txt"))
+    assert app.get_quiz_bank() is None
+
+
+# Run all tests if script is executed directly
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
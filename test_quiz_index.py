@@ -0,0 +1,89 @@
+import pytest
+
+from quiz_index import QuizBankIndex, load_quiz_bank_index, parse_quiz_bank
+
+
+@pytest.fixture
+def index():
+    return load_quiz_bank_index("quiz_bank.txt")
+
+
+def test_parse_quiz_bank(index):
+    names = [subject.name for subject in index.subjects]
+    assert names == [
+        "Leonardo DaVinci",
+        "Paris",
+        "Telescopes",
+        "Starry Night",
+        "Physics",
+    ]
+
+    paris = index.subjects[1]
+    assert paris.categories == ["Art", "Geography"]
+    assert "Capital of France" in paris.facts
+    assert paris.text.startswith("2. Subject: Paris")
+    # Both "Category:" and "Categories:" lines are understood
+    assert index.subjects[2].categories == ["Science"]
+    assert index.categories == ["Art", "Geography", "Science"]
+
+
+def test_render_for_request_keeps_matching_category(index, setup_logging):
+    logger = setup_logging
+    logger.info("Testing per-request quiz bank pruning")
+
+    bank = index.render_for_request("Generate a quiz about science.")
+    logger.info(f"Pruned bank: {bank}")
+
+    assert "Subject: Leonardo DaVinci" in bank
+    assert "Subject: Telescopes" in bank
+    assert "Subject: Physics" in bank
+    assert "Subject: Paris" not in bank
+    assert "Subject: Starry Night" not in bank
+
+
+def test_render_for_request_matches_subject_names(index):
+    bank = index.render_for_request("Quiz me about Paris")
+    assert bank == index.subjects[1].text
+
+
+def test_render_for_request_falls_back_to_full_bank(index):
+    assert index.render_for_request("Quiz me about Italy") == index.render()
+
+
+def test_render_for_quiz_keeps_referenced_subjects(index):
+    quiz = (
+        "Question 1:#### What is the capital of France?\n\n"
+        "Question 2:#### Who painted the Starry Night?"
+    )
+    bank = index.render_for_quiz(quiz)
+
+    assert "Subject: Paris" in bank
+    assert "Subject: Starry Night" in bank
+    assert "Subject: Telescopes" not in bank
+
+
+def test_render_for_quiz_falls_back_to_full_bank(index):
+    quiz = "I'm sorry I do not have information about that"
+    assert index.render_for_quiz(quiz) == index.render()
+
+
+def test_index_scales_to_large_banks():
+    text = "\n\n".join(
+        f"{number}. Subject: Topic{number}\n"
+        f"   Category: Category{number % 10}\n"
+        f"   Facts:\n"
+        f"    - Unique fact marker{number}"
+        for number in range(1, 5001)
+    )
+    index = QuizBankIndex(parse_quiz_bank(text))
+
+    assert len(index.subjects) == 5000
+    assert len(index.subjects_for_categories(["category3"])) == 500
+    assert (
+        index.render_for_quiz("Tell me about marker4321") == index.subjects[4320].text
+    )
+
+
+# Run all tests if script is executed directly
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
@@ -0,0 +1,119 @@
+import pytest
+
+from category_router import REFUSAL
+from fake_openai_server import DEFAULT_QUIZ
+from quiz_parser import (
+    OTHER,
+    QUIZ,
+    REFUSAL_KIND,
+    Question,
+    create_local_format_grader,
+    is_refusal,
+    parse_quiz,
+    split_quiz,
+)
+from results_store import ResultsStore
+
+GOOD_QUIZ = (
+    "Question 1:#### What is the capital of France?\n\n"
+    "Question 2:#### Which museum in Paris displays the Mona Lisa?\n\n"
+    "Question 3:#### Where were the first refracting telescopes invented?"
+)
+
+
+def test_well_formed_quiz():
+    parsed = parse_quiz(GOOD_QUIZ)
+
+    assert parsed.kind == QUIZ and parsed.valid
+    assert parsed.problems == []
+    assert parsed.questions[0] == Question(1, "What is the capital of France?", True)
+    assert [question.number for question in parsed.questions] == [1, 2, 3]
+
+
+def test_fake_server_quiz_is_well_formed():
+    assert parse_quiz(DEFAULT_QUIZ).valid
+
+
+def test_question_text_on_the_next_line_and_markdown():
+    parsed = parse_quiz(
+        "Here is your quiz:\n\n"
+        "**Question 1:** ####\nWhat is the capital of France?\n\n"
+        "Question 2:####   Who painted the Mona Lisa?  \n"
+        "- a) Da Vinci\n- b) Picasso\n"
+        "## Question 3: #### Where is the Louvre?"
+    )
+
+    assert parsed.valid
+    assert [question.text for question in parsed.questions] == [
+        "What is the capital of France?",
+        "Who painted the Mona Lisa?",
+        "Where is the Louvre?",
+    ]
+
+
+def test_format_problems_are_listed():
+    parsed = parse_quiz(
+        "Question 1: What is the capital of France?\n\n" "Question 3:####\n\n"
+    )
+
+    assert parsed.kind == QUIZ and not parsed.valid
+    assert parsed.problems == [
+        "expected 3 questions, found 2",
+        "questions numbered 1, 3 instead of 1-2",
+        "question 1 is missing the #### delimiter",
+        "question 3 has no text",
+    ]
+    assert parse_quiz(GOOD_QUIZ, expected_count=2).problems == [
+        "expected 2 questions, found 3"
+    ]
+    assert parse_quiz(GOOD_QUIZ.split("\n\n")[0], expected_count=None).valid
+
+
+def test_refusals_and_free_text():
+    assert parse_quiz(REFUSAL).kind == REFUSAL_KIND
+    assert is_refusal("I’m sorry, I do not have information about that.")
+    assert not is_refusal("I'm sorry, here is a quiz")
+
+    parsed = parse_quiz("There are lots of interesting facts.")
+    assert parsed.kind == OTHER and not parsed.valid
+    assert parsed.problems == ["no questions found"]
+    assert parse_quiz(None).kind == OTHER
+    # Mentioning a question in prose is not a question header
+    assert split_quiz("Question 1 is about Paris") == []
+
+
+def test_local_format_grader_is_a_drop_in():
+    grader = create_local_format_grader()
+
+    assert grader.invoke({"agent_response": GOOD_QUIZ}) == "Y"
+    assert grader.batch([{"agent_response": REFUSAL}, {"agent_response": "hi"}]) == [
+        "N",
+        "N",
+    ]
+
+
+def test_parsed_format_is_stored(tmp_path):
+    parsed = parse_quiz("Question 1:#### Capital of France?")
+
+    store = ResultsStore(str(tmp_path / "results.sqlite"))
+    run_id = store.start_run()
+    store.append_results(
+        run_id,
+        [
+            {
+                "input": "Quiz me",
+                "response_kind": parsed.kind,
+                "format_problems": "; ".join(parsed.problems),
+            }
+        ],
+    )
+    [stored] = store.run_results(run_id)
+    store.close()
+
+    assert stored["response_kind"] == "quiz"
+    assert stored["format_problems"] == "expected 3 questions, found 1"
+
+
+# Run all tests if script is executed directly
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
@@ -0,0 +1,145 @@
+import asyncio
+import json
+import subprocess
+import sys
+import time
+import pytest
+
+from app import create_llm
+from fake_openai_server import FakeOpenAIServer
+from llm_cache import SQLiteLLMCache
+from rate_limit import FileRateLimiter, get_rate_limiter
+
+
+@pytest.fixture
+def state_path(tmp_path):
+    return str(tmp_path / "rate_limit.json")
+
+
+def test_requests_are_spaced_by_the_rate(state_path):
+    # 10 requests per second and no burst beyond a single request
+    limiter = FileRateLimiter(600, path=state_path, burst_seconds=0.1)
+
+    start = time.monotonic()
+    for _ in range(4):
+        assert limiter.acquire()
+    elapsed = time.monotonic() - start
+
+    assert 0.25 < elapsed < 1.0
+    assert limiter.stats()["waits"] == 3
+
+
+def test_non_blocking_acquire_fails_when_empty(state_path):
+    limiter = FileRateLimiter(60, path=state_path)
+
+    assert limiter.acquire(blocking=False)
+    assert not limiter.acquire(blocking=False)
+
+
+def test_requests_wait_while_tokens_are_in_debt(state_path):
+    # 1000 tokens per second with a 100 token bucket
+    limiter = FileRateLimiter(
+        tokens_per_minute=60000, path=state_path, burst_seconds=0.1
+    )
+    limiter.acquire()
+    limiter.debit(300)
+
+    assert not limiter.acquire(blocking=False)
+    start = time.monotonic()
+    limiter.acquire()
+    assert 0.15 < time.monotonic() - start < 1.0
+
+
+def test_async_calls_are_paced(state_path):
+    limiter = FileRateLimiter(600, path=state_path, burst_seconds=0.1)
+
+    async def call_all():
+        with FakeOpenAIServer() as server:
+            llm = create_llm(
+                base_url=server.base_url,
+                openai_api_key="fake",
+                rate_limiter=limiter,
+                callbacks=[limiter.usage_callback],
+            )
+            start = time.monotonic()
+            await asyncio.gather(*(llm.ainvoke(f"Quiz {idx}") for idx in range(4)))
+            return time.monotonic() - start
+
+    assert asyncio.run(call_all()) > 0.25
+
+
+CHILD = """
+import sys, time
+from rate_limit import FileRateLimiter
+limiter = FileRateLimiter(600, path=sys.argv[1], burst_seconds=0.1)
+for _ in range(3):
+    limiter.acquire()
+    print(time.time(), flush=True)
+"""
+
+
+def test_budget_is_shared_across_processes(state_path, setup_logging):
+    logger = setup_logging
+    logger.info("Testing the rate limit across two processes")
+
+    children = [
+        subprocess.Popen(
+            [sys.executable, "-c", CHILD, state_path],
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        for _ in range(2)
+    ]
+    stamps = sorted(
+        float(line) for child in children for line in child.communicate()[0].split()
+    )
+    gaps = [later - earlier for earlier, later in zip(stamps, stamps[1:])]
+    logger.info(f"Gaps between acquisitions: {gaps}")
+
+    assert len(stamps) == 6
+    # Both processes draw from one 10/s budget, so no two requests are much
+    # closer together than 100ms
+    assert min(gaps) > 0.07
+
+
+def test_llm_calls_take_requests_and_debit_tokens(state_path, tmp_path):
+    limiter = FileRateLimiter(6000, 600000, path=state_path)
+    debits = []
+    debit = limiter.debit
+    limiter.debit = lambda tokens: debits.append(tokens) or debit(tokens)
+
+    with FakeOpenAIServer() as server:
+        llm = create_llm(
+            base_url=server.base_url,
+            openai_api_key="fake",
+            cache=SQLiteLLMCache(str(tmp_path / "cache.sqlite")),
+            rate_limiter=limiter,
+            callbacks=[limiter.usage_callback],
+        )
+        llm.invoke("Quiz me")
+        # A cache hit never reaches the API, so it costs nothing
+        llm.invoke("Quiz me")
+        requests = server.stats()["requests"]
+
+    assert requests == 1
+    assert len(debits) == 1 and debits[0] > 0
+    with open(state_path) as file:
+        assert json.load(file)["tokens"] < limiter.token_capacity
+
+
+def test_create_llm_uses_limiter_from_environment(monkeypatch, state_path):
+    monkeypatch.setenv("EVAL_RATE_LIMIT_RPM", "120")
+    monkeypatch.setenv("EVAL_RATE_LIMIT_PATH", state_path)
+    get_rate_limiter.cache_clear()
+    try:
+        llm = create_llm(openai_api_key="fake")
+        assert llm.rate_limiter is get_rate_limiter()
+        assert llm.rate_limiter.request_rate == 2
+        assert llm.rate_limiter.usage_callback in llm.callbacks
+    finally:
+        get_rate_limiter.cache_clear()
+
+
+# Run all tests if script is executed directly
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
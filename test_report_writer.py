@@ -0,0 +1,139 @@
+import os
+import re
+import pytest
+
+from report_writer import Reservoir, ReportWriter, write_report
+from results_store import ResultsStore
+
+
+def make_rows(count, fail_every=4):
+    for index in range(count):
+        yield {
+            "row_index": index,
+            "input": f"Quiz me about topic {index}",
+            "output": f"Question 1\n<b>answer</b> {index}",
+            "decision": "N" if index % fail_every == 0 else "Y",
+            "assistant_latency_s": index / 100,
+            "grader_latency_s": 0.5,
+            "status": "ok",
+            "error": None,
+            "carried_from": None,
+        }
+
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def test_rows_are_split_into_linked_pages(tmp_path):
+    index = write_report(make_rows(25), str(tmp_path), page_size=10)
+
+    pages = sorted(name for name in os.listdir(tmp_path) if name.startswith("page-"))
+    assert pages == ["page-0001.html", "page-0002.html", "page-0003.html"]
+    first, middle, last = (read(tmp_path / page) for page in pages)
+    assert first.count("<tr id='row-") == 10 and last.count("<tr id='row-") == 5
+    assert "href='page-0002.html'>Next" in first
+    assert "href='page-0001.html'>Previous" in middle
+    assert "href='page-0003.html'>Next" in middle
+    assert "Next" not in last
+
+    summary = read(index)
+    assert "page-0003.html'>page-0003.html</a>: rows 20-24" in summary
+
+
+def test_cells_are_escaped_with_line_breaks(tmp_path):
+    write_report(make_rows(1), str(tmp_path))
+
+    page = read(tmp_path / "page-0001.html")
+    assert "Question 1<br>&lt;b&gt;answer&lt;/b&gt; 0" in page
+    assert "<b>answer</b>" not in page
+
+
+def test_summary_counts_pass_rate_latency_and_failures(tmp_path):
+    rows = list(make_rows(8))
+    rows[1].update(status="failed", decision=None, error="TimeoutError: timed out")
+    rows[2]["carried_from"] = 3
+    with ReportWriter(str(tmp_path), page_size=3) as writer:
+        for row in rows:
+            writer.add(row)
+        summary = writer.summary()
+
+    assert summary["rows"] == 8
+    assert summary["graded"] == 7
+    assert summary["pass_rate"] == pytest.approx(5 / 7)
+    assert summary["not_passed"] == 3
+    assert summary["errors"] == 1
+    assert summary["fresh"] == 7
+    assert summary["latency_s"]["grader_latency_s"]["p50"] == 0.5
+    assert summary["latency_s"]["assistant_latency_s"]["p50"] == pytest.approx(0.035)
+
+    index = read(tmp_path / "index.html")
+    links = re.findall(r"href='(page-\d+\.html#row-\d+)'", index)
+    assert links == [
+        "page-0001.html#row-0",
+        "page-0001.html#row-1",
+        "page-0002.html#row-4",
+    ]
+    assert "TimeoutError: timed out" in index
+    assert "71.4%" in index
+
+
+def test_failures_only_pages_still_summarize_every_row(tmp_path):
+    with ReportWriter(str(tmp_path), page_size=2, include="failures") as writer:
+        for row in make_rows(12):
+            writer.add(row)
+
+    assert writer.summary()["rows"] == 12
+    assert writer.summary()["not_passed"] == 3
+    pages = sorted(name for name in os.listdir(tmp_path) if name.startswith("page-"))
+    assert pages == ["page-0001.html", "page-0002.html"]
+    assert re.findall(r"<tr id='row-(\d+)'", read(tmp_path / "page-0002.html")) == ["8"]
+
+
+def test_failure_links_are_capped(tmp_path, monkeypatch):
+    monkeypatch.setattr("report_writer.MAX_FAILURE_LINKS", 2)
+    write_report(make_rows(20, fail_every=1), str(tmp_path))
+
+    assert "... and 18 more" in read(tmp_path / "index.html")
+
+
+def test_reservoir_keeps_a_bounded_uniform_sample():
+    reservoir = Reservoir(size=1000)
+    for value in range(100_000):
+        reservoir.add(value)
+
+    assert len(reservoir.values) == 1000
+    assert reservoir.seen == 100_000
+    assert reservoir.percentiles()["p50"] == pytest.approx(50_000, rel=0.1)
+
+
+def test_report_streams_from_the_results_store(tmp_path, setup_logging):
+    logger = setup_logging
+    logger.info("Testing a paginated report rendered from the results store")
+
+    store = ResultsStore(str(tmp_path / "results.sqlite"))
+    run_id = store.start_run()
+    results = [
+        {
+            "index": row["row_index"],
+            "grader_response": f"Decision: {row['decision']}",
+            **row,
+        }
+        for row in make_rows(30)
+    ]
+    store.append_results(run_id, results)
+    index = write_report(
+        store.run_results(run_id), str(tmp_path / "report"), page_size=8
+    )
+    store.close()
+
+    summary = read(index)
+    logger.info(f"Report written to {index}")
+    assert len(re.findall(r"<li><a href='page-\d+\.html'>", summary)) == 4
+    assert "Not passed (8)" in summary
+
+
+# Run all tests if script is executed directly
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
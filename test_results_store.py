@@ -0,0 +1,183 @@
+import sqlite3
+import pytest
+
+from results_store import (
+    ResultsStore,
+    config_fingerprint,
+    parse_decision,
+    row_fingerprint,
+)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultsStore(str(tmp_path / "results.sqlite"))
+    yield store
+    store.close()
+
+
+def result(input, decision, latency=0.5):
+    return {
+        "input": input,
+        "output": "Question 1:#### ...",
+        "grader_response": f"Decision: {decision}\nExplanation: ...",
+        "assistant_latency_s": latency,
+        "grader_latency_s": latency,
+    }
+
+
+@pytest.mark.parametrize(
+    "grader_response, expected",
+    [
+        ("************\nDecision: Y\n************\nExplanation: ...", "Y"),
+        ("Decision: <N>", "N"),
+        ("Y", "Y"),
+        ("No.", "N"),
+        ("The quiz looks fine", None),
+    ],
+)
+def test_parse_decision(grader_response, expected):
+    assert parse_decision(grader_response) == expected
+
+
+def test_store_records_runs_with_metadata(store):
+    run_id = store.start_run(
+        model="gpt-3.5-turbo", temperature=0, prompt_hash="abc", pre_route=True
+    )
+    store.append_results(run_id, [result("Quiz me about Paris", "Y")])
+
+    [run] = store.runs()
+    assert run["run_id"] == run_id
+    assert run["model"] == "gpt-3.5-turbo"
+    assert '"pre_route": true' in run["metadata"]
+
+    [row] = store.run_results(run_id)
+    assert row["row_index"] == 0
+    assert row["decision"] == "Y"
+    assert row["assistant_latency_s"] == 0.5
+
+
+def test_run_results_follow_dataset_order(store):
+    run_id = store.start_run()
+    store.append_results(
+        run_id,
+        [
+            {"index": 2, **result("c", "Y")},
+            {"index": 0, **result("a", "N")},
+            {"index": 1, **result("b", "Y")},
+        ],
+    )
+
+    assert [row["input"] for row in store.run_results(run_id)] == ["a", "b", "c"]
+
+
+def test_pass_rate_history_across_runs(store, setup_logging):
+    logger = setup_logging
+    logger.info("Testing pass rate history across runs")
+
+    for decisions in (["Y", "N"], ["Y", "Y"], ["N", "N"]):
+        run_id = store.start_run(model="gpt-3.5-turbo")
+        store.append_results(
+            run_id,
+            [
+                result("I'm an geography expert", decisions[0]),
+                result("Quiz me about science", decisions[1]),
+            ],
+        )
+
+    history = store.pass_rate_history()
+    logger.info(f"History: {history}")
+    assert [run["pass_rate"] for run in history] == [0.5, 1.0, 0.0]
+
+    geography = store.pass_rate_history(input_contains="geography", last=2)
+    assert [run["pass_rate"] for run in geography] == [1.0, 0.0]
+    assert all(run["graded"] == 1 for run in geography)
+
+
+def test_failed_rows_are_recorded_without_a_decision(store):
+    run_id = store.start_run()
+    store.append_results(
+        run_id,
+        [
+            result("a", "Y"),
+            {
+                "input": "b",
+                "output": None,
+                "grader_response": None,
+                "status": "failed",
+                "attempts": 4,
+                "error": "RateLimitError: 429",
+            },
+        ],
+    )
+
+    ok, failed = store.run_results(run_id)
+    assert ok["status"] == "ok"
+    assert failed["status"] == "failed"
+    assert failed["decision"] is None
+    assert failed["attempts"] == 4
+    [run] = store.pass_rate_history()
+    assert run["graded"] == 1 and run["failed"] == 1
+
+
+def test_older_stores_gain_the_new_columns(tmp_path):
+    path = str(tmp_path / "old.sqlite")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE results (
+            run_id TEXT NOT NULL, row_index INTEGER NOT NULL, input TEXT,
+            output TEXT, grader_response TEXT, decision TEXT,
+            assistant_latency_s REAL, grader_latency_s REAL,
+            PRIMARY KEY (run_id, row_index)
+        );
+        INSERT INTO results VALUES ('old', 0, 'a', 'x', 'Y', 'Y', 0.1, 0.1);
+        """)
+    conn.close()
+
+    store = ResultsStore(path)
+    run_id = store.start_run()
+    store.append_results(run_id, [result("b", "N")])
+
+    [old] = store.run_results("old")
+    [new] = store.run_results(run_id)
+    store.close()
+    assert old["status"] is None
+    assert new["status"] == "ok"
+
+
+def test_row_fingerprints_change_with_input_and_config():
+    config = config_fingerprint(model="gpt-3.5-turbo", temperature=0, prompt_hash="a")
+    same = config_fingerprint(temperature=0, prompt_hash="a", model="gpt-3.5-turbo")
+    tweaked = config_fingerprint(model="gpt-3.5-turbo", temperature=0, prompt_hash="b")
+
+    assert config == same
+    assert row_fingerprint("a", config) == row_fingerprint("a", same)
+    assert row_fingerprint("a", config) != row_fingerprint("b", config)
+    assert row_fingerprint("a", config) != row_fingerprint("a", tweaked)
+
+
+def test_prior_results_point_at_the_run_that_evaluated_them(store):
+    first = store.start_run()
+    store.append_results(
+        first,
+        [
+            {**result("a", "Y"), "fingerprint": "fp-a"},
+            {"input": "b", "status": "failed", "fingerprint": "fp-b"},
+        ],
+    )
+    # Failed rows are never carried forward
+    assert store.prior_result("fp-b") is None
+
+    prior = store.prior_result("fp-a")
+    assert prior["carried_from"] == first
+    assert prior["decision"] == "Y"
+
+    second = store.start_run()
+    store.append_results(second, [{**prior, "index": 0}])
+    assert store.prior_result("fp-a")["carried_from"] == first
+    assert store.prior_result("unknown") is None
+
+
+# Run all tests if script is executed directly
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
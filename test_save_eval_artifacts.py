@@ -0,0 +1,254 @@
+import asyncio
+import json
+import os
+import pytest
+
+from langchain_core.runnables import RunnableLambda
+
+import app
+from dataset_io import ResultsLog
+from fake_openai_server import FakeOpenAIServer
+import save_eval_artifacts
+from results_store import ResultsStore, fingerprint
+from save_eval_artifacts import aevaluate_dataset, aevaluate_stream, report_evals
+
+
+def make_dataset(size):
+    return [{"input": f"Quiz me about topic {idx}"} for idx in range(size)]
+
+
+def test_aevaluate_dataset_keeps_input_order(setup_logging):
+    logger = setup_logging
+    logger.info("Testing aevaluate_dataset keeps results in input order")
+
+    async def answer(inputs):
+        # Later rows finish first so completion order differs from input order
+        idx = int(inputs["question"].rsplit(" ", 1)[1])
+        await asyncio.sleep(0.01 * (5 - idx))
+        return f"answer {idx}"
+
+    async def grade(inputs):
+        return f"graded {inputs['agent_response']} against {inputs['context']}"
+
+    dataset = make_dataset(5)
+    results = asyncio.run(
+        aevaluate_dataset(
+            dataset, "bank", RunnableLambda(answer), RunnableLambda(grade)
+        )
+    )
+
+    assert [result["input"] for result in results] == [row["input"] for row in dataset]
+    assert [result["output"] for result in results] == [
+        f"answer {idx}" for idx in range(5)
+    ]
+    assert results[2]["grader_response"] == "graded answer 2 against bank"
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 3])
+def test_aevaluate_dataset_respects_max_concurrency(setup_logging, max_concurrency):
+    logger = setup_logging
+    logger.info(f"Testing aevaluate_dataset with max_concurrency={max_concurrency}")
+
+    in_flight = 0
+    peak = 0
+
+    async def answer(inputs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return "answer"
+
+    async def grade(inputs):
+        await asyncio.sleep(0.01)
+        return "Y"
+
+    results = asyncio.run(
+        aevaluate_dataset(
+            make_dataset(10),
+            "bank",
+            RunnableLambda(answer),
+            RunnableLambda(grade),
+            max_concurrency=max_concurrency,
+        )
+    )
+
+    assert len(results) == 10
+    assert peak == max_concurrency
+
+
+def test_aevaluate_stream_resumes_after_crash(tmp_path, setup_logging):
+    logger = setup_logging
+    logger.info("Testing streaming evaluation resumes from the results log")
+
+    results_log = ResultsLog(str(tmp_path / "results.jsonl"))
+    dataset = make_dataset(6)
+    calls = []
+
+    async def answer(inputs):
+        calls.append(inputs["question"])
+        if inputs["question"].endswith(" 4") and len(calls) < 6:
+            raise RuntimeError("connection dropped")
+        return "answer"
+
+    async def grade(inputs):
+        return "Y"
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(
+            aevaluate_stream(
+                iter(dataset),
+                "bank",
+                RunnableLambda(answer),
+                RunnableLambda(grade),
+                results_log,
+                max_concurrency=1,
+            )
+        )
+    assert sorted(results_log.completed()) == [0, 1, 2, 3]
+
+    evaluated = asyncio.run(
+        aevaluate_stream(
+            iter(dataset),
+            "bank",
+            RunnableLambda(answer),
+            RunnableLambda(grade),
+            results_log,
+            max_concurrency=2,
+        )
+    )
+
+    assert evaluated == 2
+    assert calls[-2:] == ["Quiz me about topic 4", "Quiz me about topic 5"]
+    results = results_log.read()
+    assert [result["index"] for result in results] == list(range(6))
+    assert [result["input"] for result in results] == [row["input"] for row in dataset]
+
+
+@pytest.fixture
+def incremental_run(tmp_path, monkeypatch):
+    """Run report_evals over a list of inputs against a given fake server."""
+    monkeypatch.setattr(app, "QUIZ_BANK_PATH", os.path.abspath(app.QUIZ_BANK_PATH))
+    monkeypatch.chdir(tmp_path)
+    for name in ("EVAL_LLM_CACHE", "EVAL_CASSETTE", "EVAL_RATE_LIMIT_RPM"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("OPENAI_API_KEY", "fake")
+    dataset = tmp_path / "dataset.jsonl"
+    store_path = str(tmp_path / "results.sqlite")
+
+    def run(server, inputs, **kwargs):
+        dataset.write_text(
+            "".join(json.dumps({"input": text}) + "\n" for text in inputs)
+        )
+        monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+        before = server.stats()["requests"]
+        report_evals(
+            dataset_path=str(dataset),
+            results_store_path=store_path,
+            dedupe=False,
+            **kwargs,
+        )
+        return server.stats()["requests"] - before
+
+    run.store_path = store_path
+    return run
+
+
+def test_report_evals_reruns_only_changed_rows(incremental_run, setup_logging):
+    logger = setup_logging
+    logger.info("Testing incremental report_evals runs")
+
+    inputs = [f"Quiz me about topic {idx}" for idx in range(3)]
+    with FakeOpenAIServer() as server:
+        assert incremental_run(server, inputs) == 6
+        assert incremental_run(server, inputs) == 0
+        inputs[1] = "Quiz me about Paris"
+        assert incremental_run(server, inputs) == 2
+        assert incremental_run(server, inputs, incremental=False) == 6
+
+    store = ResultsStore(incremental_run.store_path)
+    first, second, third, full = [run["run_id"] for run in reversed(store.runs())]
+    carried = [row["carried_from"] for row in store.run_results(third)]
+    assert carried == [first, None, first]
+    assert all(row["carried_from"] is None for row in store.run_results(full))
+    assert len(list(store.run_results(second))) == 3
+    store.close()
+
+
+def test_report_evals_never_carries_rows_across_endpoints(
+    incremental_run, setup_logging
+):
+    logger = setup_logging
+    logger.info("Testing incremental runs against a different endpoint")
+
+    inputs = [f"Quiz me about topic {idx}" for idx in range(3)]
+    with FakeOpenAIServer() as fake, FakeOpenAIServer() as other:
+        assert incremental_run(fake, inputs) == 6
+        # Same configuration, different base URL: every row is evaluated again
+        assert incremental_run(other, inputs) == 6
+        assert incremental_run(other, inputs) == 0
+
+    store = ResultsStore(incremental_run.store_path)
+    latest, second, first = [run["run_id"] for run in store.runs()]
+    assert all(row["carried_from"] is None for row in store.run_results(second))
+    assert {row["carried_from"] for row in store.run_results(latest)} == {second}
+    store.close()
+
+
+def test_carried_success_wins_over_a_failed_resumed_row(tmp_path, incremental_run):
+    inputs = [f"Quiz me about topic {idx}" for idx in range(3)]
+    results_log = ResultsLog(str(tmp_path / "resume.jsonl"))
+    results_log.append(
+        {"index": 1, "input": inputs[1], "output": None, "status": "failed"}
+    )
+    with FakeOpenAIServer() as server:
+        assert incremental_run(server, inputs) == 6
+        assert incremental_run(server, inputs, results_log_path=results_log.path) == 0
+
+    store = ResultsStore(incremental_run.store_path)
+    latest, first = [run["run_id"] for run in store.runs()]
+    rows = list(store.run_results(latest))
+    assert [row["status"] for row in rows] == ["ok", "ok", "ok"]
+    assert {row["carried_from"] for row in rows} == {first}
+    store.close()
+
+
+def test_pruned_report_evals_never_reads_the_whole_bank(incremental_run, monkeypatch):
+    def whole_bank():
+        raise AssertionError("the pruned run read the whole quiz bank")
+
+    monkeypatch.setattr(save_eval_artifacts, "get_quiz_bank", whole_bank)
+    with FakeOpenAIServer() as server:
+        requests = incremental_run(
+            server, ["Generate a quiz about art"], prune_quiz_bank=True
+        )
+    assert requests == 2
+
+    store = ResultsStore(incremental_run.store_path)
+    (run,) = store.runs()
+    with open(app.QUIZ_BANK_PATH) as file:
+        assert run["quiz_bank_hash"] == fingerprint(file.read())
+    store.close()
+
+
+def test_pruned_report_evals_with_cascade_grader(incremental_run):
+    with FakeOpenAIServer() as server:
+        incremental_run(
+            server,
+            ["Generate a quiz about art", "Quiz me about Paris"],
+            prune_quiz_bank=True,
+            cascade_grader=True,
+        )
+
+    store = ResultsStore(incremental_run.store_path)
+    (run,) = store.runs()
+    rows = list(store.run_results(run["run_id"]))
+    assert [row["status"] for row in rows] == ["ok", "ok"]
+    assert all(row["grader_response"] for row in rows)
+    store.close()
+
+
+# Run all tests if script is executed directly
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
@@ -0,0 +1,136 @@
+import asyncio
+import itertools
+import random
+import pytest
+
+from langchain_core.runnables import RunnableLambda
+
+from results_store import ResultsStore
+from save_eval_artifacts import aevaluate_dataset, parse_args
+from sequential import (
+    DEFAULT_CONFIDENCE,
+    DEFAULT_PASS_THRESHOLD,
+    SequentialTest,
+    asample_until_decided,
+    assert_pass_rate,
+    format_result,
+    sample_until_decided,
+    wilson_interval,
+)
+
+
+def test_wilson_interval():
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+    low, high = wilson_interval(12, 12)
+    assert low == pytest.approx(0.7575, abs=1e-4) and high == 1.0
+    low, high = wilson_interval(5, 10)
+    assert low == pytest.approx(1 - high)
+    # More samples, narrower interval
+    assert wilson_interval(50, 100)[0] > wilson_interval(5, 10)[0]
+
+
+def test_clear_cases_stop_early():
+    passing = sample_until_decided(lambda: True, SequentialTest(0.8, max_samples=50))
+    failing = sample_until_decided(lambda: False, SequentialTest(0.8, max_samples=50))
+
+    assert passing.passed and passing.decided and passing.samples < 30
+    assert not failing.passed and failing.decided and failing.samples < 10
+
+
+def test_borderline_cases_use_the_whole_budget():
+    alternating = itertools.cycle([True, False])
+    result = sample_until_decided(
+        lambda: next(alternating), SequentialTest(0.5, max_samples=20)
+    )
+
+    assert not result.decided
+    assert result.samples == 20
+    assert result.pass_rate == 0.5
+    assert "undecided" in format_result(result)
+
+
+def test_single_sample_is_a_plain_check():
+    assert sample_until_decided(lambda: True, SequentialTest(max_samples=1)).passed
+    assert not sample_until_decided(lambda: False, SequentialTest(max_samples=1)).passed
+
+
+def test_error_rates_hold_for_clear_cases():
+    rng = random.Random(0)
+    wrong = 0
+    for _ in range(200):
+        # True pass rate 0.95, well above the 0.8 threshold's indifference zone
+        result = sample_until_decided(
+            lambda: rng.random() < 0.95, SequentialTest(0.8, max_samples=200)
+        )
+        wrong += not result.passed
+    assert wrong <= 10
+
+
+def test_async_sampling():
+    async def check():
+        await asyncio.sleep(0)
+        return True
+
+    result = asyncio.run(asample_until_decided(check, SequentialTest(0.8)))
+    assert result.passed and result.decided
+
+
+def test_assert_pass_rate_reports_the_interval():
+    with pytest.raises(AssertionError, match=r"threshold 90%.*0/\d+ .*95% CI"):
+        assert_pass_rate(lambda: False, SequentialTest(0.9), "grader flaked")
+
+
+def test_dataset_rows_are_sampled_until_decided(tmp_path, setup_logging):
+    logger = setup_logging
+    logger.info("Testing sequential sampling of dataset rows")
+
+    rng = random.Random(0)
+    calls = {"good": 0, "bad": 0}
+
+    async def answer(inputs):
+        return inputs["question"]
+
+    async def grade(inputs):
+        kind = inputs["agent_response"].split()[-1]
+        calls[kind] += 1
+        return "Decision: Y" if kind == "good" or rng.random() < 0.1 else "Decision: N"
+
+    results = asyncio.run(
+        aevaluate_dataset(
+            [{"input": "Quiz me good"}, {"input": "Quiz me bad"}],
+            "bank",
+            RunnableLambda(answer),
+            RunnableLambda(grade),
+            sequential=lambda: SequentialTest(0.8, max_samples=60),
+        )
+    )
+    logger.info(f"Calls per row: {calls}")
+
+    good, bad = results
+    assert good["decision"] == "Y" and good["decided"]
+    assert bad["decision"] == "N" and bad["decided"]
+    assert good["samples"] == calls["good"] < 60
+    assert bad["samples"] == calls["bad"] < 15
+    assert good["interval_low"] < good["pass_rate"] <= good["interval_high"]
+
+    store = ResultsStore(str(tmp_path / "results.sqlite"))
+    run_id = store.start_run()
+    store.append_results(run_id, results)
+    stored = list(store.run_results(run_id))
+    store.close()
+    assert [row["decision"] for row in stored] == ["Y", "N"]
+    assert stored[0]["samples"] == good["samples"]
+    assert stored[1]["interval_high"] == pytest.approx(bad["interval_high"])
+
+
+def test_cli_uses_the_shared_pass_threshold():
+    args = parse_args([])
+
+    assert args.pass_threshold == DEFAULT_PASS_THRESHOLD
+    assert args.confidence == DEFAULT_CONFIDENCE
+    assert SequentialTest().threshold == DEFAULT_PASS_THRESHOLD
+
+
+# Run all tests if script is executed directly
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
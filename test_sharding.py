@@ -0,0 +1,190 @@
+import json
+import os
+import shutil
+import pytest
+
+import app
+from fake_openai_server import FakeOpenAIServer
+from metrics import MetricsCallbackHandler
+from results_store import ResultsStore
+from save_eval_artifacts import (
+    merge_shard_outputs,
+    report_evals,
+    report_evals_parallel,
+)
+from sharding import (
+    check_shard,
+    in_shard,
+    merge_metrics,
+    merge_shards,
+    metrics_path_for,
+    read_shard_header,
+    write_shard,
+)
+
+RUN = {"model": "gpt-test", "config_fingerprint": "abc"}
+
+
+def test_shards_partition_the_dataset_evenly():
+    shards = [[idx for idx in range(10) if in_shard(idx, i, 3)] for i in range(3)]
+
+    assert sorted(sum(shards, [])) == list(range(10))
+    assert [len(shard) for shard in shards] == [4, 3, 3]
+    with pytest.raises(ValueError):
+        check_shard(3, 3)
+    with pytest.raises(ValueError):
+        check_shard(0, 0)
+
+
+def write_shards(tmp_path, count, rows=10, run=RUN):
+    paths = []
+    for index in range(count):
+        path = str(tmp_path / f"shard-{index}.jsonl")
+        results = [
+            {"index": idx, "input": f"row {idx}", "decision": "Y"}
+            for idx in range(rows)
+            if in_shard(idx, index, count)
+        ]
+        metrics = MetricsCallbackHandler()
+        metrics.records.append(
+            {
+                "chain": "assistant",
+                "row_index": index,
+                "attempt": 1,
+                "latency_s": 0.1 * (index + 1),
+                "ttft_s": None,
+                "prompt_tokens": 10,
+                "completion_tokens": 5,
+                "error": None,
+                "cancelled": False,
+            }
+        )
+        write_shard(path, index, count, run, results, metrics)
+        paths.append(path)
+    return paths
+
+
+def test_merge_restores_dataset_order(tmp_path):
+    paths = write_shards(tmp_path, 3)
+
+    assert read_shard_header(paths[1]) == {"index": 1, "count": 3, "run": RUN}
+    # Shard files can be listed in any order
+    run, rows = merge_shards(list(reversed(paths)))
+    assert run == RUN
+    assert [row["index"] for row in rows] == list(range(10))
+
+    metrics = merge_metrics(paths)
+    assert metrics.summary()["assistant"]["calls"] == 3
+    assert metrics.summary()["assistant"]["prompt_tokens"] == 30
+    assert os.path.exists(metrics_path_for(paths[0]))
+
+
+def test_merge_rejects_incomplete_or_mixed_shards(tmp_path):
+    paths = write_shards(tmp_path, 3)
+
+    with pytest.raises(ValueError, match="once each"):
+        merge_shards(paths[:2])
+    with pytest.raises(ValueError, match="once each"):
+        merge_shards(paths + paths[:1])
+    with pytest.raises(ValueError, match="No shards"):
+        merge_shards([])
+
+    other = tmp_path / "other"
+    other.mkdir()
+    mixed = write_shards(other, 3, run={**RUN, "config_fingerprint": "xyz"})
+    with pytest.raises(ValueError, match="different configurations"):
+        merge_shards(paths[:2] + mixed[2:])
+
+    not_a_shard = tmp_path / "results.jsonl"
+    not_a_shard.write_text(json.dumps({"index": 0, "input": "row 0"}) + "\n")
+    with pytest.raises(ValueError, match="not a shard file"):
+        merge_shards([str(not_a_shard)])
+
+
+@pytest.fixture
+def eval_dir(tmp_path, monkeypatch):
+    """Run report_evals against a fake server from a scratch working directory."""
+    shutil.copy(app.QUIZ_BANK_PATH, tmp_path / "quiz_bank.txt")
+    monkeypatch.chdir(tmp_path)
+    for name in ("EVAL_LLM_CACHE", "EVAL_CASSETTE", "EVAL_RATE_LIMIT_RPM"):
+        monkeypatch.delenv(name, raising=False)
+    dataset = tmp_path / "dataset.jsonl"
+    dataset.write_text(
+        "".join(
+            json.dumps({"input": f"Quiz me about topic {idx}", "response": "quiz"})
+            + "\n"
+            for idx in range(7)
+        )
+    )
+    with FakeOpenAIServer() as server:
+        monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+        monkeypatch.setenv("OPENAI_API_KEY", "fake")
+        yield tmp_path, str(dataset)
+
+
+def run_rows(store_path, run_id):
+    store = ResultsStore(store_path)
+    rows = [
+        (row["row_index"], row["input"], row["decision"], row["keyword_passed"])
+        for row in store.run_results(run_id)
+    ]
+    store.close()
+    return rows
+
+
+def latest_run(store_path):
+    store = ResultsStore(store_path)
+    run = store.runs(last=1)[0]
+    store.close()
+    return run
+
+
+def test_sharded_runs_merge_into_the_serial_result(eval_dir, setup_logging):
+    logger = setup_logging
+    logger.info("Testing sharded evaluation against a serial run")
+    tmp_path, dataset = eval_dir
+    store_path = str(tmp_path / "results.sqlite")
+
+    report_evals(dataset_path=dataset, results_store_path=store_path)
+    serial_run = latest_run(store_path)["run_id"]
+    serial = run_rows(store_path, serial_run)
+
+    paths = []
+    for index in range(3):
+        path = str(tmp_path / "shards" / f"shard-{index}.jsonl")
+        report_evals(
+            dataset_path=dataset,
+            results_store_path=store_path,
+            incremental=False,
+            shard_index=index,
+            shard_count=3,
+            shard_output=path,
+        )
+        paths.append(path)
+    # Shards do not record runs of their own
+    assert latest_run(store_path)["run_id"] == serial_run
+
+    run_id = merge_shard_outputs(paths, store_path)
+    assert run_rows(store_path, run_id) == serial
+    assert json.loads(latest_run(store_path)["metadata"])["shards"] == 3
+
+
+def test_worker_processes_match_a_serial_run(eval_dir, setup_logging):
+    logger = setup_logging
+    logger.info("Testing the process pool executor")
+    tmp_path, dataset = eval_dir
+    store_path = str(tmp_path / "results.sqlite")
+
+    report_evals(dataset_path=dataset, results_store_path=store_path)
+    serial = run_rows(store_path, latest_run(store_path)["run_id"])
+
+    run_id = report_evals_parallel(
+        2, dataset_path=dataset, results_store_path=store_path, incremental=False
+    )
+    assert run_rows(store_path, run_id) == serial
+    assert json.loads(latest_run(store_path)["metadata"])["shards"] == 2
+
+
+# Run all tests if script is executed directly
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
@@ -0,0 +1,215 @@
+import asyncio
+import threading
+import time
+import pytest
+
+from langchain_core.runnables import RunnableLambda
+
+from adaptive import AdaptiveConcurrency, ResilientCaller, RetryPolicy
+from app import assistant_chain, create_llm
+from fake_openai_server import FakeOpenAIServer
+from save_eval_artifacts import aevaluate_dataset, create_eval_chain
+from single_flight import SingleFlight, normalize_text
+
+
+def counting_runnable(delay=0.05, fail_first=0):
+    calls = []
+
+    def answer(inputs):
+        calls.append(inputs)
+        time.sleep(delay)
+        if len(calls) <= fail_first:
+            raise RuntimeError("transient")
+        return f"answer to {inputs['question']}"
+
+    async def aanswer(inputs):
+        calls.append(inputs)
+        await asyncio.sleep(delay)
+        if len(calls) <= fail_first:
+            raise RuntimeError("transient")
+        return f"answer to {inputs['question']}"
+
+    return RunnableLambda(answer, afunc=aanswer), calls
+
+
+def test_normalize_text():
+    assert normalize_text("  Quiz me\n about   PARIS ") == "quiz me about paris"
+
+
+def test_concurrent_identical_requests_share_one_call():
+    runnable, calls = counting_runnable()
+    flight = SingleFlight()
+    chain = flight.wrap(runnable, "assistant")
+
+    async def run_all():
+        return await asyncio.gather(
+            *(chain.ainvoke({"question": "Paris"}) for _ in range(5)),
+            chain.ainvoke({"question": "Rome"}),
+        )
+
+    answers = asyncio.run(run_all())
+
+    assert answers[:5] == ["answer to Paris"] * 5
+    assert len(calls) == 2
+    assert flight.stats()["coalesced"] == 4
+    assert flight.stats()["calls"] == 2
+
+
+def test_finished_results_are_reused():
+    runnable, calls = counting_runnable(delay=0)
+    flight = SingleFlight()
+    chain = flight.wrap(runnable, "assistant")
+
+    assert chain.invoke({"question": "Paris"}) == chain.invoke({"question": "Paris"})
+    assert len(calls) == 1
+    assert flight.stats() == {
+        "requests": 2,
+        "calls": 1,
+        "coalesced": 0,
+        "reused": 1,
+        "saved_rate": 0.5,
+    }
+
+
+def test_namespaces_do_not_mix():
+    runnable, calls = counting_runnable(delay=0)
+    flight = SingleFlight()
+    flight.wrap(runnable, "a").invoke({"question": "Paris"})
+    flight.wrap(runnable, "b").invoke({"question": "Paris"})
+
+    assert len(calls) == 2
+
+
+def test_normalized_inputs_share_a_call():
+    runnable, calls = counting_runnable(delay=0)
+    strict = SingleFlight().wrap(runnable, "assistant")
+    strict.invoke({"question": "Quiz me about Paris"})
+    strict.invoke({"question": "quiz me  about paris"})
+    assert len(calls) == 2
+
+    loose = SingleFlight(normalize=True).wrap(runnable, "assistant")
+    loose.invoke({"question": "Quiz me about Paris"})
+    loose.invoke({"question": "quiz me  about paris"})
+    assert len(calls) == 3
+
+
+def test_failures_reach_waiters_and_are_not_reused():
+    runnable, calls = counting_runnable(fail_first=1)
+    chain = SingleFlight().wrap(runnable, "assistant")
+
+    async def run_all():
+        return await asyncio.gather(
+            *(chain.ainvoke({"question": "Paris"}) for _ in range(3)),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run_all())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len(calls) == 1
+
+    # The next request tries again instead of reusing the failure
+    assert chain.invoke({"question": "Paris"}) == "answer to Paris"
+    assert len(calls) == 2
+
+
+def test_threads_share_one_call():
+    runnable, calls = counting_runnable()
+    chain = SingleFlight().wrap(runnable, "assistant")
+    answers = []
+
+    threads = [
+        threading.Thread(
+            target=lambda: answers.append(chain.invoke({"question": "Paris"}))
+        )
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert answers == ["answer to Paris"] * 4
+    assert len(calls) == 1
+
+
+def test_a_waiter_timing_out_does_not_cancel_the_call():
+    runnable, calls = counting_runnable(delay=0.1)
+    flight = SingleFlight()
+    chain = flight.wrap(runnable, "assistant")
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(chain.ainvoke({"question": "Paris"}), 0.01)
+        return await chain.ainvoke({"question": "Paris"})
+
+    assert asyncio.run(run()) == "answer to Paris"
+    assert len(calls) == 1
+
+
+def test_leaders_keep_their_caller_slot():
+    in_flight = []
+    peak = []
+
+    async def answer(inputs):
+        in_flight.append(inputs)
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.02)
+        in_flight.remove(inputs)
+        return f"answer to {inputs['question']}"
+
+    flight = SingleFlight()
+    chain = flight.wrap(RunnableLambda(answer), "assistant")
+    caller = ResilientCaller(
+        AdaptiveConcurrency(initial_limit=2, max_limit=2), RetryPolicy(seed=0)
+    )
+    questions = ["Paris", "Rome", "Paris", "Oslo", "Rome", "Lima", "Cairo", "Oslo"]
+
+    async def run_all():
+        return await asyncio.gather(
+            *(
+                caller.call(lambda q=q: chain.ainvoke({"question": q}))
+                for q in questions
+            )
+        )
+
+    results = asyncio.run(run_all())
+
+    assert [answer for answer, _ in results] == [f"answer to {q}" for q in questions]
+    assert max(peak) <= 2
+    assert caller.concurrency.in_flight == 0
+
+
+def test_duplicate_dataset_rows_make_fewer_api_calls(setup_logging):
+    logger = setup_logging
+    logger.info("Testing request dedupe on a dataset with repeated inputs")
+
+    dataset = [
+        {"input": "Quiz me about Paris"},
+        {"input": "quiz me about  paris"},
+        {"input": "Quiz me about Paris"},
+        {"input": "Quiz me about Paris"},
+    ]
+    flight = SingleFlight(normalize=True)
+    with FakeOpenAIServer(latency=0.05) as server:
+        llm = create_llm(base_url=server.base_url, openai_api_key="fake")
+        results = asyncio.run(
+            aevaluate_dataset(
+                dataset,
+                "bank",
+                flight.wrap(assistant_chain(llm=llm), "assistant"),
+                flight.wrap(create_eval_chain(llm=llm), "grader"),
+            )
+        )
+        requests = server.stats()["requests"]
+    logger.info(f"Dedupe stats: {flight.stats()}")
+
+    # One assistant call and one grader call for all four rows
+    assert requests == 2
+    assert len({result["grader_response"] for result in results}) == 1
+    assert flight.stats()["requests"] == 8
+    assert flight.stats()["calls"] == 2
+
+
+# Run all tests if script is executed directly
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
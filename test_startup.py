@@ -0,0 +1,57 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+
+# Modules that must not be imported until a chain or a report is actually built
+HEAVY_MODULES = ["langchain_openai", "openai", "pandas", "IPython", "dotenv"]
+
+# Import-time budget for our own modules, on top of the langchain_core they build on
+IMPORT_BUDGET_SECONDS = float(os.environ.get("IMPORT_BUDGET_SECONDS", "0.5"))
+
+PROBE = """
+import json, sys, time
+import langchain_core.prompts, langchain_core.runnables, langchain_core.caches
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"seconds": seconds, "heavy": heavy}}))
+"""
+
+
+def probe_import(module):
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("module", ["app", "save_eval_artifacts"])
+def test_import_is_lazy_and_fast(module, setup_logging):
+    logger = setup_logging
+    result = probe_import(module)
+    logger.info(f"import {module}: {result['seconds']:.3f}s")
+
+    assert result["heavy"] == []
+    assert result["seconds"] < IMPORT_BUDGET_SECONDS, (
+        f"import {module} took {result['seconds']:.3f}s, "
+        f"budget is {IMPORT_BUDGET_SECONDS}s"
+    )
+
+
+def test_assistant_chain_factory_is_cached():
+    from app import get_assistant_chain, get_default_llm
+
+    assert get_assistant_chain() is get_assistant_chain()
+    assert get_default_llm() is get_default_llm()
+
+
+# Run all tests if script is executed directly
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
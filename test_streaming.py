@@ -0,0 +1,150 @@
+import asyncio
+import time
+import pytest
+
+from app import assistant_chain, create_llm
+from cassette import RECORD, REPLAY, CassetteCache
+from fake_openai_server import DEFAULT_QUIZ, FakeOpenAIServer
+from metrics import MetricsCallbackHandler
+from streaming import (
+    all_of,
+    assert_stream,
+    astream_until,
+    contains_any,
+    starts_with,
+    stream_until,
+)
+
+
+@pytest.fixture
+def slow_stream():
+    # About 0.6s for the whole quiz, one token every 20ms
+    with FakeOpenAIServer(token_latency=0.02) as server:
+        yield server
+
+
+def fake_assistant(server, cache=None):
+    return assistant_chain(
+        llm=create_llm(base_url=server.base_url, openai_api_key="fake", cache=cache)
+    )
+
+
+def wait_for_cancel(server, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while server.stats()["cancelled"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return server.stats()["cancelled"]
+
+
+def test_stream_stops_at_first_decision(slow_stream, setup_logging):
+    logger = setup_logging
+    logger.info("Testing early exit from a streamed assistant response")
+
+    metrics = MetricsCallbackHandler()
+    result = stream_until(
+        fake_assistant(slow_stream),
+        {"question": "Quiz me"},
+        contains_any(["capital"]),
+        config={"callbacks": [metrics]},
+    )
+    logger.info(f"Decided after {result.chunks} chunks in {result.elapsed_s:.3f}s")
+
+    assert result.passed
+    assert result.decided_early
+    assert "capital" in result.text
+    assert "populous" not in result.text
+    assert result.elapsed_s < 0.4
+    # The server sees the client hang up mid-generation
+    assert wait_for_cancel(slow_stream) == 1
+    summary = metrics.summary()["assistant"]
+    assert summary["cancelled"] == 1
+    assert summary["errors"] == 0
+
+
+def test_stream_reads_to_the_end_when_undecided(slow_stream):
+    result = stream_until(
+        fake_assistant(slow_stream), {"question": "Quiz me"}, contains_any(["rome"])
+    )
+
+    assert not result.passed
+    assert not result.decided_early
+    assert result.text == DEFAULT_QUIZ
+
+
+def test_starts_with_fails_on_the_first_tokens(slow_stream):
+    result = stream_until(
+        fake_assistant(slow_stream), {"question": "Quiz me"}, starts_with("I'm sorry")
+    )
+
+    assert not result.passed
+    assert result.decided_early
+    assert len(result.text) < len(DEFAULT_QUIZ) / 2
+
+
+def test_all_of_waits_for_every_check():
+    check = all_of(contains_any(["paris"]), contains_any(["louvre"]))
+
+    assert check("Paris", done=False) is None
+    assert check("Paris and the Louvre", done=False) is True
+    assert check("Paris", done=True) is False
+
+
+def test_astream_until(slow_stream):
+    result = asyncio.run(
+        astream_until(
+            fake_assistant(slow_stream),
+            {"question": "Quiz me"},
+            contains_any(["france"]),
+        )
+    )
+
+    assert result.passed
+    assert result.decided_early
+    assert result.text.rstrip().endswith("France?")
+
+
+def test_assert_stream(slow_stream):
+    assistant = fake_assistant(slow_stream)
+    text = assert_stream(assistant, {"question": "Quiz me"}, contains_any(["paris"]))
+    assert "Paris" in text
+
+    with pytest.raises(AssertionError, match="no rome"):
+        assert_stream(
+            assistant, {"question": "Quiz me"}, contains_any(["rome"]), "no rome"
+        )
+
+
+def test_undecided_predicate_at_end_of_stream_raises(slow_stream):
+    with pytest.raises(ValueError):
+        stream_until(
+            fake_assistant(slow_stream),
+            {"question": "Quiz me"},
+            lambda text, done: None,
+        )
+
+
+def test_cached_chains_are_invoked_not_streamed(slow_stream, tmp_path):
+    path = str(tmp_path / "cassette.json")
+    recorder = CassetteCache(path, mode=RECORD)
+    recorded = stream_until(
+        fake_assistant(slow_stream, cache=recorder),
+        {"question": "Quiz me"},
+        contains_any(["capital"]),
+    )
+    assert recorded.passed and not recorded.decided_early
+    assert recorder.recorded == 1
+
+    player = CassetteCache(path, mode=REPLAY)
+    replayed = stream_until(
+        fake_assistant(slow_stream, cache=player),
+        {"question": "Quiz me"},
+        contains_any(["capital"]),
+    )
+    assert replayed.text == recorded.text
+    assert player.hits == 1
+    assert slow_stream.stats()["requests"] == 1
+
+
+# Run all tests if script is executed directly
+if __name__ == "__main__":
+    pytest.main(["-v", __file__])
@@ -1,33 +1,21 @@
-from app import assistant_chain
+from app import get_assistant_chain
+from dataset_io import DATASET_PATH, read_dataset
+from keyword_scorer import KeywordScorer
+from streaming import all_of, contains_any, stream_until
 import pytest
 
-# In a real application you would load your dataset from a file or logging tool.
-# Here we have a mix of examples with slightly different phrasing that our quiz application can support
-# and things we don't support.
-dataset = [
-    {
-        "input": "I'm trying to learn about science, can you give me a quiz to test my knowledge",
-        "response": "science",
-        "subjects": ["davinci", "telescope", "physics", "curie"],
-    },
-    {
-        "input": "I'm an geography expert, give a quiz to prove it?",
-        "response": "geography",
-        "subjects": ["paris", "france", "louvre"],
-    },
-    {
-        "input": "Quiz me about Italy",
-        "response": "geography",
-        "subjects": ["rome", "alps", "sicily"],
-    },
-]
+# The dataset lives in datasets/quiz_requests.jsonl. It has a mix of examples with slightly different phrasing
+# that our quiz application can support and things we don't support.
+dataset = list(read_dataset(DATASET_PATH))
+# Every expected category and subject in the dataset, matched in one scan per answer
+scorer = KeywordScorer(dataset)
 
 
 def test_on_dataset(setup_logging, langchain_tracer):
     logger = setup_logging
     logger.info("Starting dataset-based testing")
 
-    assistant = assistant_chain()
+    assistant = get_assistant_chain()
     for idx, row in enumerate(dataset):
         user_input = row["input"]
         expected_category = row["response"]
@@ -37,25 +25,26 @@ def test_on_dataset(setup_logging, langchain_tracer):
         logger.info(f"Expected category: {expected_category}")
         logger.info(f"Expected subjects: {expected_subjects}")
 
-        answer = assistant.invoke(
-            {"question": user_input}, config={"callbacks": [langchain_tracer]}
-        )
+        # Stop streaming once the category and a subject have both shown up
+        check = contains_any([expected_category])
+        if expected_subjects:
+            check = all_of(check, contains_any(expected_subjects))
+        answer = stream_until(
+            assistant,
+            {"question": user_input},
+            check,
+            config={"callbacks": [langchain_tracer]},
+        ).text
         logger.info(f"Answer received: {answer}")
 
-        assert (
-            expected_category.lower() in answer.lower()
-        ), f"expected: {expected_category}, got {answer}"
+        score = scorer.score(row, answer)
+        assert score.category_found, f"expected: {expected_category}, got {answer}"
 
         if expected_subjects:
-            subjects_found = [
-                subject
-                for subject in expected_subjects
-                if subject.lower() in answer.lower()
-            ]
-            logger.info(f"Subjects found in response: {subjects_found}")
+            logger.info(f"Subjects found in response: {score.subjects_found}")
 
-            assert any(
-                subject.lower() in answer.lower() for subject in expected_subjects
+            assert (
+                score.subjects_found
             ), f"Expected the assistant questions to include '{expected_subjects}', but got {answer}"
 
 